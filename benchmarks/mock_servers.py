@@ -0,0 +1,115 @@
+# benchmarks/mock_servers.py
+
+import asyncio
+import json
+import random
+import socket
+
+from aiohttp import web
+
+from src.async_runner import AsyncLoopThread
+
+class StreamProfile:
+    """Shape of a mock model stream."""
+
+    def __init__(self, tokens: int = 200, chunk_chars: int = 4, first_byte_ms: float = 0.0,
+                 inter_token_ms: float = 0.0, error_rate: float = 0.0, drop_rate: float = 0.0, seed: int = 1234):
+        self.tokens = tokens                  # Content chunks per response
+        self.chunk_chars = chunk_chars        # Characters per content chunk
+        self.first_byte_ms = first_byte_ms    # Delay before the response headers
+        self.inter_token_ms = inter_token_ms  # Delay between chunks
+        self.error_rate = error_rate          # Probability of an HTTP 500 instead of a stream
+        self.drop_rate = drop_rate            # Probability of cutting the stream halfway
+        self.random = random.Random(seed)
+
+class MockModelServer:
+    """
+    In-process HTTP server speaking Ollama's NDJSON /api/chat stream and the
+    OpenAI-style SSE /v1/chat/completions stream, with a configurable profile.
+    """
+
+    def __init__(self, profile: StreamProfile | None = None):
+        self.profile = profile or StreamProfile()
+        self.requests_served = 0
+        self.port = _free_port()
+        self._loop_thread = AsyncLoopThread(name="MockModelServer")
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def ollama_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/chat"
+
+    @property
+    def openai_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def start(self) -> "MockModelServer":
+        self._loop_thread.start()
+        self._loop_thread.submit(self._start()).result(timeout=10)
+        return self
+
+    def stop(self):
+        if self._runner is not None:
+            self._loop_thread.submit(self._runner.cleanup()).result(timeout=10)
+        self._loop_thread.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/api/chat", self._handle_ollama)
+        app.router.add_post("/v1/chat/completions", self._handle_openai)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+
+    def _token(self, index: int) -> str:
+        return f"t{index:03d} "[: self.profile.chunk_chars].ljust(self.profile.chunk_chars)
+
+    async def _stream(self, request: web.Request, content_type: str, frame) -> web.StreamResponse:
+        self.requests_served += 1
+        await request.read()
+        profile = self.profile
+        if profile.first_byte_ms:
+            await asyncio.sleep(profile.first_byte_ms / 1000)
+        if profile.error_rate and profile.random.random() < profile.error_rate:
+            return web.json_response({"error": "injected failure"}, status=500)
+
+        response = web.StreamResponse(headers={"Content-Type": content_type})
+        await response.prepare(request)
+        drop_at = profile.tokens // 2 if profile.drop_rate and profile.random.random() < profile.drop_rate else None
+        for index in range(profile.tokens):
+            if index == drop_at:
+                request.transport.close()
+                return response
+            await response.write(frame(self._token(index), False))
+            if profile.inter_token_ms:
+                await asyncio.sleep(profile.inter_token_ms / 1000)
+        await response.write(frame("", True))
+        return response
+
+    async def _handle_ollama(self, request: web.Request) -> web.StreamResponse:
+        def frame(content: str, done: bool) -> bytes:
+            if done:
+                return b'{"model":"mock","done":true,"prompt_eval_count":12,"prompt_eval_duration":1500000,"eval_count":1}\n'
+            return json.dumps({"model": "mock", "message": {"role": "assistant", "content": content}, "done": False}, separators=(",", ":")).encode() + b"\n"
+        return await self._stream(request, "application/x-ndjson", frame)
+
+    async def _handle_openai(self, request: web.Request) -> web.StreamResponse:
+        def frame(content: str, done: bool) -> bytes:
+            if done:
+                usage = {"id": "mock", "object": "chat.completion.chunk", "choices": [], "usage": {
+                    "prompt_tokens": 20, "completion_tokens": self.profile.tokens, "prompt_tokens_details": {"cached_tokens": 8}}}
+                return b"data: " + json.dumps(usage, separators=(",", ":")).encode() + b"\n\ndata: [DONE]\n\n"
+            event = {"id": "mock", "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]}
+            return b"data: " + json.dumps(event, separators=(",", ":")).encode() + b"\n\n"
+        return await self._stream(request, "text/event-stream", frame)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
@@ -0,0 +1,299 @@
+# benchmarks/run_benchmarks.py
+"""
+Performance benchmarks for the streaming path, driven against in-process
+mock Ollama / OpenAI-compatible servers. Needs no UI and no real provider.
+
+Usage:
+    python -m benchmarks.run_benchmarks                 # run and compare with the baseline
+    python -m benchmarks.run_benchmarks --save-baseline # run and store results as the new baseline
+    python -m benchmarks.run_benchmarks --quick         # fewer iterations, for a smoke run
+
+Timings only compare on the same machine, so the baseline is kept local and
+never committed: save one before a change, then compare after it.
+"""
+
+import argparse
+import json
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from src import metrics
+from src.ai_clients import OllamaClient, OpenAIClient
+from src.ai_clients.stream_parser import NDJSONStreamParser, SSEStreamParser
+from src.ai_task import STREAM_START, STREAM_CHUNK, STREAM_END
+from src.async_runner import AsyncLoopThread
+from src.clipboard_handler import ClipboardCapture, FakeClipboardBackend
+from benchmarks.mock_servers import MockModelServer, StreamProfile
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json") # Machine-local, git-ignored
+
+# Metrics compared against the baseline, and whether lower values are better
+TRACKED_METRICS = {
+    "ttft_ms_p50": True,
+    "tokens_per_second": False,
+    "cpu_ms_per_request": True,
+    "alloc_peak_kb": True,
+    "us_per_chunk": True,
+    "capture_ms_p50": True,
+    "import_ms": True,
+}
+
+# Modules on the startup path, from the hotkey listener (which must be live first) to the full app
+STARTUP_MODULES = ("src.hotkey_manager", "src.pipeline", "src.app")
+
+def _make_client(kind: str, server: MockModelServer):
+    if kind == "ollama":
+        return OllamaClient(api_url=server.ollama_url, model_name="mock")
+    return OpenAIClient(api_url=server.openai_url, model_name="mock", api_key="sk-mock")
+
+MESSAGES = [{"role": "system", "content": "bench"}, {"role": "user", "content": "bench"}]
+
+def _run_sync(client, requests_count: int) -> list:
+    traces = []
+    for _ in range(requests_count):
+        trace = metrics.RequestTrace("bench", "sync")
+        token = metrics.current_trace.set(trace)
+        trace.mark("task_start")
+        for _chunk in client.stream_response(MESSAGES):
+            pass
+        metrics.current_trace.reset(token)
+        traces.append(trace)
+    return traces
+
+def _run_async(client, loop_thread: AsyncLoopThread, requests_count: int) -> list:
+    async def run_all():
+        traces = []
+        for _ in range(requests_count):
+            trace = metrics.RequestTrace("bench", "async")
+            metrics.current_trace.set(trace)
+            trace.mark("task_start")
+            async for _chunk in client.astream_response(MESSAGES):
+                pass
+            traces.append(trace)
+        return traces
+    return loop_thread.submit(run_all()).result()
+
+def bench_client_streams(requests_count: int, profile: StreamProfile) -> dict:
+    """TTFT, throughput, CPU and allocations of each client over a mock stream."""
+    results = {}
+    loop_thread = AsyncLoopThread(name="BenchLoop")
+    loop_thread.start()
+    with MockModelServer(profile) as server:
+        for kind in ("ollama", "openai"):
+            for mode in ("sync", "async"):
+                client = _make_client(kind, server)
+                run = (lambda n: _run_sync(client, n)) if mode == "sync" else (lambda n: _run_async(client, loop_thread, n))
+                run(2) # Warm the connection pool
+
+                cpu_start = time.process_time()
+                wall_start = time.perf_counter()
+                traces = run(requests_count)
+                wall = time.perf_counter() - wall_start
+                cpu = time.process_time() - cpu_start
+
+                # Allocation pass runs separately so tracing overhead does not skew timings
+                tracemalloc.start()
+                run(max(1, requests_count // 4))
+                _current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                ttfts = sorted(t.summary()["ttft_ms"] for t in traces)
+                tokens = sum(t.tokens for t in traces)
+                results[f"{kind}_{mode}"] = {
+                    "ttft_ms_p50": round(ttfts[len(ttfts) // 2], 3),
+                    "ttft_ms_p95": round(ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))], 3),
+                    "tokens_per_second": round(tokens / wall, 1),
+                    "cpu_ms_per_request": round(cpu * 1000 / requests_count, 3),
+                    "alloc_peak_kb": round(peak / 1024, 2),
+                }
+                client.close()
+                loop_thread.submit(client.aclose()).result()
+    loop_thread.stop()
+    return results
+
+def _build_stream_bytes(kind: str, count: int) -> bytes:
+    if kind == "ollama":
+        return b"".join(json.dumps({"model": "mock", "message": {"role": "assistant", "content": f"tok{i} "}, "done": False}, separators=(",", ":")).encode() + b"\n" for i in range(count))
+    return b"".join(b"data: " + json.dumps({"id": "mock", "choices": [{"index": 0, "delta": {"content": f"tok{i} "}}]}, separators=(",", ":")).encode() + b"\n\n" for i in range(count))
+
+def bench_parsers(chunks: int, read_size: int = 512) -> dict:
+    """Per-chunk CPU cost of turning raw socket reads into content deltas."""
+    results = {}
+    for kind, parser_class in (("ollama", NDJSONStreamParser), ("openai", SSEStreamParser)):
+        raw = _build_stream_bytes(kind, chunks)
+        reads = [raw[i:i + read_size] for i in range(0, len(raw), read_size)]
+        parser = parser_class()
+        start = time.perf_counter()
+        for data in reads:
+            parser.feed(data)
+        elapsed = time.perf_counter() - start
+        parser = parser_class()
+        tracemalloc.start()
+        for data in reads[:200]:
+            parser.feed(data)
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"parser_{kind}"] = {
+            "us_per_chunk": round(elapsed * 1e6 / chunks, 3),
+            "alloc_peak_kb": round(peak / 1024, 2),
+        }
+    return results
+
+def bench_capture(iterations: int, copy_latency_ms: float = 10.0) -> dict:
+    """Auto-capture latency against a fake clipboard whose application copies after copy_latency_ms."""
+    results = {}
+    for label, with_sequence in (("sequence", True), ("polling", False)):
+        backend = FakeClipboardBackend(selection="selected text", clipboard="original", copy_latency_ms=copy_latency_ms, with_sequence=with_sequence)
+        capture = ClipboardCapture(backend)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            text = capture.capture_selection()
+            timings.append((time.perf_counter() - start) * 1000)
+            assert text == "selected text"
+        timings.sort()
+        results[f"capture_{label}"] = {
+            "capture_ms_p50": round(timings[len(timings) // 2], 3),
+            "capture_ms_max": round(timings[-1], 3),
+            "copy_latency_ms": copy_latency_ms,
+        }
+    return results
+
+class _FakeRoot:
+    """Stands in for the Tk root: records scheduled callbacks instead of running a mainloop."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay_ms, callback, *args):
+        self.scheduled.append(callback)
+
+    def after_idle(self, callback, *args):
+        self.scheduled.append(callback)
+
+class _FakeUI:
+    """Counts the calls the pump makes into MainWindow."""
+
+    def __init__(self):
+        self.append_calls = 0
+        self.chars = 0
+
+    def show_stream_start(self):
+        pass
+
+    def show_progress(self, text):
+        pass
+
+    def append_stream_content(self, text):
+        self.append_calls += 1
+        self.chars += len(text)
+
+    def finish_stream(self):
+        pass
+
+def bench_ui_pump(chunks: int, chunks_per_frame: int) -> dict:
+    """Cost of the process_queue -> append_stream_content path, without a display."""
+    try:
+        from src.app import QuickAIToolkit
+        from src.ai_task import AITask
+    except Exception as e: # The app module needs the desktop dependencies
+        return {"ui_pump": {"skipped": f"{type(e).__name__}: {e}"}}
+
+    app = QuickAIToolkit.__new__(QuickAIToolkit)
+    app.root, app.ui = _FakeRoot(), _FakeUI()
+    app.response_queue = queue.Queue()
+    app.current_task = AITask(1, "bench")
+    app._pump_scheduled = False
+    app._frame_interval_ms = 16
+    app.latency_stats = metrics.LatencyStats()
+
+    app.response_queue.put((1, STREAM_START, None))
+    start = time.perf_counter()
+    for index in range(chunks):
+        app.response_queue.put((1, STREAM_CHUNK, "tok "))
+        if index % chunks_per_frame == chunks_per_frame - 1:
+            app.process_queue()
+    app.response_queue.put((1, STREAM_END, None))
+    app.process_queue()
+    elapsed = time.perf_counter() - start
+    return {"ui_pump": {
+        "us_per_chunk": round(elapsed * 1e6 / chunks, 3),
+        "append_calls": app.ui.append_calls,
+    }}
+
+def bench_startup(runs: int) -> dict:
+    """Import time of each startup module, measured in a fresh interpreter per run."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for module in STARTUP_MODULES:
+        scenario = f"import_{module.rsplit('.', 1)[-1]}"
+        code = f"import time; start = time.perf_counter(); import {module}; print((time.perf_counter() - start) * 1000)"
+        timings = []
+        for _ in range(runs):
+            completed = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+            if completed.returncode != 0: # e.g. a desktop dependency is missing
+                error = completed.stderr.strip().splitlines()
+                results[scenario] = {"skipped": error[-1] if error else "import failed"}
+                break
+            timings.append(float(completed.stdout.split()[-1]))
+        else:
+            results[scenario] = {
+                "import_ms": round(statistics.median(timings), 1),
+                "import_ms_max": round(max(timings), 1),
+            }
+    return results
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for scenario, values in results.items():
+        for metric, lower_is_better in TRACKED_METRICS.items():
+            old, new = baseline.get(scenario, {}).get(metric), values.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+                continue
+            change = (new - old) / old
+            if (change > tolerance) if lower_is_better else (change < -tolerance):
+                regressions.append(f"{scenario}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run_benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.35, help="Allowed relative regression (default 0.35).")
+    args = parser.parse_args(argv)
+
+    requests_count = 10 if args.quick else 40
+    profile = StreamProfile(tokens=200, chunk_chars=4, first_byte_ms=2.0)
+    results = {}
+    results.update(bench_client_streams(requests_count, profile))
+    results.update(bench_parsers(5000 if args.quick else 50000))
+    results.update(bench_capture(10 if args.quick else 40))
+    results.update(bench_ui_pump(20000, chunks_per_frame=50))
+    results.update(bench_startup(3 if args.quick else 9))
+
+    for scenario, values in results.items():
+        print(f"{scenario:<16} " + "  ".join(f"{k}={v}" for k, v in values.items()))
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline stored yet; run with --save-baseline.")
+        return 0
+    with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+        regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print("No regressions against baseline." if not regressions else f"{len(regressions)} regression(s).")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,28 @@
 # main.py
 
-import customtkinter as ctk
-from src.app import QuickAIToolkit
-from src.config import UI_APPEARANCE, UI_THEME
+import time
+from src.hotkey_manager import HotkeyListener
 
 def main():
     """
     Initializes and runs the QuickAI-Toolkit application.
     """
+    start = time.perf_counter()
+    # Hotkeys go live before the heavy UI and network modules are even imported
+    hotkeys = HotkeyListener()
+    hotkeys.start()
+
+    import customtkinter as ctk
+    from src.app import QuickAIToolkit
+    from src.config import UI_APPEARANCE, UI_THEME
+
     ctk.set_appearance_mode(UI_APPEARANCE)
     ctk.set_default_color_theme(UI_THEME)
-    
+
     root = ctk.CTk()
-    QuickAIToolkit(root)
+    QuickAIToolkit(root, hotkeys)
+    print(f"Startup: ready in {(time.perf_counter() - start) * 1000:.0f} ms")
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,8 +1,10 @@
 # src/ai_clients/__init__.py
 
-from .base_client import BaseAIClient
+from .base_client import BaseAIClient, DEFAULT_POOL_SIZE, DEFAULT_POOL_IDLE_TIMEOUT, format_error, is_error_chunk
 from .ollama_client import OllamaClient
 from .openai_client import OpenAIClient
+from .rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RateLimitedError, RequestScheduler, current_priority
+from .router_client import RouterClient
 from typing import Type
 
 # Mapping provider names to their client classes
@@ -12,13 +14,14 @@ CLIENT_MAP: dict[str, Type[BaseAIClient]] = {
     "Groq": OpenAIClient, # Groq uses an OpenAI-compatible API
 }
 
-def get_ai_client(provider_name: str, provider_settings: dict) -> BaseAIClient:
+def get_ai_client(provider_name: str, provider_settings: dict, pool_settings: dict | None = None) -> BaseAIClient:
     """
     Factory function to get an instance of the appropriate AI client.
     
     Args:
         provider_name: The name of the AI provider (e.g., "Ollama", "OpenAI").
         provider_settings: A dictionary containing 'api_url', 'model_name', 'api_key'.
+        pool_settings: Optional 'pool_size' / 'idle_timeout' for the client's connection pool.
         
     Returns:
         An instance of a class that inherits from BaseAIClient.
@@ -27,4 +30,24 @@ def get_ai_client(provider_name: str, provider_settings: dict) -> BaseAIClient:
     if not client_class:
         raise ValueError(f"Unknown AI provider: {provider_name}")
         
-    return client_class(**provider_settings)
\ No newline at end of file
+    pool_settings = pool_settings or {}
+    return client_class(
+        **provider_settings,
+        pool_size=pool_settings.get("pool_size", DEFAULT_POOL_SIZE),
+        pool_idle_timeout=pool_settings.get("idle_timeout", DEFAULT_POOL_IDLE_TIMEOUT),
+    )
+
+def get_router_client(routing_settings: dict, providers_settings: dict, pool_settings: dict | None = None) -> RouterClient:
+    """
+    Factory function for a client that fails over (and optionally hedges)
+    across the providers listed in routing_settings['providers'].
+    """
+    clients = []
+    for provider_name in routing_settings.get("providers", []):
+        if provider_name in providers_settings:
+            clients.append((provider_name, get_ai_client(provider_name, providers_settings[provider_name], pool_settings)))
+    return RouterClient(
+        clients,
+        hedge_after_ms=routing_settings.get("hedge_after_ms", 0),
+        health_half_life_s=routing_settings.get("health_half_life_s", 300),
+    )
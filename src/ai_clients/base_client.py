@@ -1,15 +1,178 @@
 # src/ai_clients/base_client.py
 
+import asyncio
+import json
+import sys
+import threading
+import time
+import aiohttp
 from abc import ABC, abstractmethod
-from typing import Generator, List, Dict
+from typing import TYPE_CHECKING, AsyncGenerator, Generator, List, Dict
+
+from src import metrics
+from src.token_estimator import estimate_messages_tokens, estimate_tokens
+from .rate_limiter import DEFAULT_MAX_RETRIES, RateLimitedError, RequestScheduler, backoff_delay, parse_retry_after
+from .single_flight import single_flight
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_POOL_IDLE_TIMEOUT = 90.0
+REQUEST_TIMEOUT = 60
+
+# Errors are streamed to the UI as regular chunks; this prefix marks them
+ERROR_PREFIX = "\n--- "
+
+def format_error(title: str, detail) -> str:
+    """Formats an error so it can be yielded through the response stream."""
+    return f"{ERROR_PREFIX}{title} ---\n{detail}"
+
+def is_error_chunk(chunk: str) -> bool:
+    """Returns True if a streamed chunk is an error produced by a client."""
+    return chunk.startswith(ERROR_PREFIX)
 
 class BaseAIClient(ABC):
     """Abstract base class for all AI API clients."""
-    
-    @abstractmethod
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, pool_idle_timeout: float = DEFAULT_POOL_IDLE_TIMEOUT, rate_limit: dict | None = None, **kwargs):
+        rate_limit = rate_limit or {}
+        self.max_retries = max(0, int(rate_limit.get("max_retries", DEFAULT_MAX_RETRIES)))
+        self.scheduler: RequestScheduler | None = None
+        if any(rate_limit.get(key, 0) > 0 for key in ("requests_per_minute", "tokens_per_minute", "max_concurrent")):
+            self.scheduler = RequestScheduler(
+                rate_limit.get("requests_per_minute", 0),
+                rate_limit.get("tokens_per_minute", 0),
+                rate_limit.get("max_concurrent", 0),
+            )
+        self.pool_size = max(1, int(pool_size))
+        self.pool_idle_timeout = float(pool_idle_timeout)
+        self._session = None
+        self._session_last_used = 0.0
+        self._session_lock = threading.Lock()
+        # Created lazily on the app's event loop thread and only used from there
+        self._async_session: aiohttp.ClientSession | None = None
+
+    def _build_session(self) -> "requests.Session":
+        """Creates a keep-alive session with a connection pool sized from settings."""
+        # requests is only needed by the blocking path, so it is not imported at startup
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _get_session(self) -> "requests.Session":
+        """
+        Returns the pooled session, rebuilding it if its connections sat idle
+        longer than the configured timeout (servers drop idle keep-alives).
+        """
+        with self._session_lock:
+            now = time.monotonic()
+            if self._session is not None and now - self._session_last_used > self.pool_idle_timeout:
+                self._session.close()
+                self._session = None
+            if self._session is None:
+                self._session = self._build_session()
+            self._session_last_used = now
+            return self._session
+
+    def close(self):
+        """Closes the pooled session and all of its connections."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _get_async_session(self) -> aiohttp.ClientSession:
+        """Returns the pooled aiohttp session. Must be called on the event loop thread."""
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.pool_idle_timeout)
+            timeout = aiohttp.ClientTimeout(sock_connect=REQUEST_TIMEOUT, sock_read=REQUEST_TIMEOUT)
+            self._async_session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[self._build_trace_config()])
+        return self._async_session
+
+    @staticmethod
+    def _build_trace_config() -> aiohttp.TraceConfig:
+        """Marks when a request got its connection, whether new or reused from the pool."""
+        async def on_connection_ready(session, context, params):
+            metrics.mark("connected")
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection_ready)
+        trace_config.on_connection_reuseconn.append(on_connection_ready)
+        return trace_config
+
+    async def aclose(self):
+        """Closes the pooled aiohttp session. Must be awaited on the event loop thread."""
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    async def awarm_up(self) -> dict | None:
+        """
+        Prepares the backend for the next request, e.g. by loading a local
+        model. Returns timing details, or None when there is nothing to warm.
+        """
+        return None
+
+    @staticmethod
+    def _raise_if_rate_limited(status: int, headers):
+        """Turns a 429 into RateLimitedError so the request is retried instead of failing."""
+        if status == 429:
+            raise RateLimitedError(parse_retry_after(headers.get("Retry-After")))
+
+    def _retry_delay(self, attempt: int, error: RateLimitedError) -> float | None:
+        """Seconds to wait before the next attempt, or None when retries are exhausted."""
+        if attempt >= self.max_retries:
+            return None
+        if self.scheduler and error.retry_after_s:
+            self.scheduler.pause(error.retry_after_s)
+        delay = backoff_delay(attempt, error.retry_after_s)
+        # stderr: batch mode writes its results to stdout
+        print(f"Rate limited (attempt {attempt + 1}/{self.max_retries + 1}), retrying in {delay:.1f}s", file=sys.stderr)
+        return delay
+
     def stream_response(self, messages: List[Dict]) -> Generator[str, None, None]:
         """
         Sends a request to the LLM and yields content chunks from the stream.
+        Waits for the provider's rate limits and retries 429 responses.
+        
+        Args:
+            messages: A list of message dictionaries, following OpenAI's format.
+
+        Yields:
+            String chunks of the AI's response.
+        """
+        tokens = estimate_messages_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            if self.scheduler:
+                self.scheduler.acquire_blocking(tokens)
+            metrics.mark("admitted")
+            used_tokens = 0
+            try:
+                for chunk in self._stream_request(messages):
+                    if self.scheduler:
+                        used_tokens += estimate_tokens(chunk)
+                    yield chunk
+                return
+            except RateLimitedError as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    yield format_error("API请求错误", e)
+                    return
+            finally:
+                if self.scheduler:
+                    self.scheduler.release(used_tokens)
+            time.sleep(delay)
+
+    def astream_response(self, messages: List[Dict]) -> AsyncGenerator[str, None]:
+        """
+        Async counterpart of stream_response, implemented as an async generator
+        that runs on the app's event loop. Identical requests in flight at the
+        same time share one upstream stream.
         
         Args:
             messages: A list of message dictionaries, following OpenAI's format.
@@ -17,4 +180,47 @@ class BaseAIClient(ABC):
         Yields:
             String chunks of the AI's response.
         """
-        pass
\ No newline at end of file
+        return single_flight.stream(self._flight_key(messages), lambda: self._astream_with_retries(messages))
+
+    def _flight_key(self, messages: List[Dict]) -> str:
+        """Identifies a request for sharing: the same endpoint sent the same payload."""
+        return json.dumps(
+            [type(self).__name__, getattr(self, "api_url", None), self._build_payload(messages)],
+            ensure_ascii=False, sort_keys=True
+        )
+
+    async def _astream_with_retries(self, messages: List[Dict]) -> AsyncGenerator[str, None]:
+        tokens = estimate_messages_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            if self.scheduler:
+                await self.scheduler.acquire(tokens)
+            metrics.mark("admitted")
+            used_tokens = 0
+            try:
+                async for chunk in self._astream_request(messages):
+                    if self.scheduler:
+                        used_tokens += estimate_tokens(chunk)
+                    yield chunk
+                return
+            except RateLimitedError as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    yield format_error("API请求错误", e)
+                    return
+            finally:
+                if self.scheduler:
+                    self.scheduler.release(used_tokens)
+            await asyncio.sleep(delay)
+
+    @abstractmethod
+    def _stream_request(self, messages: List[Dict]) -> Generator[str, None, None]:
+        """
+        One attempt of stream_response. Raises RateLimitedError on a 429;
+        other errors are yielded as formatted error chunks.
+        """
+        pass
+
+    @abstractmethod
+    async def _astream_request(self, messages: List[Dict]) -> AsyncGenerator[str, None]:
+        """One attempt of astream_response; see _stream_request."""
+        pass
@@ -1,47 +1,118 @@
 # src/ai_clients/ollama_client.py
 
-import requests
-import json
-from typing import Generator, List, Dict
-from .base_client import BaseAIClient
+import aiohttp
+import asyncio
+import sys
+import time
+from typing import AsyncGenerator, Generator, List, Dict
+from src import metrics
+from .base_client import BaseAIClient, REQUEST_TIMEOUT, format_error
+from .stream_parser import NDJSONStreamParser
 
 class OllamaClient(BaseAIClient):
     """Client for native Ollama API."""
 
-    def __init__(self, api_url: str, model_name: str, **kwargs):
+    def __init__(self, api_url: str, model_name: str, keep_alive: str | int | None = None, options: dict | None = None, **kwargs):
+        super().__init__(**kwargs)
         self.api_url = api_url
         self.model_name = model_name
+        self.keep_alive = keep_alive
+        # Unset (None) options are left to the server's defaults
+        self.options = {key: value for key, value in (options or {}).items() if value is not None}
 
-    def stream_response(self, messages: List[Dict]) -> Generator[str, None, None]:
+    def _build_payload(self, messages: List[Dict]) -> dict:
         payload = {
             "model": self.model_name,
             "messages": messages,
             "stream": True
         }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.options:
+            payload["options"] = self.options
+        return payload
+
+    @staticmethod
+    def _report_final_stats(parser: NDJSONStreamParser):
+        """Records how long Ollama spent loading the model and prefilling the prompt."""
+        stats = parser.final_stats or {}
+        if stats.get("load_duration") is not None:
+            metrics.set_model_load(stats["load_duration"] / 1e6) # Nanoseconds
+        # prompt_eval_count only covers tokens not already in the KV cache; Ollama does not report the cached part
+        if stats.get("prompt_eval_count") is not None:
+            prefill_ns = stats.get("prompt_eval_duration")
+            metrics.set_usage(stats["prompt_eval_count"], None, prefill_ns / 1e6 if prefill_ns is not None else None)
+
+    async def awarm_up(self) -> dict | None:
+        """
+        Loads the model into memory (an empty chat only loads it) and renews its
+        keep-alive. Returns the elapsed time, or None if the server is unreachable.
+        """
+        payload = {"model": self.model_name, "messages": [], "stream": False}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.options:
+            # Different options (e.g. num_ctx) would make the first real request reload the model
+            payload["options"] = self.options
+        start = time.perf_counter()
+        try:
+            async with self._get_async_session().post(self.api_url, json=payload) as response:
+                self._raise_if_rate_limited(response.status, response.headers)
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Ollama warm-up failed for '{self.model_name}': {e}", file=sys.stderr)
+            return None
+        result = {"model": self.model_name, "elapsed_ms": (time.perf_counter() - start) * 1000}
+        if data.get("load_duration") is not None:
+            result["load_ms"] = data["load_duration"] / 1e6
+        return result
+
+    def _stream_request(self, messages: List[Dict]) -> Generator[str, None, None]:
+        import requests # Blocking path only; kept out of the startup imports
+        payload = self._build_payload(messages)
         
         try:
-            with requests.post(self.api_url, json=payload, stream=True, timeout=60) as response:
+            with self._get_session().post(self.api_url, json=payload, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                self._raise_if_rate_limited(response.status_code, response.headers)
                 response.raise_for_status()
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            # Ollama's native stream format is one JSON object per line
-                            data = json.loads(line.decode('utf-8'))
-                            
-                            # Check for errors in the stream
-                            if "error" in data:
-                                yield f"\n--- OLLAMA API ERROR ---\n{data['error']}"
-                                break
-
-                            # The final summary object has 'done: true' and no 'message'
-                            if data.get("done"):
-                                break
-                            
-                            content = data.get("message", {}).get("content", "")
-                            if content:
-                                yield content
-                        except json.JSONDecodeError:
-                            # Skip empty or malformed lines
-                            continue
+                parser = NDJSONStreamParser()
+                for data in response.iter_content(chunk_size=None):
+                    metrics.add_bytes(len(data))
+                    for chunk in parser.feed(data):
+                        metrics.add_token_text(chunk)
+                        yield chunk
+                    if parser.finished:
+                        break
+                else:
+                    yield from parser.close()
+                self._report_final_stats(parser)
         except requests.RequestException as e:
-            yield f"\n--- API请求错误 ---\n{e}"
\ No newline at end of file
+            yield format_error("API请求错误", e)
+
+    async def _astream_request(self, messages: List[Dict]) -> AsyncGenerator[str, None]:
+        payload = self._build_payload(messages)
+
+        try:
+            async with self._get_async_session().post(self.api_url, json=payload) as response:
+                self._raise_if_rate_limited(response.status, response.headers)
+                response.raise_for_status()
+                parser = NDJSONStreamParser()
+                try:
+                    async for data in response.content.iter_any():
+                        metrics.add_bytes(len(data))
+                        for chunk in parser.feed(data):
+                            metrics.add_token_text(chunk)
+                            yield chunk
+                        if parser.finished:
+                            break
+                    else:
+                        for chunk in parser.close():
+                            yield chunk
+                    self._report_final_stats(parser)
+                except (asyncio.CancelledError, GeneratorExit):
+                    # Drop the connection so the server stops generating tokens
+                    response.close()
+                    raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            yield format_error("API请求错误", e)
@@ -1,49 +1,106 @@
 # src/ai_clients/openai_client.py
 
-import requests
-import json
-from typing import Generator, List, Dict
-from .base_client import BaseAIClient
+import aiohttp
+import asyncio
+from typing import AsyncGenerator, Generator, List, Dict
+from src import metrics
+from .base_client import BaseAIClient, REQUEST_TIMEOUT, format_error
+from .stream_parser import SSEStreamParser
 
 class OpenAIClient(BaseAIClient):
     """Client for OpenAI, Groq, or any other OpenAI-compatible cloud service."""
 
-    def __init__(self, api_url: str, model_name: str, api_key: str, **kwargs):
+    def __init__(self, api_url: str, model_name: str, api_key: str, include_usage: bool = True, **kwargs):
+        super().__init__(**kwargs)
         self.api_url = api_url
         self.model_name = model_name
         self.api_key = api_key
+        self.include_usage = include_usage # Some compatible servers reject stream_options
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
 
-    def stream_response(self, messages: List[Dict]) -> Generator[str, None, None]:
-        if not self.api_key or "YOUR_" in self.api_key:
-            yield "\n--- 配置错误 ---\n请在设置中提供有效的API Key。"
-            return
+    def _has_valid_key(self) -> bool:
+        return bool(self.api_key) and "YOUR_" not in self.api_key
 
+    def _build_payload(self, messages: List[Dict]) -> dict:
         payload = {
             "model": self.model_name,
             "messages": messages,
             "stream": True
         }
+        if self.include_usage:
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    @staticmethod
+    def _report_usage(parser: SSEStreamParser):
+        """Records how many prompt tokens were prefilled and how many came from the provider's prompt cache."""
+        usage = parser.usage
+        if not usage or usage.get("prompt_tokens") is None:
+            return
+        # OpenAI: prompt_tokens_details.cached_tokens; DeepSeek: prompt_cache_hit_tokens
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", usage.get("prompt_cache_hit_tokens"))
+        prompt_time = usage.get("prompt_time") # Groq, in seconds
+        metrics.set_usage(
+            usage["prompt_tokens"] - (cached or 0), cached,
+            prompt_time * 1000 if prompt_time is not None else None
+        )
+
+    def _stream_request(self, messages: List[Dict]) -> Generator[str, None, None]:
+        if not self._has_valid_key():
+            yield format_error("配置错误", "请在设置中提供有效的API Key。")
+            return
+
+        import requests # Blocking path only; kept out of the startup imports
+        payload = self._build_payload(messages)
         
         try:
-            with requests.post(self.api_url, headers=self.headers, json=payload, stream=True, timeout=60) as response:
+            with self._get_session().post(self.api_url, headers=self.headers, json=payload, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                self._raise_if_rate_limited(response.status_code, response.headers)
                 response.raise_for_status()
-                for line in response.iter_lines():
-                    if line:
-                        decoded_line = line.decode('utf-8')
-                        if decoded_line.startswith('data: '):
-                            data_str = decoded_line[len('data: '):].strip()
-                            if data_str == '[DONE]':
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                content = data.get("choices", [{}])[0].get("delta", {}).get("content")
-                                if content:
-                                    yield content
-                            except json.JSONDecodeError:
-                                continue
+                parser = SSEStreamParser()
+                for data in response.iter_content(chunk_size=None):
+                    metrics.add_bytes(len(data))
+                    for chunk in parser.feed(data):
+                        metrics.add_token_text(chunk)
+                        yield chunk
+                    if parser.finished:
+                        break
+                else:
+                    yield from parser.close()
+                self._report_usage(parser)
         except requests.RequestException as e:
-            yield f"\n--- API请求错误 ---\n{e}"
\ No newline at end of file
+            yield format_error("API请求错误", e)
+
+    async def _astream_request(self, messages: List[Dict]) -> AsyncGenerator[str, None]:
+        if not self._has_valid_key():
+            yield format_error("配置错误", "请在设置中提供有效的API Key。")
+            return
+
+        payload = self._build_payload(messages)
+
+        try:
+            async with self._get_async_session().post(self.api_url, headers=self.headers, json=payload) as response:
+                self._raise_if_rate_limited(response.status, response.headers)
+                response.raise_for_status()
+                parser = SSEStreamParser()
+                try:
+                    async for data in response.content.iter_any():
+                        metrics.add_bytes(len(data))
+                        for chunk in parser.feed(data):
+                            metrics.add_token_text(chunk)
+                            yield chunk
+                        if parser.finished:
+                            break
+                    else:
+                        for chunk in parser.close():
+                            yield chunk
+                    self._report_usage(parser)
+                except (asyncio.CancelledError, GeneratorExit):
+                    # Drop the connection so the server stops generating tokens
+                    response.close()
+                    raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            yield format_error("API请求错误", e)
@@ -0,0 +1,180 @@
+# src/ai_clients/rate_limiter.py
+
+import asyncio
+import contextvars
+import email.utils
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Priority of requests made from the current thread or asyncio task. Batch jobs
+# and speculative prefetches lower it; everything else is interactive.
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("current_priority", default=PRIORITY_INTERACTIVE)
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE_S = 1.0
+DEFAULT_BACKOFF_MAX_S = 30.0
+
+class RateLimitedError(Exception):
+    """Raised by a client when the provider answered 429 before streaming anything."""
+
+    def __init__(self, retry_after_s: float | None = None, detail: str = ""):
+        super().__init__(detail or "429 Too Many Requests")
+        self.retry_after_s = retry_after_s
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parses a Retry-After header: either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after_s: float | None = None,
+                  base_s: float = DEFAULT_BACKOFF_BASE_S, max_s: float = DEFAULT_BACKOFF_MAX_S) -> float:
+    """Exponential backoff with full jitter, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(max_s, base_s * 2 ** attempt))
+    return max(delay, retry_after_s or 0.0)
+
+class TokenBucket:
+    """Refills continuously up to capacity. The level may go negative to book debt."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate_per_s = self.capacity / 60
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (amounts above capacity only need a full bucket)."""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate_per_s)
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+class _Waiter:
+    def __init__(self, tokens: float, wake):
+        self.tokens = tokens
+        self.wake = wake
+        self.cancelled = False
+        self.granted = False
+
+class RequestScheduler:
+    """
+    Admits requests to one provider in priority order, within its requests/min
+    and tokens/min budgets and concurrency limit. The queue is strict: a
+    background request never overtakes a waiting interactive one. A 429
+    pauses admission for everyone until the Retry-After has passed.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_concurrent: int = 0):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrent = int(max_concurrent)
+        self.active = 0
+        self._paused_until = 0.0
+        self._heap: list[tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def _enqueue(self, priority: int, tokens: float, wake) -> _Waiter:
+        waiter = _Waiter(tokens, wake)
+        with self._lock:
+            heapq.heappush(self._heap, (priority, next(self._sequence), waiter))
+        self._dispatch()
+        return waiter
+
+    def _dispatch(self):
+        """Grants the head of the queue while budgets allow; otherwise re-checks when they will."""
+        with self._lock:
+            while self._heap:
+                _priority, _seq, waiter = self._heap[0]
+                if waiter.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                if self.max_concurrent > 0 and self.active >= self.max_concurrent:
+                    return # release() dispatches again
+                now = time.monotonic()
+                delay = max(
+                    self._paused_until - now,
+                    self.request_bucket.wait_time(1, now) if self.request_bucket else 0.0,
+                    self.token_bucket.wait_time(waiter.tokens, now) if self.token_bucket else 0.0,
+                )
+                if delay > 0:
+                    self._schedule_dispatch(delay)
+                    return
+                heapq.heappop(self._heap)
+                if self.request_bucket:
+                    self.request_bucket.take(1, now)
+                if self.token_bucket:
+                    self.token_bucket.take(waiter.tokens, now)
+                self.active += 1
+                waiter.granted = True
+                waiter.wake()
+
+    def _schedule_dispatch(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._dispatch)
+        self._timer.daemon = True
+        self._timer.start()
+
+    async def acquire(self, tokens: float, priority: int | None = None):
+        """Waits for admission. Every successful acquire must be paired with release()."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            except RuntimeError:
+                pass # Loop already closed; the waiter is gone with it
+
+        waiter = self._enqueue(current_priority.get() if priority is None else priority, tokens, wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                granted = waiter.granted
+            if granted:
+                self.release()
+            raise
+
+    def acquire_blocking(self, tokens: float, priority: int | None = None):
+        """Thread-blocking counterpart of acquire for the synchronous client path."""
+        event = threading.Event()
+        self._enqueue(current_priority.get() if priority is None else priority, tokens, event.set)
+        event.wait()
+
+    def release(self, used_tokens: float = 0):
+        """Ends an admitted request and books the tokens it produced."""
+        with self._lock:
+            self.active = max(0, self.active - 1)
+            if used_tokens and self.token_bucket:
+                self.token_bucket.take(used_tokens, time.monotonic())
+        self._dispatch()
+
+    def pause(self, seconds: float):
+        """Holds back all admissions, e.g. for a Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
@@ -0,0 +1,165 @@
+# src/ai_clients/router_client.py
+
+import asyncio
+import json
+import math
+import time
+from typing import AsyncGenerator, Generator, List, Dict
+
+from .base_client import BaseAIClient, format_error, is_error_chunk
+
+# Providers whose decayed failure score is at or above this are tried last
+UNHEALTHY_SCORE = 0.5
+
+class ProviderHealth:
+    """Failure score for one provider that halves every half_life seconds."""
+
+    def __init__(self, half_life_s: float):
+        self.half_life_s = max(1.0, float(half_life_s))
+        self._score = 0.0
+        self._updated = time.monotonic()
+
+    @property
+    def score(self) -> float:
+        elapsed = time.monotonic() - self._updated
+        return self._score * math.pow(0.5, elapsed / self.half_life_s)
+
+    def record_failure(self):
+        self._score = self.score + 1.0
+        self._updated = time.monotonic()
+
+    def record_success(self):
+        self._score = self.score / 2
+        self._updated = time.monotonic()
+
+class RouterClient(BaseAIClient):
+    """
+    Wraps several provider clients behind the BaseAIClient interface.
+
+    Providers are tried in their configured order, except that recently
+    failing ones move to the back until their health score decays. A provider
+    that errors before its first token is skipped for the next one. With
+    hedging enabled, a second provider is started if the first has not
+    produced a token within hedge_after_ms; the first to stream wins and
+    the other request is cancelled.
+    """
+
+    def __init__(self, clients: list[tuple[str, BaseAIClient]], hedge_after_ms: float = 0, health_half_life_s: float = 300, **kwargs):
+        super().__init__(**kwargs)
+        if not clients:
+            raise ValueError("Routing needs at least one provider.")
+        self.clients = clients
+        self.hedge_after_ms = float(hedge_after_ms)
+        self.health = {name: ProviderHealth(health_half_life_s) for name, _client in clients}
+
+    def ordered_clients(self) -> list[tuple[str, BaseAIClient]]:
+        """Healthy providers in configured order, then unhealthy ones, least failing first."""
+        healthy = [(name, client) for name, client in self.clients if self.health[name].score < UNHEALTHY_SCORE]
+        unhealthy = [(name, client) for name, client in self.clients if self.health[name].score >= UNHEALTHY_SCORE]
+        unhealthy.sort(key=lambda item: self.health[item[0]].score)
+        return healthy + unhealthy
+
+    def close(self):
+        for _name, client in self.clients:
+            client.close()
+
+    async def aclose(self):
+        for _name, client in self.clients:
+            await client.aclose()
+
+    async def awarm_up(self) -> dict | None:
+        # Only the provider that will serve the next request is worth warming
+        _name, client = self.ordered_clients()[0]
+        return await client.awarm_up()
+
+    def _flight_key(self, messages: List[Dict]) -> str:
+        return json.dumps([type(self).__name__, [client._flight_key(messages) for _name, client in self.clients]])
+
+    def _stream_request(self, messages: List[Dict]) -> Generator[str, None, None]:
+        last_error = None
+        for name, client in self.ordered_clients():
+            stream = client.stream_response(messages)
+            first = next(stream, None)
+            if first is None or is_error_chunk(first):
+                self.health[name].record_failure()
+                last_error = first or format_error("API请求错误", f"{name} returned an empty response.")
+                stream.close()
+                continue
+            yield first
+            failed = False
+            for chunk in stream:
+                failed = failed or is_error_chunk(chunk)
+                yield chunk
+            self._record_outcome(name, failed)
+            return
+        yield last_error or format_error("API请求错误", "No provider available.")
+
+    async def _astream_request(self, messages: List[Dict]) -> AsyncGenerator[str, None]:
+        order = self.ordered_clients()
+        hedge_after_s = self.hedge_after_ms / 1000 if self.hedge_after_ms > 0 else None
+        pending: dict[asyncio.Task, tuple[str, AsyncGenerator]] = {}
+        next_index = 0
+        last_error = None
+        winner = None
+
+        def launch():
+            nonlocal next_index
+            name, client = order[next_index]
+            next_index += 1
+            stream = client.astream_response(messages)
+            pending[asyncio.create_task(_first_chunk(stream))] = (name, stream)
+
+        try:
+            launch()
+            while pending and winner is None:
+                can_hedge = hedge_after_s is not None and len(pending) == 1 and next_index < len(order)
+                done, _ = await asyncio.wait(pending, timeout=hedge_after_s if can_hedge else None, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch() # Primary is slow to first token: hedge with the next provider
+                    continue
+                for task in done:
+                    name, stream = pending.pop(task)
+                    first = task.result()
+                    if winner is None and first is not None and not is_error_chunk(first):
+                        winner = (name, stream, first)
+                        continue
+                    if first is None or is_error_chunk(first):
+                        self.health[name].record_failure()
+                        last_error = first or format_error("API请求错误", f"{name} returned an empty response.")
+                    await stream.aclose()
+                if winner is None and not pending and next_index < len(order):
+                    launch() # Fail over to the next provider
+        finally:
+            # Cancel the losers; cancelling closes their HTTP responses
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for _name, stream in pending.values():
+                await stream.aclose()
+
+        if winner is None:
+            yield last_error or format_error("API请求错误", "No provider available.")
+            return
+
+        name, stream, first = winner
+        failed = False
+        try:
+            yield first
+            async for chunk in stream:
+                failed = failed or is_error_chunk(chunk)
+                yield chunk
+        finally:
+            await stream.aclose()
+        self._record_outcome(name, failed)
+
+    def _record_outcome(self, name: str, failed: bool):
+        if failed:
+            self.health[name].record_failure()
+        else:
+            self.health[name].record_success()
+
+async def _first_chunk(stream: AsyncGenerator[str, None]) -> str | None:
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
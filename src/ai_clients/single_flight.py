@@ -0,0 +1,129 @@
+# src/ai_clients/single_flight.py
+
+import asyncio
+import sys
+from typing import AsyncGenerator, Callable
+
+from src import metrics
+
+# How long a stream whose callers all stopped reading (without being cancelled)
+# keeps running in case an identical request attaches right away
+DEFAULT_LINGER_S = 0.5
+
+class _Flight:
+    """One upstream stream and everything it has produced so far."""
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: Exception | None = None
+        self.subscribers = 0
+        self.producer: asyncio.Task | None = None
+        self.linger: asyncio.TimerHandle | None = None
+        self.changed = asyncio.Event() # Set, then replaced, by the next publish() or finish()
+
+    def publish(self, chunk: str):
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error: Exception | None = None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class SingleFlight:
+    """
+    Shares one upstream stream among identical requests in flight at the same
+    time. A request that arrives while an identical one is streaming gets the
+    chunks received so far replayed, then the rest live, without a second
+    HTTP request. The upstream request runs as its own task, so any caller
+    can leave without cutting off the others. When the last caller is
+    cancelled, the upstream request is cancelled with it, which closes the
+    HTTP response; a last caller that merely closes its stream leaves it
+    running for linger_s so an identical request can still pick it up.
+    """
+
+    def __init__(self, linger_s: float = DEFAULT_LINGER_S):
+        self.linger_s = float(linger_s)
+        self.shared = 0 # Requests served from another request's stream
+        # Keyed per event loop as well: a flight's events belong to the loop that created it
+        self._flights: dict[tuple[asyncio.AbstractEventLoop, str], _Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def stream(self, key: str, open_stream: Callable[[], AsyncGenerator[str, None]]) -> AsyncGenerator[str, None]:
+        """Yields the stream for key, starting it with open_stream() only if it is not already running."""
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        flight = self._flights.get(flight_key)
+        follower = flight is not None
+        if flight is None:
+            flight = _Flight()
+            self._flights[flight_key] = flight
+            # The task copies this context, so the trace and priority stay the first caller's
+            flight.producer = loop.create_task(self._produce(flight_key, flight, open_stream()))
+        else:
+            self.shared += 1
+            print(f"Single-flight: joined an identical request in flight ({len(flight.chunks)} chunks replayed)", file=sys.stderr)
+            metrics.mark("admitted")
+            if flight.linger is not None:
+                flight.linger.cancel()
+                flight.linger = None
+        flight.subscribers += 1
+
+        index = 0
+        cancelled = False
+        try:
+            while True:
+                changed = flight.changed
+                while index < len(flight.chunks):
+                    chunk = flight.chunks[index]
+                    index += 1
+                    if follower:
+                        metrics.add_token_text(chunk) # The first caller's trace already counts them
+                    yield chunk
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await changed.wait()
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                if cancelled:
+                    self._abandon(flight_key, flight) # The caller gave up: stop the server generating now
+                else:
+                    flight.linger = loop.call_later(self.linger_s, self._abandon, flight_key, flight)
+
+    async def _produce(self, flight_key: tuple, flight: _Flight, chunk_stream: AsyncGenerator[str, None]):
+        error = None
+        try:
+            async for chunk in chunk_stream:
+                flight.publish(chunk)
+        except Exception as e: # Cancellation is not recorded: nobody is left to tell
+            error = e
+        finally:
+            await chunk_stream.aclose() # Closes the HTTP response even when cancelled
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+            flight.finish(error)
+
+    def _abandon(self, flight_key: tuple, flight: _Flight):
+        flight.linger = None
+        if flight.subscribers or flight.done:
+            return
+        # Later identical requests must start afresh, not attach to a cancelled stream
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        flight.producer.cancel()
+
+# Shared by every client, so identical requests coalesce across callers
+single_flight = SingleFlight()
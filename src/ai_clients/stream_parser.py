@@ -0,0 +1,175 @@
+# src/ai_clients/stream_parser.py
+
+import json
+from abc import ABC, abstractmethod
+
+from .base_client import format_error
+
+_CONTENT_STRING = b'"content":"'
+_ERROR_PREFIX = b'{"error"'
+_DONE_TRUE = b'"done":true'
+_MESSAGE_OBJECT = b'"message":{'
+_DELTA_OBJECT = b'"delta":{'
+_USAGE_OBJECT = b'"usage":{'
+
+def _extract_content(payload: bytes | bytearray, container: bytes) -> str | None:
+    """
+    Pulls the "content" string of the container object (e.g. '"delta":{')
+    without decoding the whole JSON document. Returns None when the fast path
+    does not apply (no container, no string content directly inside it,
+    escapes, unusual spacing); callers then fall back to json.loads.
+    """
+    brace = payload.find(container)
+    if brace < 0:
+        return None
+    brace += len(container) - 1
+    key = payload.find(_CONTENT_STRING, brace)
+    # Any brace in between means the key belongs to a nested or later object, not to the container
+    if key < 0 or payload.find(b"{", brace + 1, key) >= 0 or payload.find(b"}", brace + 1, key) >= 0:
+        return None
+    value = key + len(_CONTENT_STRING)
+    end = payload.find(b'"', value)
+    # Any backslash means escape sequences (or an escaped quote): leave those to json
+    if end < 0 or payload.find(b"\\", value, end) >= 0:
+        return None
+    return payload[value:end].decode("utf-8")
+
+class StreamParser(ABC):
+    """
+    Incremental framer for streamed model responses. Raw socket chunks are
+    appended to one reusable buffer; complete frames are parsed in place.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.finished = False
+
+    def feed(self, data: bytes) -> list[str]:
+        """Consumes a raw chunk and returns the content deltas it completed."""
+        if self.finished:
+            return []
+        buffer = self._buffer
+        buffer += data
+        deltas = []
+        start = 0
+        while not self.finished:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            end = newline - 1 if newline > start and buffer[newline - 1] == 0x0D else newline
+            self._handle_line(buffer, start, end, deltas)
+            start = newline + 1
+        if start:
+            del buffer[:start] # One compaction per feed, not per line
+        return deltas
+
+    def close(self) -> list[str]:
+        """Flushes a final frame that was not newline-terminated."""
+        if self.finished or not self._buffer:
+            return []
+        self._buffer += b"\n"
+        return self.feed(b"") + self._flush_event()
+
+    def _flush_event(self) -> list[str]:
+        return []
+
+    @abstractmethod
+    def _handle_line(self, buffer: bytearray, start: int, end: int, deltas: list):
+        """Handles the line buffer[start:end], appending any content it completes to deltas."""
+        pass
+
+class NDJSONStreamParser(StreamParser):
+    """Ollama's native stream: one JSON object per line."""
+
+    def __init__(self):
+        super().__init__()
+        self.final_stats: dict | None = None # The closing 'done' object (durations, token counts)
+
+    def _handle_line(self, buffer: bytearray, start: int, end: int, deltas: list):
+        if start == end:
+            return
+        line = buffer[start:end]
+        if line.startswith(_ERROR_PREFIX) or _DONE_TRUE in line:
+            self._handle_full(line, deltas)
+            return
+        content = _extract_content(line, _MESSAGE_OBJECT)
+        if content is None:
+            self._handle_full(line, deltas)
+        elif content:
+            deltas.append(content)
+
+    def _handle_full(self, line: bytearray, deltas: list):
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return # Skip empty or malformed lines
+        if "error" in data:
+            deltas.append(format_error("OLLAMA API ERROR", data["error"]))
+            self.finished = True
+            return
+        content = (data.get("message") or {}).get("content")
+        if content:
+            deltas.append(content)
+        # The final summary object has 'done: true'
+        if data.get("done"):
+            self.final_stats = data
+            self.finished = True
+
+class SSEStreamParser(StreamParser):
+    """OpenAI-style Server-Sent Events: 'data:' lines, events end on a blank line."""
+
+    def __init__(self):
+        super().__init__()
+        self._data_lines: list[bytes] = []
+        self.usage: dict | None = None # Token usage, sent in a final event when requested
+
+    def _handle_line(self, buffer: bytearray, start: int, end: int, deltas: list):
+        if start == end:
+            self._dispatch(deltas)
+        elif buffer.startswith(b"data:", start):
+            value = start + 5
+            if value < end and buffer[value] == 0x20:
+                value += 1
+            self._data_lines.append(bytes(buffer[value:end]))
+        # Comments (':'), 'event:', 'id:' and 'retry:' lines carry no content
+
+    def _flush_event(self) -> list[str]:
+        deltas = []
+        self._dispatch(deltas)
+        return deltas
+
+    def _dispatch(self, deltas: list):
+        if not self._data_lines:
+            return
+        payload = self._data_lines[0] if len(self._data_lines) == 1 else b"\n".join(self._data_lines)
+        self._data_lines = []
+        if payload == b"[DONE]":
+            self.finished = True
+            return
+        # Events carrying a usage object always take the json path, content or not
+        if not payload.startswith(_ERROR_PREFIX) and payload.find(_USAGE_OBJECT) < 0:
+            content = _extract_content(payload, _DELTA_OBJECT)
+            if content is not None:
+                if content:
+                    deltas.append(content)
+                return
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError:
+            return
+        if isinstance(data, dict) and "error" in data:
+            error = data["error"]
+            deltas.append(format_error("API ERROR", error.get("message", error) if isinstance(error, dict) else error))
+            self.finished = True
+            return
+        if not isinstance(data, dict):
+            return
+        # OpenAI sends usage in a closing event with no choices; Groq nests it in x_groq
+        usage = data.get("usage") or (data.get("x_groq") or {}).get("usage")
+        if usage:
+            self.usage = usage
+        choices = data.get("choices")
+        if choices:
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                deltas.append(content)
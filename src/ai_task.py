@@ -0,0 +1,47 @@
+# src/ai_task.py
+
+from concurrent.futures import Future
+
+# Kinds of items a task puts on the response queue as (task_id, kind, payload)
+STREAM_START = "start"                  # payload: None, or the channel names of a multi-target task
+STREAM_CHUNK = "chunk"
+STREAM_CHANNEL_CHUNK = "channel_chunk"  # payload: (channel, text)
+STREAM_PROGRESS = "progress"
+STREAM_END = "end"
+
+class AITask:
+    """Handle for one in-flight AI generation, returned by start_ai_task."""
+
+    def __init__(self, task_id: int, action: str):
+        self.task_id = task_id
+        self.action = action
+        self.cancelled = False
+        self.trace = None # metrics.RequestTrace for live requests
+        self.source: tuple[str, str] | None = None # (action key, text) the task was started for
+        self._future: Future | None = None
+
+    def attach(self, future: Future):
+        """Binds the coroutine future that is producing this task's stream."""
+        self._future = future
+        if self.cancelled:
+            future.cancel()
+
+    def cancel(self):
+        """
+        Stops the generation. Cancelling the future cancels the coroutine on the
+        event loop, which closes the HTTP response mid-stream.
+        """
+        self.cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+    def when_done(self, callback):
+        """Calls callback() once the generation has stopped, right away if it already has."""
+        if self._future is None or self._future.done():
+            callback()
+        else:
+            self._future.add_done_callback(lambda _future: callback())
+
+    @property
+    def done(self) -> bool:
+        return self.cancelled or (self._future is not None and self._future.done())
@@ -1,113 +1,468 @@
+import asyncio
 import customtkinter as ctk
-import threading
+import itertools
 import queue
-import pyperclip
+import time
+from typing import Mapping
 
-from src import prompts
-from src.ai_clients import get_ai_client
-from src.clipboard_handler import get_selected_text_auto
-from src.hotkey_manager import start_listener
-from src.settings_manager import SettingsManager
+from src import config, metrics, token_estimator
+from src.ai_clients import is_error_chunk
+from src.ai_task import AITask, STREAM_START, STREAM_CHUNK, STREAM_CHANNEL_CHUNK, STREAM_PROGRESS, STREAM_END
+from src.async_runner import AsyncLoopThread
+from src.clipboard_handler import ClipboardCapture, create_backend
+from src.history_store import HistoryStore
+from src.hotkey_manager import HotkeyListener, start_listener
+from src.pipeline import ActionRequest, create_client, describe_client
+from src.response_cache import ResponseCache
+from src.segment_index import SegmentIndex
+from src.settings_manager import SettingsManager, connection_signature
+from src.speculation import ActionPredictor, SpeculativeStream, action_key, parse_action_key
+from src.token_estimator import PLAN_DIRECT
 from src.ui.main_window import MainWindow
 
 class QuickAIToolkit:
-    def __init__(self, root: ctk.CTk):
+    def __init__(self, root: ctk.CTk, hotkey_listener: HotkeyListener | None = None):
         self.root = root
         self.root.withdraw()
 
         # --- State Management ---
         self.selected_text = ""
-        self.response_queue = queue.Queue()
-        self.is_task_running = False
+        self.response_queue = queue.Queue() # Items are (task_id, kind, payload) tuples
+        self.current_task: AITask | None = None
+        self._task_ids = itertools.count(1)
+        self._pump_scheduled = False
+        self._frame_interval_ms = max(1, 1000 // config.STREAM_MAX_FPS)
+        self._activation_marks: dict[str, float] = {}
+        self.latency_stats = metrics.LatencyStats()
         self.current_panel_view = "ai"
 
         # --- System Integration ---
+        # A single event loop thread drives every AI request
+        self.async_loop = AsyncLoopThread()
+        self.async_loop.start()
         self.settings_manager = SettingsManager()
+        # Listeners may run on the watcher thread; hop to the UI thread before touching anything
+        self.settings_manager.add_listener(lambda old, new: self.root.after(0, self._on_settings_changed, old, new))
+        self.settings_manager.watch()
+        history_settings = self.settings_manager.get("history", {})
+        self.history: HistoryStore | None = None
+        if history_settings.get("enabled", True):
+            self.history = HistoryStore(
+                config.HISTORY_DB_PATH,
+                retention_days=history_settings.get("retention_days", 90),
+                max_entries=history_settings.get("max_entries", 200000),
+            )
+        cache_settings = self.settings_manager.get("response_cache", {})
+        self.response_cache = ResponseCache(
+            config.CACHE_DB_PATH,
+            max_memory_entries=cache_settings.get("max_memory_entries", 128),
+            max_disk_entries=cache_settings.get("max_disk_entries", 2000),
+            ttl_seconds=cache_settings.get("ttl_seconds", 604800),
+            warm_source=self.history.lookup if self.history and history_settings.get("warm_cache", True) else None,
+        )
+        incremental_settings = self.settings_manager.get("incremental", {})
+        self.segment_index: SegmentIndex | None = None
+        if incremental_settings.get("enabled", True):
+            self.segment_index = SegmentIndex(config.SEGMENT_INDEX_PATH, max_entries=incremental_settings.get("max_entries", 20000))
+        speculative_settings = self.settings_manager.get("speculative", {})
+        self.action_predictor = ActionPredictor(
+            config.ACTION_STATS_PATH,
+            min_samples=speculative_settings.get("min_samples", 5),
+            min_share=speculative_settings.get("min_share", 0.5),
+        )
+        self.speculation: SpeculativeStream | None = None
+        clipboard_settings = self.settings_manager.get("clipboard", {})
+        self.clipboard_capture = ClipboardCapture(
+            create_backend(clipboard_settings.get("backend", "auto")),
+            timeout_ms=clipboard_settings.get("timeout_ms", 500),
+            poll_interval_ms=clipboard_settings.get("poll_interval_ms", 5),
+        )
         self.ai_client = None
         self._create_ai_client()
+        self._warm_up_client()
 
         # --- UI Manager ---
         self.ui = MainWindow(root, self)
 
         # --- Start Background Services ---
-        start_listener(self.on_hotkey_activate_auto, self.on_hotkey_activate_manual)
-        self.process_queue()
+        if hotkey_listener:
+            hotkey_listener.bind(self.on_hotkey_activate_auto, self.on_hotkey_activate_manual)
+        else:
+            start_listener(self.on_hotkey_activate_auto, self.on_hotkey_activate_manual)
+        self._schedule_keep_alive()
 
     def _create_ai_client(self):
-        provider_name = self.settings_manager.get("current_provider")
-        provider_settings = self.settings_manager.get_current_provider_info()
+        # Release the old provider's pooled connections, but only once the task
+        # streaming through them has finished: closing them mid-stream would fail it
+        self.cancel_speculation()
+        if self.ai_client:
+            old_client, self.ai_client = self.ai_client, None
+
+            def release():
+                old_client.close()
+                self.async_loop.submit(old_client.aclose())
+
+            if self.current_task:
+                self.current_task.when_done(release)
+            else:
+                release()
+
+        provider_name, _model_names = describe_client(self.settings_manager)
         try:
-            self.ai_client = get_ai_client(provider_name, provider_settings)
+            self.ai_client = create_client(self.settings_manager)
             print(f"AI client initialized for provider: {provider_name}")
         except ValueError as e:
             print(f"Error creating AI client: {e}")
             self.ai_client = None
 
+    # --- Model Warm-up ---
+    def _warm_up_client(self, reason: str = "startup"):
+        """Loads the local model in the background so the first request skips the load."""
+        if not self.ai_client or not self.settings_manager.get("warm_up", {}).get("enabled", True):
+            return
+        future = self.async_loop.submit(self.ai_client.awarm_up())
+
+        def report(done_future):
+            if done_future.cancelled() or done_future.exception() or not done_future.result():
+                return
+            result = done_future.result()
+            load_ms = result.get("load_ms", result["elapsed_ms"])
+            state = "cold" if load_ms >= metrics.COLD_START_LOAD_MS else "warm"
+            print(f"Model warm-up ({reason}): '{result['model']}' ready in {result['elapsed_ms']:.0f} ms ({state}, load {load_ms:.0f} ms)")
+
+        future.add_done_callback(report)
+
+    def _schedule_keep_alive(self):
+        """Re-warms the model periodically so it stays resident while the listener runs."""
+        interval_s = self.settings_manager.get("warm_up", {}).get("refresh_interval_s", 240)
+        if interval_s and interval_s > 0:
+            self.root.after(int(interval_s * 1000), self._keep_alive_tick)
+
+    def _keep_alive_tick(self):
+        # Skip while a request is streaming: it renews the keep-alive itself
+        if not self.current_task:
+            self._warm_up_client(reason="keep-alive")
+        self._schedule_keep_alive()
+
     # --- Hotkey & Activation Logic ---
     def on_hotkey_activate_auto(self):
-        self.root.after(0, self._activate_sequence, get_selected_text_auto, "auto")
+        self.root.after(0, self._activate_sequence, self.clipboard_capture.capture_selection, "auto", time.perf_counter())
 
     def on_hotkey_activate_manual(self):
-        self.root.after(0, self._activate_sequence, pyperclip.paste, "manual")
+        self.root.after(0, self._activate_sequence, self._paste_clipboard, "manual", time.perf_counter())
+
+    @staticmethod
+    def _paste_clipboard() -> str:
+        import pyperclip # Deferred: not needed until the first manual activation
+        return pyperclip.paste()
         
-    def _activate_sequence(self, text_getter, activation_mode: str):
+    def _activate_sequence(self, text_getter, activation_mode: str, hotkey_time: float):
+        capture_start = time.perf_counter()
         text = text_getter()
+        self._activation_marks = {"hotkey": hotkey_time, "capture_start": capture_start, "capture_end": time.perf_counter()}
         if text and text.strip():
             self.selected_text = text
             self.ui.show(activation_mode=activation_mode)
+            self._start_speculation()
         else:
             print("Activation failed: No text captured.")
 
     # --- AI Task Management ---
-    def start_ai_task(self, action: str, **kwargs):
+    def start_ai_task(self, action: str, **kwargs) -> AITask | None:
+        """Starts an AI action on the selected text and returns its cancellable handle."""
         if not self.ai_client:
             print("AI client not available. Check settings.")
-            return
-        if self.is_task_running:
-            return
+            return None
         
-        self.is_task_running = True
+        key = action_key(action, **kwargs)
+        running = self.current_task
+        if running and not running.done and running.source == (key, self.selected_text):
+            return running # A double-click or repeated hotkey keeps the stream it already started
+
+        # A new action supersedes whatever is still streaming
+        self.cancel_current_task()
+        if self.settings_manager.get("speculative", {}).get("enabled", False):
+            self.action_predictor.record(key) # Only predictions need the counts
+        speculation = self._take_speculation(key)
+        task = AITask(next(self._task_ids), action)
+        task.source = (key, self.selected_text)
+        self.current_task = task
         self.ui.display_loading() # Show panel and loading icon immediately
         
-        messages = prompts.get_prompt_messages(action, self.selected_text, **kwargs)
-        if messages:
-            threading.Thread(target=self._run_ai_stream, args=(messages,), daemon=True).start()
-        else:
-            self.is_task_running = False # Reset if prompt generation fails
+        request = ActionRequest(self.settings_manager, action, self.selected_text, **kwargs)
+        if not request.is_valid:
+            if speculation:
+                speculation.cancel()
+            self.current_task = None # Reset if prompt generation fails
             self.ui.hide_panel()
+            return None
+
+        # Budget guard: oversized selections are rejected before anything is sent
+        if request.is_rejected:
+            if speculation:
+                speculation.cancel()
+            self._put_complete_response(task.task_id, request.rejection_message())
+            self._wake_queue_pump()
+            return task
+
+        cached_response = self.response_cache.get(request.cache_key) if request.cache_key else None
+        if cached_response is not None:
+            # Replay through the normal stream path so the UI handles it identically
+            self._put_complete_response(task.task_id, cached_response)
+        elif speculation and self._adopt_speculation(task, speculation, request):
+            print(f"Speculative hit for '{key}' ({len(speculation.chunks)} chunks buffered)")
+            speculation = None
+        else:
+            if self.segment_index:
+                reused = request.plan_incremental(self.segment_index)
+                if reused:
+                    changed = sum(output is None for _text, output in request.segments)
+                    print(f"Incremental '{key}': {reused} paragraph(s) reused, {changed} segment(s) sent")
+            task.trace = metrics.RequestTrace(request.provider_name, action)
+            task.trace.marks.update(self._activation_marks)
+            task.trace.mark("task_start")
+            on_progress = lambda text: self.response_queue.put((task.task_id, STREAM_PROGRESS, text))
+            chunk_stream = request.open_stream(self.ai_client, on_progress)
+            task.attach(self.async_loop.submit(self._run_ai_stream(task.task_id, chunk_stream, request, task.trace)))
+        if speculation:
+            speculation.cancel() # Superseded by the cache or the rejection path
+        self._wake_queue_pump()
+        return task
+
+    # --- Speculative Prefetch ---
+    def _start_speculation(self):
+        """
+        Opt-in: starts the action the user most likely wants as soon as the text
+        is captured, buffering its output until the user confirms or declines.
+        """
+        self.cancel_speculation()
+        settings = self.settings_manager.get("speculative", {})
+        if not settings.get("enabled", False) or not self.ai_client:
+            return
+        key = self.action_predictor.predict()
+        if key is None:
+            return
+        action, prompt_kwargs = parse_action_key(key)
+        request = ActionRequest(self.settings_manager, action, self.selected_text, **prompt_kwargs)
+        # Only short, uncached, single-request inputs are worth betting on
+        if not request.is_valid or request.plan != PLAN_DIRECT:
+            return
+        if request.input_tokens > settings.get("max_input_tokens", 1500):
+            return
+        if request.cache_key and self.response_cache.get(request.cache_key) is not None:
+            return
+
+        speculation = SpeculativeStream(key, self.selected_text, settings.get("max_output_tokens", 400))
+        speculation.future = self.async_loop.submit(speculation.run(request.open_stream(self.ai_client)))
+        self.speculation = speculation
+
+    def _take_speculation(self, key: str) -> SpeculativeStream | None:
+        """Hands over the pending speculation if it matches the chosen action; cancels it otherwise."""
+        speculation, self.speculation = self.speculation, None
+        if speculation and speculation.matches(key, self.selected_text):
+            return speculation
+        if speculation:
+            speculation.cancel()
+        return None
+
+    def _adopt_speculation(self, task: AITask, speculation: SpeculativeStream, request: ActionRequest) -> bool:
+        """Routes a speculative stream into the task: buffered chunks first, then live ones."""
+        task_id = task.task_id
+        started = False
+
+        def sink(chunk: str | None):
+            nonlocal started
+            if chunk is not None:
+                if not started:
+                    self.response_queue.put((task_id, STREAM_START, None))
+                    started = True
+                self.response_queue.put((task_id, STREAM_CHUNK, chunk))
+                return
+            if speculation.complete:
+                self._store_result(request, "".join(speculation.chunks), speculation.failed)
+            self.response_queue.put((task_id, STREAM_END, None))
+
+        if not speculation.adopt(sink):
+            speculation.cancel()
+            return False
+        task.attach(speculation.future)
+        return True
 
-    def _run_ai_stream(self, messages: list):
+    def cancel_speculation(self):
+        if self.speculation:
+            self.speculation.cancel()
+            self.speculation = None
+
+    def _put_complete_response(self, task_id: int, text: str):
+        """Queues an already complete response as a one-chunk stream."""
+        self.response_queue.put((task_id, STREAM_START, None))
+        self.response_queue.put((task_id, STREAM_CHUNK, text))
+        self.response_queue.put((task_id, STREAM_END, None))
+
+    def cancel_current_task(self):
+        """Cancels the in-flight task, if any. Its late chunks are dropped by task id."""
+        if self.current_task:
+            self.current_task.cancel()
+            self.current_task = None
+
+    def _store_result(self, request: ActionRequest, output: str, failed: bool, trace: metrics.RequestTrace | None = None):
+        """Caches a completed response and appends it to the history."""
+        if not output:
+            return
+        if request.cache_key and not failed:
+            self.response_cache.put(request.cache_key, output)
+        if self.segment_index and request.segment_scope and not failed:
+            self.segment_index.record(request.segment_scope, request.text, output)
+        if self.history:
+            summary = trace.summary() if trace else {}
+            marks = trace.marks if trace else {}
+            self.history.record({
+                "provider": request.provider_name,
+                "model": request.model_name,
+                "action": request.action,
+                "target_language": request.prompt_kwargs.get("target_language"),
+                "input": request.text,
+                "output": output,
+                "cache_key": request.cache_key,
+                "failed": failed,
+                "ttft_ms": summary.get("ttft_ms"),
+                "duration_ms": (marks["last_token"] - marks["task_start"]) * 1000 if "last_token" in marks and "task_start" in marks else None,
+                "input_tokens": request.input_tokens,
+                "output_tokens": token_estimator.estimate_tokens(output),
+            })
+
+    async def _run_ai_stream(self, task_id: int, chunk_stream, request: ActionRequest, trace: metrics.RequestTrace | None = None):
+        metrics.current_trace.set(trace) # Scoped to this task's context
+        chunks = []
+        failed = False
         try:
             stream_started = False
-            for chunk in self.ai_client.stream_response(messages):
+            async for chunk in chunk_stream:
                 if not stream_started:
-                    self.response_queue.put("---START_STREAM---")
+                    self.response_queue.put((task_id, STREAM_START, None))
                     stream_started = True
-                self.response_queue.put(chunk)
+                if is_error_chunk(chunk):
+                    failed = True
+                chunks.append(chunk)
+                self.response_queue.put((task_id, STREAM_CHUNK, chunk))
+            self._store_result(request, "".join(chunks), failed, trace)
+        finally:
+            self.response_queue.put((task_id, STREAM_END, None)) # Sentinel value for stream end
+
+    def start_multi_translation(self, target_languages: list[str]) -> AITask | None:
+        """Translates the selected text into several languages concurrently, one panel tab each."""
+        if not self.ai_client:
+            print("AI client not available. Check settings.")
+            return None
+        if not target_languages:
+            return None
+
+        self.cancel_current_task()
+        self.cancel_speculation()
+        task = AITask(next(self._task_ids), "translate_multi")
+        self.current_task = task
+        self.ui.display_loading()
+
+        requests = [ActionRequest(self.settings_manager, "translate", self.selected_text, target_language=lang) for lang in target_languages]
+        max_parallel = self.settings_manager.get("multi_translate", {}).get("max_parallel", 3)
+        task.attach(self.async_loop.submit(self._run_multi_translation(task.task_id, requests, max_parallel)))
+        self._wake_queue_pump()
+        return task
+
+    async def _run_multi_translation(self, task_id: int, requests: list[ActionRequest], max_parallel: int):
+        semaphore = asyncio.Semaphore(max(1, max_parallel))
+        self.response_queue.put((task_id, STREAM_START, [r.prompt_kwargs["target_language"] for r in requests]))
+
+        async def run_one(request: ActionRequest):
+            channel = request.prompt_kwargs["target_language"]
+            if request.is_rejected:
+                self.response_queue.put((task_id, STREAM_CHANNEL_CHUNK, (channel, request.rejection_message())))
+                return
+            cached_response = self.response_cache.get(request.cache_key) if request.cache_key else None
+            if cached_response is not None:
+                self.response_queue.put((task_id, STREAM_CHANNEL_CHUNK, (channel, cached_response)))
+                return
+            async with semaphore:
+                chunks = []
+                failed = False
+                async for chunk in request.open_stream(self.ai_client):
+                    failed = failed or is_error_chunk(chunk)
+                    chunks.append(chunk)
+                    self.response_queue.put((task_id, STREAM_CHANNEL_CHUNK, (channel, chunk)))
+            self._store_result(request, "".join(chunks), failed)
+
+        try:
+            await asyncio.gather(*(run_one(request) for request in requests))
         finally:
-            self.response_queue.put(None) # Sentinel value for stream end
+            self.response_queue.put((task_id, STREAM_END, None))
+
+    def _wake_queue_pump(self):
+        """Starts the UI pump on the next idle cycle unless it is already scheduled."""
+        if not self._pump_scheduled:
+            self._pump_scheduled = True
+            self.root.after_idle(self.process_queue)
 
     def process_queue(self):
+        """
+        Drains everything queued since the last frame and renders it with a
+        single textbox insert. Reschedules itself at the frame interval while a
+        task is active and goes idle otherwise.
+        """
+        self._pump_scheduled = False
+        pending_text = []
+        pending_channels: dict[str, list[str]] = {}
+        trace = self.current_task.trace if self.current_task else None
+        finished_trace = None
+        stream_ended = False
         try:
-            while not self.response_queue.empty():
-                item = self.response_queue.get_nowait()
-                if item == "---START_STREAM---":
-                    self.ui.show_stream_start()
-                elif item is None:
-                    self.is_task_running = False
+            while True:
+                try:
+                    task_id, kind, payload = self.response_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if not self.current_task or task_id != self.current_task.task_id:
+                    continue # Late chunk from a cancelled or superseded task
+                if kind == STREAM_START:
+                    pending_text.clear()
+                    if payload:
+                        self.ui.show_multi_stream_start(payload)
+                    else:
+                        self.ui.show_stream_start()
+                elif kind == STREAM_CHANNEL_CHUNK:
+                    channel, text = payload
+                    pending_channels.setdefault(channel, []).append(text)
+                elif kind == STREAM_PROGRESS:
+                    self.ui.show_progress(payload)
+                elif kind == STREAM_END:
+                    finished_trace = self.current_task.trace
+                    stream_ended = True
+                    self.current_task = None
                 else:
-                    self.ui.append_stream_content(item)
+                    pending_text.append(payload)
         finally:
-            self.root.after(100, self.process_queue)
+            if pending_text:
+                self.ui.append_stream_content("".join(pending_text))
+                if trace:
+                    trace.mark("first_render")
+                    trace.mark("last_render", overwrite=True)
+            for channel, texts in pending_channels.items():
+                self.ui.append_channel_content(channel, "".join(texts))
+            if stream_ended:
+                self.ui.finish_stream()
+            if finished_trace:
+                self.latency_stats.record(finished_trace)
+            if self.current_task or not self.response_queue.empty():
+                self._pump_scheduled = True
+                self.root.after(self._frame_interval_ms, self.process_queue)
 
     # --- Callbacks from UI ---
     def on_panel_hidden(self):
         """Callback executed when the UI panel is fully hidden."""
-        self.is_task_running = False
+        self.cancel_current_task()
         self.ui.clear_feedback_text()
 
     def show_settings_panel(self):
-        if self.ui.is_panel_visible and self.current_panel_view == "ai":
+        if self.ui.is_panel_visible and self.current_panel_view != "settings":
             self.ui.switch_panel_view("settings")
         elif not self.ui.is_panel_visible:
             self.ui.switch_panel_view("settings")
@@ -118,19 +473,61 @@ class QuickAIToolkit:
 
     def save_settings(self):
         current_provider = self.ui.settings_widgets["provider_var"].get()
-        new_settings = self.settings_manager.settings.copy()
-        new_settings["current_provider"] = current_provider
-        
-        provider_settings = new_settings["providers"][current_provider]
-        provider_settings["api_url"] = self.ui.settings_widgets["api_url_entry"].get()
-        provider_settings["model_name"] = self.ui.settings_widgets["model_name_entry"].get()
-        provider_settings["api_key"] = self.ui.settings_widgets["api_key_entry"].get()
-        
-        self.settings_manager.save_settings(new_settings)
-        self._create_ai_client()
+        # Applied at once; written to disk in the background. The listener rebuilds the client if needed.
+        self.settings_manager.update({
+            "current_provider": current_provider,
+            "providers": {current_provider: {
+                "api_url": self.ui.settings_widgets["api_url_entry"].get(),
+                "model_name": self.ui.settings_widgets["model_name_entry"].get(),
+                "api_key": self.ui.settings_widgets["api_key_entry"].get(),
+            }},
+            "response_cache": {"enabled": bool(self.ui.settings_widgets["cache_enabled_var"].get())},
+        })
         self.ui.hide_panel()
 
+    def _on_settings_changed(self, old: Mapping, new: Mapping):
+        """Applies a settings change, from the settings panel or an edit to the file."""
+        if connection_signature(old) == connection_signature(new):
+            return # e.g. only the cache toggle changed: the client and its warm connections stay
+        def current_model(settings: Mapping) -> tuple:
+            provider_name = settings.get("current_provider")
+            return provider_name, settings.get("providers", {}).get(provider_name, {}).get("model_name")
+        self._create_ai_client()
+        if current_model(old) != current_model(new):
+            self._warm_up_client(reason="model change")
+
+    def clear_response_cache(self):
+        self.response_cache.clear()
+        if self.segment_index:
+            self.segment_index.clear() # Reused paragraphs are cached output too
+        self.ui.update_cache_stats(self.response_cache.stats())
+
+    def show_history(self):
+        self.ui.switch_panel_view("history")
+
+    def search_history(self, text: str):
+        if not self.history:
+            self.ui.populate_history_view([], "History is disabled in settings.")
+            return
+        self.ui.populate_history_view(self.history.search(text, limit=50))
+
+    def show_latency_stats(self):
+        self.ui.switch_panel_view("stats")
+
+    def export_latency_stats(self, file_format: str):
+        if file_format == "csv":
+            path = config.STATS_EXPORT_CSV_PATH
+            self.latency_stats.export_csv(path)
+        else:
+            path = config.STATS_EXPORT_JSON_PATH
+            self.latency_stats.export_json(path)
+        print(f"Latency stats exported to {path}")
+        self.ui.show_stats_message(f"Exported to {path}")
+
     def on_language_select(self, lang_code: str):
-        if hasattr(self.ui, "_translation_menu") and self.ui._translation_menu.winfo_exists():
-            self.ui._translation_menu.destroy()
-        self.start_ai_task("translate", target_language=lang_code)
\ No newline at end of file
+        self.ui.hide_translation_menu()
+        self.start_ai_task("translate", target_language=lang_code)
+
+    def on_multi_language_select(self, lang_codes: list[str]):
+        self.ui.hide_translation_menu()
+        self.start_multi_translation(lang_codes)
\ No newline at end of file
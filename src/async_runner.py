@@ -0,0 +1,30 @@
+# src/async_runner.py
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Coroutine
+
+class AsyncLoopThread:
+    """Owns one long-lived asyncio event loop running on a daemon thread."""
+
+    def __init__(self, name: str = "QuickAI-AsyncLoop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedules a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        """Stops the loop and waits for its thread to finish."""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=2)
@@ -0,0 +1,193 @@
+# src/batch.py
+"""
+Headless batch runner for the toolkit's prompt actions.
+
+Streams JSONL or plain-text records from files or stdin, sends them through
+the configured AI client with bounded concurrency and writes the results in
+input order. Never imports the UI or hotkey modules.
+
+Usage:
+    python -m src.batch --action polish_text --input strings.jsonl --output out.jsonl
+    cat tickets.txt | python -m src.batch --action translate --target-language English --format text
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Iterator, TextIO
+
+from src import config
+from src.ai_clients import PRIORITY_BACKGROUND, current_priority
+from src.pipeline import ActionRequest, collect_response, create_client
+from src.response_cache import ResponseCache
+from src.settings_manager import SettingsManager
+
+def read_records(stream: TextIO, input_format: str) -> Iterator[dict]:
+    """
+    Yields records lazily. JSONL lines are objects with a 'text' field and
+    optional 'id', 'action' and 'target_language'; text lines are the text itself.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if input_format == "jsonl":
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = {"error": f"line {line_number}: invalid JSON ({e})"}
+            yield record if isinstance(record, dict) else {"error": f"line {line_number}: expected a JSON object"}
+        else:
+            yield {"text": line}
+
+def format_result(index: int, record: dict, output: str | None, error: str | None, output_format: str) -> str:
+    if output_format == "jsonl":
+        result = {"index": index, "id": record.get("id", index), "output": output}
+        if error:
+            result["error"] = error
+        return json.dumps(result, ensure_ascii=False) + "\n"
+    # Plain text keeps one result per line, so embedded newlines are escaped
+    return (output if output is not None else f"[error] {error}").replace("\n", "\\n") + "\n"
+
+def load_checkpoint(path: str | None) -> int:
+    """Returns how many records were already written by a previous run."""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, 'r', encoding='utf-8') as f:
+        return int(json.load(f).get("next_index", 0))
+
+def save_checkpoint(path: str | None, next_index: int):
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"next_index": next_index}, f)
+    os.replace(temp_path, path)
+
+async def run_batch(args, input_stream: TextIO, output_stream: TextIO) -> int:
+    current_priority.set(PRIORITY_BACKGROUND) # Yield to interactive requests on a shared provider
+    settings_manager = SettingsManager()
+    client = create_client(settings_manager, args.provider)
+    if args.provider:
+        # Requests are keyed and recorded under the provider that answers them, not the router
+        settings_manager.update({"current_provider": args.provider, "routing": {"enabled": False}}, persist=False)
+
+    cache = None
+    if not args.no_cache and settings_manager.get("response_cache", {}).get("enabled", True):
+        cache = ResponseCache(config.CACHE_DB_PATH)
+
+    start_index = load_checkpoint(args.checkpoint)
+    concurrency = max(1, args.concurrency)
+    window = asyncio.Semaphore(concurrency * 4)  # Bounds records held in memory
+    requests_slots = asyncio.Semaphore(concurrency)
+    finished: dict[int, tuple[dict, str | None, str | None]] = {}
+    next_to_write = start_index
+    written = 0
+
+    async def respond(record: dict) -> tuple[str | None, str | None]:
+        """Returns (output, error) for one record."""
+        if record.get("error"):
+            return None, record["error"]
+        text = record.get("text", "")
+        action = record.get("action", args.action)
+        target_language = record.get("target_language", args.target_language)
+        if not isinstance(text, str) or not isinstance(action, str) or not isinstance(target_language, (str, type(None))):
+            return None, "text, action and target_language must be strings"
+        request = ActionRequest(settings_manager, action, text, target_language=target_language)
+        if not request.is_valid:
+            return None, f"invalid action or missing target language: {request.action}"
+        if request.is_rejected:
+            return None, request.rejection_message().strip()
+        output = cache.get(request.cache_key) if cache and request.cache_key else None
+        if output is None:
+            async with requests_slots:
+                output, failed = await collect_response(request.open_stream(client))
+            if failed:
+                return None, output.strip()
+            if cache and request.cache_key:
+                cache.put(request.cache_key, output)
+        return output, None
+
+    async def process(index: int, record: dict):
+        nonlocal next_to_write, written
+        try:
+            output, error = await respond(record)
+        except Exception as e:
+            # One bad record must not stall the ordered writer behind it
+            output, error = None, f"{type(e).__name__}: {e}"
+        finally:
+            window.release()
+
+        # Write every contiguous finished record, keeping input order
+        finished[index] = (record, output, error)
+        while next_to_write in finished:
+            done_record, done_output, done_error = finished.pop(next_to_write)
+            output_stream.write(format_result(next_to_write, done_record, done_output, done_error, args.format))
+            next_to_write += 1
+            written += 1
+        output_stream.flush()
+        save_checkpoint(args.checkpoint, next_to_write)
+
+    tasks = []
+    try:
+        for index, record in enumerate(read_records(input_stream, args.format)):
+            if index < start_index:
+                continue # Already written by a previous run
+            await window.acquire()
+            tasks.append(asyncio.create_task(process(index, record)))
+            tasks = _reap(tasks)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await client.aclose()
+        client.close()
+        if cache:
+            cache.close()
+    return written
+
+def _reap(tasks: list[asyncio.Task]) -> list[asyncio.Task]:
+    """Drops finished tasks, re-raising the first failure instead of losing it."""
+    pending = []
+    for task in tasks:
+        if not task.done():
+            pending.append(task)
+        elif task.exception() is not None:
+            raise task.exception()
+    return pending
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.batch", description="Run QuickAI-Toolkit prompt actions over files or stdin.")
+    parser.add_argument("--action", required=True, help="Prompt action, e.g. polish_text, summarize_points or translate.")
+    parser.add_argument("--target-language", help="Target language for the translate action.")
+    parser.add_argument("--input", default="-", help="Input file, or '-' for stdin (default).")
+    parser.add_argument("--output", default="-", help="Output file, or '-' for stdout (default).")
+    parser.add_argument("--format", choices=("jsonl", "text"), default="jsonl", help="Record format of input and output.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum requests in flight.")
+    parser.add_argument("--checkpoint", help="Checkpoint file; an existing one resumes the run.")
+    parser.add_argument("--provider", help="Provider from settings.json (defaults to the current one, or routing if enabled).")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache.")
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    resuming = load_checkpoint(args.checkpoint) > 0
+    input_stream = sys.stdin if args.input == "-" else open(args.input, 'r', encoding='utf-8')
+    output_stream = sys.stdout if args.output == "-" else open(args.output, 'a' if resuming else 'w', encoding='utf-8')
+    try:
+        written = asyncio.run(run_batch(args, input_stream, output_stream))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    print(f"Batch finished: {written} records written.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,16 @@
 # src/clipboard_handler.py
 
 import ctypes
+import sys
+import threading
 import time
-import pyperclip
+from abc import ABC, abstractmethod
 from ctypes import wintypes
 
+DEFAULT_CAPTURE_TIMEOUT_MS = 500
+DEFAULT_POLL_INTERVAL_MS = 5
+
 # --- WinAPI Definitions ---
-user32 = ctypes.WinDLL('user32', use_last_error=True)
 INPUT_KEYBOARD = 1
 KEYEVENTF_KEYUP = 0x0002
 VK_CONTROL = 0x11
@@ -25,43 +29,181 @@ class Input_I(ctypes.Union):
 class Input(ctypes.Structure):
     _fields_ = [("type", wintypes.DWORD), ("ii", Input_I)]
 
-def _send_input(inputs):
-    n_inputs = len(inputs)
-    lp_input = (Input * n_inputs)(*inputs)
-    cb_size = ctypes.sizeof(Input)
-    return user32.SendInput(n_inputs, lp_input, cb_size)
+def _key_input(hex_key_code, flags: int = 0) -> Input:
+    return Input(type=INPUT_KEYBOARD, ii=Input_I(ki=KeyBdInput(wVk=hex_key_code, dwFlags=flags)))
 
-def _press_key(hex_key_code):
-    x = Input(type=INPUT_KEYBOARD,
-              ii=Input_I(ki=KeyBdInput(wVk=hex_key_code)))
-    _send_input([x])
+# --- Capture Backends ---
+class CaptureBackend(ABC):
+    """Platform access needed to copy the current selection through the clipboard."""
 
-def _release_key(hex_key_code):
-    x = Input(type=INPUT_KEYBOARD,
-              ii=Input_I(ki=KeyBdInput(wVk=hex_key_code, dwFlags=KEYEVENTF_KEYUP)))
-    _send_input([x])
+    @abstractmethod
+    def send_copy(self):
+        """Sends the copy shortcut to the focused application."""
 
-def get_selected_text_auto() -> str | None:
+    @abstractmethod
+    def read_text(self) -> str | None:
+        pass
+
+    @abstractmethod
+    def write_text(self, text: str):
+        pass
+
+    def sequence_number(self) -> int | None:
+        """
+        A counter that changes whenever the clipboard content changes, or None
+        if the platform has none (capture then falls back to clearing and polling).
+        """
+        return None
+
+class WindowsClipboardBackend(CaptureBackend):
+    """SendInput for Ctrl+C and GetClipboardSequenceNumber to detect the copy."""
+
+    def __init__(self):
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+
+    def send_copy(self):
+        # One SendInput call injects the whole chord atomically, no sleep between keys
+        inputs = [_key_input(VK_CONTROL), _key_input(VK_C), _key_input(VK_C, KEYEVENTF_KEYUP), _key_input(VK_CONTROL, KEYEVENTF_KEYUP)]
+        self.user32.SendInput(len(inputs), (Input * len(inputs))(*inputs), ctypes.sizeof(Input))
+
+    def read_text(self) -> str | None:
+        import pyperclip # Deferred to the first capture, off the startup path
+        return pyperclip.paste()
+
+    def write_text(self, text: str):
+        import pyperclip
+        pyperclip.copy(text)
+
+    def sequence_number(self) -> int | None:
+        return self.user32.GetClipboardSequenceNumber()
+
+class PyperclipBackend(CaptureBackend):
+    """Portable fallback: pynput for the shortcut, pyperclip for the clipboard."""
+
+    def send_copy(self):
+        from pynput import keyboard # Imported here: it needs a display on Linux
+        controller = keyboard.Controller()
+        modifier = keyboard.Key.cmd if sys.platform == "darwin" else keyboard.Key.ctrl
+        with controller.pressed(modifier):
+            controller.tap('c')
+
+    def read_text(self) -> str | None:
+        import pyperclip
+        return pyperclip.paste()
+
+    def write_text(self, text: str):
+        import pyperclip
+        pyperclip.copy(text)
+
+class FakeClipboardBackend(CaptureBackend):
     """
-    Saves original clipboard, simulates Ctrl+C, gets text, and restores clipboard.
-    Returns the captured text, or None if it fails.
+    In-memory clipboard whose 'application' answers the copy shortcut after
+    copy_latency_ms. Lets capture run and be benchmarked without a desktop.
     """
-    original_clipboard = pyperclip.paste()
-    pyperclip.copy('')
-    
-    try:
-        _press_key(VK_CONTROL)
-        _press_key(VK_C)
-        time.sleep(0.05)
-        _release_key(VK_C)
-        _release_key(VK_CONTROL)
-        
-        # Wait for the clipboard to be updated by the OS
-        time.sleep(0.1)
-        
-        selected_text = pyperclip.paste()
+
+    def __init__(self, selection: str | None = "", clipboard: str = "", copy_latency_ms: float = 20.0, with_sequence: bool = True):
+        self.selection = selection
+        self.clipboard = clipboard
+        self.copy_latency_ms = copy_latency_ms
+        self.with_sequence = with_sequence
+        self.reads = 0
+        self.writes = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def send_copy(self):
+        if self.selection is None:
+            return # Nothing selected: the application ignores the shortcut
+        timer = threading.Timer(self.copy_latency_ms / 1000, self._set_clipboard, args=(self.selection,))
+        timer.daemon = True
+        timer.start()
+
+    def _set_clipboard(self, text: str):
+        with self._lock:
+            self.clipboard = text
+            self._sequence += 1
+
+    def read_text(self) -> str | None:
+        with self._lock:
+            self.reads += 1
+            return self.clipboard
+
+    def write_text(self, text: str):
+        self.writes += 1
+        self._set_clipboard(text)
+
+    def sequence_number(self) -> int | None:
+        with self._lock:
+            return self._sequence if self.with_sequence else None
+
+BACKENDS = {
+    "windows": WindowsClipboardBackend,
+    "pyperclip": PyperclipBackend,
+    "fake": FakeClipboardBackend,
+}
+
+def create_backend(name: str = "auto") -> CaptureBackend:
+    """Builds a capture backend by name; 'auto' picks the best one for this platform."""
+    if name == "auto":
+        name = "windows" if sys.platform == "win32" else "pyperclip"
+    backend_class = BACKENDS.get(name)
+    if not backend_class:
+        raise ValueError(f"Unknown clipboard backend: {name}")
+    return backend_class()
+
+class ClipboardCapture:
+    """
+    Copies the current selection and restores the user's clipboard afterwards.
+    Waits for the clipboard to actually change, up to a deadline, instead of
+    sleeping a fixed time; the restore runs in the background.
+    """
+
+    def __init__(self, backend: CaptureBackend, timeout_ms: float = DEFAULT_CAPTURE_TIMEOUT_MS, poll_interval_ms: float = DEFAULT_POLL_INTERVAL_MS):
+        self.backend = backend
+        self.timeout_s = timeout_ms / 1000
+        self.poll_interval_s = poll_interval_ms / 1000
+        self._restore_thread: threading.Thread | None = None
+
+    def _wait_for(self, changed) -> bool:
+        deadline = time.perf_counter() + self.timeout_s
+        while not changed():
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(self.poll_interval_s)
+        return True
+
+    def capture_selection(self) -> str | None:
+        """Returns the selected text, or None if nothing was copied before the deadline."""
+        backend = self.backend
+        if self._restore_thread is not None:
+            self._restore_thread.join() # The previous capture's restore must land first
+        # Read before the copy, which overwrites it; only the write-back is deferred
+        original_clipboard = backend.read_text()
+        sequence = backend.sequence_number()
+        if sequence is None:
+            # No change counter: clear the clipboard so the copy is detectable
+            backend.write_text('')
+            backend.send_copy()
+            copied = self._wait_for(lambda: bool(backend.read_text()))
+        else:
+            backend.send_copy()
+            copied = self._wait_for(lambda: backend.sequence_number() != sequence)
+
+        selected_text = backend.read_text() if copied else None
+        if original_clipboard is not None and (sequence is None or copied) and selected_text != original_clipboard:
+            # The popup does not need the restore to finish, so do it off the caller's thread
+            self._restore_thread = threading.Thread(target=backend.write_text, args=(original_clipboard,), daemon=True)
+            self._restore_thread.start()
         return selected_text if selected_text else None
-        
-    finally:
-        # Restore the original clipboard content
-        pyperclip.copy(original_clipboard)
\ No newline at end of file
+
+_default_capture: ClipboardCapture | None = None
+
+def get_selected_text_auto() -> str | None:
+    """
+    Simulates Ctrl+C with the platform's default backend and returns the
+    captured text, or None if it fails. The original clipboard is restored.
+    """
+    global _default_capture
+    if _default_capture is None:
+        _default_capture = ClipboardCapture(create_backend())
+    return _default_capture.capture_selection()
@@ -2,6 +2,24 @@
 
 # --- Settings File ---
 SETTINGS_FILE_PATH = "settings.json"
+SETTINGS_SAVE_DELAY_S = 0.5      # Changes within this window are written together
+SETTINGS_POLL_INTERVAL_S = 1.0   # How often the file is checked for external edits
+
+# --- Response Cache ---
+CACHE_DB_PATH = "response_cache.db"
+
+# --- Request History ---
+HISTORY_DB_PATH = "history.db"
+
+# --- Incremental Re-processing ---
+SEGMENT_INDEX_PATH = "segment_index.db"
+
+# --- Speculative Prefetch ---
+ACTION_STATS_PATH = "action_stats.json"
+
+# --- Latency Stats Export ---
+STATS_EXPORT_JSON_PATH = "latency_stats.json"
+STATS_EXPORT_CSV_PATH = "latency_stats.csv"
 
 # --- Hotkey Configuration ---
 HOTKEY_AUTO_COPY = '<ctrl>+<alt>+q'
@@ -21,6 +39,7 @@ BUTTON_SIZE = 32
 
 # --- NEW: Animation Constants ---
 ANIMATION_DURATION_MS = 200  # Animation duration in milliseconds
+STREAM_MAX_FPS = 60          # Upper bound on textbox updates per second while streaming
 
 # --- NEW: Colors & Icons ---
 TRANSPARENT_COLOR = '#000001' 
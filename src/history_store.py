@@ -0,0 +1,213 @@
+# src/history_store.py
+
+import queue
+import sqlite3
+import threading
+import time
+
+# Columns of one history entry, in insertion order
+FIELDS = (
+    "created_at", "provider", "model", "action", "target_language", "input", "output",
+    "cache_key", "failed", "ttft_ms", "duration_ms", "input_tokens", "output_tokens",
+)
+# Trigram full-text search needs at least this many characters per term
+_MIN_FTS_TERM = 3
+
+class HistoryStore:
+    """
+    Append-only log of every completed request, searchable by text. Writes
+    are queued and committed in batches by a background thread, so callers
+    never wait on the disk.
+    """
+
+    def __init__(self, db_path: str, retention_days: float = 90, max_entries: int = 200000,
+                 batch_size: int = 64, flush_interval_s: float = 1.0, compact_every: int = 1000):
+        self.db_path = db_path
+        self.retention_days = float(retention_days)
+        self.max_entries = max(1, int(max_entries))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval_s = float(flush_interval_s)
+        self.compact_every = max(1, int(compact_every))
+
+        self._queue: queue.Queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._read_conn = self._connect()
+        self.has_fts = self._create_schema(self._read_conn)
+        self._writer = threading.Thread(target=self._write_loop, name="HistoryWriter", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL") # Only takes effect on a new database
+        # WAL lets searches run while the writer thread commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> bool:
+        """Creates the tables and indexes. Returns whether full-text search is available."""
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY, created_at REAL NOT NULL, provider TEXT, model TEXT, "
+            "action TEXT NOT NULL, target_language TEXT, input TEXT NOT NULL, output TEXT NOT NULL, "
+            "cache_key TEXT, failed INTEGER NOT NULL DEFAULT 0, ttft_ms REAL, duration_ms REAL, "
+            "input_tokens INTEGER, output_tokens INTEGER)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_created_at ON history(created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_action ON history(action, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_cache_key ON history(cache_key)")
+        try:
+            # External-content index: the text is stored once, in the history table
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+                "input, output, content='history', content_rowid='id', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            conn.commit()
+            return False # SQLite without FTS5 or the trigram tokenizer: search falls back to LIKE
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN "
+            "INSERT INTO history_fts(rowid, input, output) VALUES (new.id, new.input, new.output); END"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN "
+            "INSERT INTO history_fts(history_fts, rowid, input, output) VALUES ('delete', old.id, old.input, old.output); END"
+        )
+        conn.commit()
+        return True
+
+    # --- Writing ---
+    def record(self, entry: dict):
+        """Queues one entry (keys from FIELDS; created_at defaults to now). Never blocks."""
+        row = dict(entry)
+        row.setdefault("created_at", time.time())
+        row["failed"] = int(bool(row.get("failed", False)))
+        self._queue.put(tuple(row.get(field) for field in FIELDS))
+
+    def flush(self, timeout: float | None = None):
+        """Waits until every queued entry is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _write_loop(self):
+        conn = self._connect()
+        written_since_compaction = 0
+        self._compact(conn, optimize=True) # Full compaction once per start
+        while True:
+            batch, waiters, stop = [], [], False
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval_s
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT INTO history ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})", batch
+                        )
+                except sqlite3.Error as e:
+                    print(f"History write failed: {e}")
+                written_since_compaction += len(batch)
+                if written_since_compaction >= self.compact_every:
+                    self._compact(conn)
+                    written_since_compaction = 0
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                conn.close()
+                return
+
+    def _compact(self, conn: sqlite3.Connection, optimize: bool = False):
+        """
+        Drops entries past the retention age or beyond max_entries. With optimize,
+        also merges the full-text index and reclaims free pages (slower).
+        """
+        try:
+            with conn:
+                if self.retention_days > 0:
+                    conn.execute("DELETE FROM history WHERE created_at < ?", (time.time() - self.retention_days * 86400,))
+                conn.execute(
+                    "DELETE FROM history WHERE id IN ("
+                    "SELECT id FROM history ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            if optimize:
+                if self.has_fts:
+                    with conn:
+                        conn.execute("INSERT INTO history_fts(history_fts) VALUES ('optimize')")
+                conn.execute("PRAGMA incremental_vacuum")
+        except sqlite3.Error as e:
+            print(f"History compaction failed: {e}")
+
+    # --- Reading ---
+    def search(self, text: str = "", action: str | None = None, limit: int = 50) -> list[dict]:
+        """Newest entries whose input or output contains every term of text, optionally for one action."""
+        terms = text.split()
+        where, params = [], []
+        if action:
+            where.append("h.action = ?")
+            params.append(action)
+        fts_terms = [term for term in terms if len(term) >= _MIN_FTS_TERM] if self.has_fts else []
+        for term in terms:
+            if term not in fts_terms:
+                where.append("(h.input LIKE ? ESCAPE '\\' OR h.output LIKE ? ESCAPE '\\')")
+                pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                params.extend((pattern, pattern))
+        if fts_terms:
+            # Walking the index newest-first lets SQLite stop at the limit
+            sql = "SELECT h.* FROM history_fts JOIN history h ON h.id = history_fts.rowid"
+            where.insert(0, "history_fts MATCH ?")
+            params.insert(0, " ".join('"' + term.replace('"', '""') + '"' for term in fts_terms))
+            order = "history_fts.rowid"
+        else:
+            sql = "SELECT h.* FROM history h"
+            order = "h.id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Ids grow with time in this append-only table, so id order is recency order
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(int(limit))
+        with self._read_lock:
+            return [dict(row) for row in self._read_conn.execute(sql, params).fetchall()]
+
+    def lookup(self, cache_key: str, max_age_s: float = 0, min_created_at: float = 0) -> str | None:
+        """
+        The latest successful output recorded under cache_key, if it is newer than
+        max_age_s (0: any age) and min_created_at. Lets the response cache refill
+        entries it has evicted.
+        """
+        oldest = min_created_at
+        if max_age_s > 0:
+            oldest = max(oldest, time.time() - max_age_s)
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT output FROM history WHERE cache_key = ? AND failed = 0 AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (cache_key, oldest)
+            ).fetchone()
+        return row["output"] if row else None
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._read_conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def close(self):
+        """Commits what is still queued and stops the writer thread."""
+        self._queue.put(None)
+        self._writer.join()
+        with self._read_lock:
+            self._read_conn.close()
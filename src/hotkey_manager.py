@@ -1,15 +1,42 @@
 import threading
-from pynput import keyboard
 from src import config
 
-def start_listener(auto_callback, manual_callback):
+class HotkeyListener:
     """
-    Starts the global hotkey listener in a separate daemon thread.
+    Global hotkey listener on a daemon thread. It can be started before the
+    app exists: an activation that arrives before bind() is held and
+    delivered as soon as the callbacks are bound.
     """
-    def run_listener():
+
+    def __init__(self):
+        self._callbacks: dict | None = None
+        self._pending: str | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def bind(self, auto_callback, manual_callback):
+        with self._lock:
+            self._callbacks = {"auto": auto_callback, "manual": manual_callback}
+            pending, self._pending = self._pending, None
+        if pending:
+            self._callbacks[pending]()
+
+    def _fire(self, mode: str):
+        with self._lock:
+            if self._callbacks is None:
+                self._pending = mode # Only the latest early activation matters
+                return
+            callback = self._callbacks[mode]
+        callback()
+
+    def _run(self):
+        # Imported on the listener thread so it never delays the UI's startup
+        from pynput import keyboard
         hotkeys = {
-            config.HOTKEY_AUTO_COPY: auto_callback,
-            config.HOTKEY_MANUAL_COPY: manual_callback
+            config.HOTKEY_AUTO_COPY: lambda: self._fire("auto"),
+            config.HOTKEY_MANUAL_COPY: lambda: self._fire("manual")
         }
         with keyboard.GlobalHotKeys(hotkeys) as listener:
             print("--- QuickAI-Toolkit is Running ---")
@@ -18,5 +45,11 @@ def start_listener(auto_callback, manual_callback):
             print("For auto-copy to work, the app may need Administrator rights.")
             listener.join()
 
-    listener_thread = threading.Thread(target=run_listener, daemon=True)
-    listener_thread.start()
\ No newline at end of file
+def start_listener(auto_callback, manual_callback) -> HotkeyListener:
+    """
+    Starts the global hotkey listener in a separate daemon thread.
+    """
+    listener = HotkeyListener()
+    listener.bind(auto_callback, manual_callback)
+    listener.start()
+    return listener
@@ -0,0 +1,171 @@
+# src/long_text.py
+
+import asyncio
+import re
+import sys
+from typing import AsyncGenerator, Callable
+
+from src import prompts
+from src.ai_clients import BaseAIClient, format_error, is_error_chunk
+from src.token_estimator import estimate_tokens
+
+# Paragraphs are separated by blank lines; sentences end with western or CJK punctuation
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?。！？；;])(?=\s|[^\s.!?。！？；;])")
+CHUNK_SEPARATOR = "\n\n"
+# Re-reduce passes over merged summaries before the final merge gives up and truncates
+MAX_REDUCE_PASSES = 3
+
+def split_paragraphs(text: str) -> list[str]:
+    """The non-empty paragraphs of text, stripped."""
+    return [paragraph.strip() for paragraph in _PARAGRAPH_SPLIT.split(text.strip()) if paragraph.strip()]
+
+def split_text(text: str, max_tokens: int) -> list[str]:
+    """
+    Splits text into chunks of at most max_tokens, cutting on paragraph
+    boundaries first, then on sentence boundaries, then hard on characters.
+    """
+    # Each piece remembers the separator that preceded it in the original text
+    pieces = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text.strip()):
+        if not paragraph.strip():
+            continue
+        paragraph_tokens = estimate_tokens(paragraph)
+        if paragraph_tokens <= max_tokens:
+            pieces.append((CHUNK_SEPARATOR, paragraph))
+            continue
+        separator = CHUNK_SEPARATOR
+        # Hard cuts use the paragraph's own character-per-token density
+        max_chars = max(1, len(paragraph) * max_tokens // paragraph_tokens)
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            while sentence:
+                pieces.append((separator, sentence[:max_chars]))
+                sentence = sentence[max_chars:]
+                separator = ""
+
+    # Greedily pack the pieces back together up to the budget
+    chunks, current = [], ""
+    for separator, piece in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = piece.lstrip()
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def _collect(client: BaseAIClient, messages: list) -> str:
+    """Runs one request to completion and returns the full response."""
+    parts = []
+    async for chunk in client.astream_response(messages):
+        parts.append(chunk)
+    return "".join(parts)
+
+async def _map_reduce_summary(client: BaseAIClient, chunks: list[str], max_tokens: int, max_parallel: int,
+                              on_progress: Callable[[str], None]) -> AsyncGenerator[str, None]:
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run_pass(action: str, inputs: list[str], label: str) -> list[str]:
+        completed = 0
+        on_progress(f"{label} 0/{len(inputs)}")
+
+        async def run_one(text: str) -> str:
+            nonlocal completed
+            async with semaphore:
+                result = await _collect(client, prompts.get_prompt_messages(action, text))
+            completed += 1
+            on_progress(f"{label} {completed}/{len(inputs)}")
+            return result
+
+        return list(await asyncio.gather(*(run_one(text) for text in inputs)))
+
+    partials = await run_pass("summarize_points", chunks, "Summarizing sections")
+    # Merged summaries can still exceed the budget; keep reducing while that makes them shorter
+    previous_tokens = None
+    for reduce_pass in range(MAX_REDUCE_PASSES + 1):
+        failures = [p for p in partials if is_error_chunk(p)]
+        if failures:
+            on_progress("")
+            yield failures[0]
+            return
+        combined = CHUNK_SEPARATOR.join(partials)
+        combined_tokens = estimate_tokens(combined)
+        if combined_tokens <= max_tokens or len(partials) == 1:
+            break
+        if reduce_pass == MAX_REDUCE_PASSES or (previous_tokens is not None and combined_tokens >= previous_tokens):
+            # Another pass would not converge: merge what fits the budget rather than loop
+            print(f"Summary still ~{combined_tokens} tokens after {reduce_pass} merge pass(es); "
+                  f"truncating to {max_tokens} for the final merge", file=sys.stderr)
+            combined = split_text(combined, max_tokens)[0]
+            break
+        previous_tokens = combined_tokens
+        partials = await run_pass("merge_summaries", split_text(combined, max_tokens), "Merging summaries")
+
+    on_progress(f"Merging {len(partials)} section summaries")
+    async for chunk in client.astream_response(prompts.get_prompt_messages("merge_summaries", combined)):
+        yield chunk
+    on_progress("")
+
+async def _ordered_parallel(client: BaseAIClient, action: str, chunks: list[str], max_parallel: int,
+                            on_progress: Callable[[str], None], reused: list[str | None] | None = None,
+                            **prompt_kwargs) -> AsyncGenerator[str, None]:
+    """Streams each chunk's response in input order. Chunks with a reused output are not sent."""
+    semaphore = asyncio.Semaphore(max_parallel)
+    outputs = [asyncio.Queue() for _ in chunks]
+    reused = reused or [None] * len(chunks)
+
+    async def run_one(index: int):
+        try:
+            async with semaphore:
+                messages = prompts.get_prompt_messages(action, chunks[index], **prompt_kwargs)
+                async for chunk in client.astream_response(messages):
+                    outputs[index].put_nowait(chunk)
+        except Exception as e: # Shown in place of the section, never silently cut short
+            outputs[index].put_nowait(format_error("API请求错误", f"Section {index + 1}: {e}"))
+        finally:
+            outputs[index].put_nowait(None)
+
+    workers = []
+    for index, output in enumerate(reused):
+        if output is None:
+            workers.append(asyncio.create_task(run_one(index)))
+        else:
+            outputs[index].put_nowait(output)
+            outputs[index].put_nowait(None)
+    try:
+        # Stream chunk 0 live while later chunks buffer, preserving input order
+        for index, output in enumerate(outputs):
+            on_progress(f"Section {index + 1}/{len(chunks)}")
+            if index:
+                yield CHUNK_SEPARATOR
+            while (chunk := await output.get()) is not None:
+                yield chunk
+        on_progress("")
+    finally:
+        for worker in workers:
+            worker.cancel()
+
+def stream_chunked(client: BaseAIClient, action: str, text: str, max_tokens: int, max_parallel: int,
+                   on_progress: Callable[[str], None], **prompt_kwargs) -> AsyncGenerator[str, None]:
+    """
+    Processes a long text in budget-sized chunks with bounded parallelism.
+    Summaries are map-reduced; other actions stream their chunks back in order.
+    """
+    chunks = split_text(text, max_tokens)
+    max_parallel = max(1, int(max_parallel))
+    if action == "summarize_points":
+        return _map_reduce_summary(client, chunks, max_tokens, max_parallel, on_progress)
+    return _ordered_parallel(client, action, chunks, max_parallel, on_progress, **prompt_kwargs)
+
+def stream_segments(client: BaseAIClient, action: str, segments: list[tuple[str, str | None]], max_parallel: int,
+                    on_progress: Callable[[str], None], **prompt_kwargs) -> AsyncGenerator[str, None]:
+    """
+    Streams the output for (input, known output) segments in order, sending
+    only the segments whose output is not known yet.
+    """
+    return _ordered_parallel(
+        client, action, [text for text, _output in segments], max(1, int(max_parallel)), on_progress,
+        reused=[output for _text, output in segments], **prompt_kwargs
+    )
@@ -0,0 +1,184 @@
+# src/metrics.py
+
+import contextvars
+import csv
+import json
+import math
+import threading
+import time
+from collections import deque
+
+from src.token_estimator import estimate_tokens
+
+# The trace of the request being processed in the current thread or asyncio task.
+# Clients mark network milestones on it without it being threaded through every call.
+current_trace: contextvars.ContextVar["RequestTrace | None"] = contextvars.ContextVar("current_trace", default=None)
+
+# Derived durations, each measured between two marks (in milliseconds)
+SPANS = {
+    "hotkey_dispatch_ms": ("hotkey", "capture_start"),
+    "capture_ms": ("capture_start", "capture_end"),
+    "queue_ms": ("task_start", "admitted"),
+    "connect_ms": ("task_start", "connected"),
+    "ttfb_ms": ("task_start", "first_byte"),
+    "ttft_ms": ("task_start", "first_token"),
+    "generation_ms": ("first_token", "last_token"),
+    "first_render_ms": ("task_start", "first_render"),
+    "total_ms": ("task_start", "last_render"),
+}
+STAT_FIELDS = list(SPANS) + ["model_load_ms", "prefill_ms", "prefill_tokens", "cached_tokens", "tokens_per_second", "bytes_received", "tokens"]
+PERCENTILES = (50, 95, 99)
+# A local model that took longer than this to load was not resident: a cold start
+COLD_START_LOAD_MS = 100.0
+
+class RequestTrace:
+    """Timestamps and counters for one request, from the hotkey to the last rendered chunk."""
+
+    def __init__(self, provider: str, action: str):
+        self.provider = provider
+        self.action = action
+        self.marks: dict[str, float] = {}
+        self.bytes_received = 0
+        self.tokens = 0
+        self.model_load_ms: float | None = None # Reported by local servers that load models on demand
+        # Prompt usage as reported by the provider; None where it does not say
+        self.prefill_tokens: int | None = None # Tokens the server had to evaluate (prefill)
+        self.cached_tokens: int | None = None # Prompt tokens served from the provider's prompt/KV cache
+        self.prefill_ms: float | None = None
+
+    def mark(self, name: str, overwrite: bool = False):
+        """Records the time of a milestone; by default only its first occurrence counts."""
+        if overwrite or name not in self.marks:
+            self.marks[name] = time.perf_counter()
+
+    def add_bytes(self, count: int):
+        if not self.bytes_received:
+            self.mark("first_byte")
+        self.bytes_received += count
+
+    def add_token_text(self, text: str):
+        self.mark("first_token")
+        self.mark("last_token", overwrite=True)
+        self.tokens += estimate_tokens(text)
+
+    def summary(self) -> dict:
+        """Returns the derived durations and throughput of this request."""
+        result = {}
+        for field, (start, end) in SPANS.items():
+            if start in self.marks and end in self.marks:
+                result[field] = (self.marks[end] - self.marks[start]) * 1000
+        generation_ms = result.get("generation_ms")
+        if generation_ms:
+            result["tokens_per_second"] = self.tokens / (generation_ms / 1000)
+        if self.model_load_ms is not None:
+            result["model_load_ms"] = self.model_load_ms
+            result["cold_start"] = self.model_load_ms >= COLD_START_LOAD_MS
+        for field in ("prefill_tokens", "cached_tokens", "prefill_ms"):
+            if getattr(self, field) is not None:
+                result[field] = getattr(self, field)
+        result["bytes_received"] = self.bytes_received
+        result["tokens"] = self.tokens
+        return result
+
+def mark(name: str, overwrite: bool = False):
+    """Marks a milestone on the current trace, if one is active."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.mark(name, overwrite)
+
+def add_bytes(count: int):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_bytes(count)
+
+def add_token_text(text: str):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_token_text(text)
+
+def set_model_load(load_ms: float):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.model_load_ms = load_ms
+
+def set_usage(prefill_tokens: int | None = None, cached_tokens: int | None = None, prefill_ms: float | None = None):
+    """Records the provider's prompt usage on the current trace."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.prefill_tokens = prefill_tokens
+        trace.cached_tokens = cached_tokens
+        trace.prefill_ms = prefill_ms
+
+def _percentile(sorted_values: list, percent: int) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+class LatencyStats:
+    """Rolling window of request summaries with p50/p95/p99 per provider and action."""
+
+    def __init__(self, window_size: int = 200):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._windows: dict[tuple[str, str], deque] = {}
+
+    def record(self, trace: RequestTrace):
+        summary = trace.summary()
+        with self._lock:
+            window = self._windows.setdefault((trace.provider, trace.action), deque(maxlen=self.window_size))
+            window.append(summary)
+
+    def snapshot(self) -> list[dict]:
+        """Returns one row per (provider, action) with count and percentiles of every field."""
+        rows = []
+        with self._lock:
+            windows = {key: list(window) for key, window in self._windows.items()}
+        for (provider, action), summaries in sorted(windows.items()):
+            row = {"provider": provider, "action": action, "count": len(summaries)}
+            row["cold_starts"] = sum(1 for s in summaries if s.get("cold_start"))
+            # Share of prompt tokens the provider did not have to prefill
+            usage = [(s["prefill_tokens"], s["cached_tokens"]) for s in summaries if "prefill_tokens" in s and "cached_tokens" in s]
+            total = sum(prefill + cached for prefill, cached in usage)
+            row["cached_token_share"] = round(sum(cached for _prefill, cached in usage) / total, 3) if total else None
+            for label, cold in (("cold", True), ("warm", False)):
+                values = sorted(s["ttft_ms"] for s in summaries if "ttft_ms" in s and s.get("cold_start") is cold)
+                row[f"ttft_ms_{label}_p50"] = round(_percentile(values, 50), 2) if values else None
+            for field in STAT_FIELDS:
+                values = sorted(s[field] for s in summaries if field in s)
+                for percent in PERCENTILES:
+                    row[f"{field}_p{percent}"] = round(_percentile(values, percent), 2) if values else None
+            rows.append(row)
+        return rows
+
+    def format_table(self) -> str:
+        """Human-readable summary for the stats view."""
+        lines = []
+        for row in self.snapshot():
+            lines.append(f"{row['provider']} / {row['action']}  (n={row['count']})")
+            for field in ("ttfb_ms", "ttft_ms", "total_ms", "tokens_per_second"):
+                values = " ".join(f"p{p}={row[f'{field}_p{p}']}" for p in PERCENTILES)
+                lines.append(f"  {field:<18} {values}")
+            if row["model_load_ms_p50"] is not None:
+                values = " ".join(f"p{p}={row[f'model_load_ms_p{p}']}" for p in PERCENTILES)
+                lines.append(f"  {'model_load_ms':<18} {values}  cold starts: {row['cold_starts']}")
+                lines.append(f"  {'ttft_ms p50':<18} cold={row['ttft_ms_cold_p50']} warm={row['ttft_ms_warm_p50']}")
+            if row["prefill_tokens_p50"] is not None:
+                lines.append(
+                    f"  {'prefill':<18} tokens p50={row['prefill_tokens_p50']} ms p50={row['prefill_ms_p50']}"
+                    f"  cached share: {row['cached_token_share']}"
+                )
+        return "\n".join(lines) or "No requests recorded yet."
+
+    def export_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=4)
+
+    def export_csv(self, path: str):
+        rows = self.snapshot()
+        fieldnames = ["provider", "action", "count", "cold_starts", "ttft_ms_cold_p50", "ttft_ms_warm_p50", "cached_token_share"] + [
+            f"{field}_p{p}" for field in STAT_FIELDS for p in PERCENTILES
+        ]
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,129 @@
+# src/pipeline.py
+
+from typing import AsyncGenerator, Callable
+
+from src import long_text, prompts, token_estimator
+from src.ai_clients import BaseAIClient, format_error, get_ai_client, get_router_client, is_error_chunk
+from src.response_cache import ResponseCache
+from src.segment_index import SegmentIndex, plan_segments
+
+def create_client(settings_manager, provider_name: str | None = None) -> BaseAIClient:
+    """
+    Builds the AI client described by the settings: a routing client when
+    routing is enabled, otherwise the current (or the given) provider's client.
+    Raises ValueError for unknown providers.
+    """
+    pool_settings = settings_manager.get("connection_pool", {})
+    routing_settings = settings_manager.get("routing", {})
+    if provider_name is None and routing_settings.get("enabled", False):
+        return get_router_client(routing_settings, settings_manager.get("providers", {}), pool_settings)
+    provider_name = provider_name or settings_manager.get("current_provider")
+    provider_settings = settings_manager.get("providers", {}).get(provider_name)
+    if provider_settings is None:
+        raise ValueError(f"Unknown AI provider: {provider_name}")
+    return get_ai_client(provider_name, provider_settings, pool_settings)
+
+def describe_client(settings_manager) -> tuple[str, list[str]]:
+    """
+    The provider label and the model names of the client create_client()
+    builds. With routing, any routed provider may answer, so the label covers
+    all of them and cached or recorded answers are never filed under one.
+    """
+    routing_settings = settings_manager.get("routing", {})
+    if routing_settings.get("enabled", False):
+        providers = settings_manager.get("providers", {})
+        names = [name for name in routing_settings.get("providers", []) if name in providers] # As get_router_client
+        return "routing(" + ", ".join(names) + ")", [providers[name].get("model_name", "") for name in names]
+    return settings_manager.get("current_provider"), [settings_manager.get_current_provider_info().get("model_name", "")]
+
+class ActionRequest:
+    """
+    One prompt action on one text, planned against the token budget.
+    Shared by the popup and the headless entry points; it never touches the UI.
+    """
+
+    def __init__(self, settings_manager, action: str, text: str, **prompt_kwargs):
+        self.action = action
+        self.text = text
+        self.prompt_kwargs = prompt_kwargs
+        self.messages = prompts.get_prompt_messages(action, text, **prompt_kwargs)
+
+        self.provider_name, model_names = describe_client(settings_manager)
+        self.model_name = ", ".join(model_names)
+        long_text_settings = settings_manager.get("long_text", {})
+        budget_settings = settings_manager.get("token_budget", {})
+        self.max_parallel = long_text_settings.get("max_parallel", 3)
+        self.max_input_tokens = budget_settings.get("max_input_tokens", 100000)
+        # Chunks must fit whichever model ends up answering
+        self.chunk_budget = min(
+            token_estimator.get_chunk_budget(model_name, budget_settings, long_text_settings.get("chunk_tokens", 2000))
+            for model_name in model_names or [""]
+        )
+        self.plan, self.input_tokens = token_estimator.plan_request(text, self.chunk_budget, self.max_input_tokens)
+        if self.plan == token_estimator.PLAN_CHUNK and not long_text_settings.get("enabled", True):
+            self.plan = token_estimator.PLAN_DIRECT
+
+        self.cache_key = None
+        cache_enabled = settings_manager.get("response_cache", {}).get("enabled", True)
+        if cache_enabled and self.messages:
+            self.cache_key = ResponseCache.make_key(self.provider_name, self.model_name, action, self.messages)
+
+        # Paragraph-preserving actions can reuse the output of unchanged paragraphs.
+        # Reused paragraphs are cached output too, so turning the cache off disables them.
+        incremental_settings = settings_manager.get("incremental", {})
+        self.segment_scope = None
+        self.segments: list[tuple[str, str | None]] | None = None
+        if (cache_enabled and incremental_settings.get("enabled", True) and self.messages
+                and action in incremental_settings.get("actions", ["polish_text", "translate"])):
+            self.segment_scope = SegmentIndex.make_scope(self.provider_name, self.model_name, action, **prompt_kwargs)
+
+    @property
+    def is_valid(self) -> bool:
+        return self.messages is not None
+
+    @property
+    def is_rejected(self) -> bool:
+        return self.plan == token_estimator.PLAN_REJECT
+
+    def rejection_message(self) -> str:
+        return format_error("输入过长", f"所选文本约 {self.input_tokens} tokens，超过上限 {self.max_input_tokens} tokens。")
+
+    def plan_incremental(self, segment_index: SegmentIndex) -> int:
+        """
+        Switches to sending only the paragraphs that changed since an earlier run
+        of this action. Returns how many paragraphs are reused (0: full request).
+        """
+        if not self.segment_scope or self.is_rejected:
+            return 0
+        paragraphs = long_text.split_paragraphs(self.text)
+        if len(paragraphs) < 2:
+            return 0
+        known_outputs = segment_index.lookup(self.segment_scope, paragraphs)
+        reused = sum(output is not None for output in known_outputs)
+        if reused:
+            self.segments = plan_segments(paragraphs, known_outputs, self.chunk_budget)
+        return reused
+
+    def open_stream(self, client: BaseAIClient, on_progress: Callable[[str], None] | None = None) -> AsyncGenerator[str, None]:
+        """Returns the chunk stream for this request, in chunked mode for long texts."""
+        if self.segments is not None:
+            return long_text.stream_segments(
+                client, self.action, self.segments, self.max_parallel,
+                on_progress or (lambda text: None), **self.prompt_kwargs
+            )
+        if self.plan == token_estimator.PLAN_CHUNK:
+            return long_text.stream_chunked(
+                client, self.action, self.text, self.chunk_budget, self.max_parallel,
+                on_progress or (lambda text: None), **self.prompt_kwargs
+            )
+        return client.astream_response(self.messages)
+
+async def collect_response(chunk_stream: AsyncGenerator[str, None]) -> tuple[str, bool]:
+    """Drains a chunk stream. Returns (full text, whether any error chunk was seen)."""
+    chunks = []
+    failed = False
+    async for chunk in chunk_stream:
+        if is_error_chunk(chunk):
+            failed = True
+        chunks.append(chunk)
+    return "".join(chunks), failed
@@ -8,12 +8,22 @@ PROMPTS = {
     "summarize_points": {
         "system": "You are an efficient information analyst. Your task is to extract key points from the text and present them in an unordered list (using '-'). Output only the final bullet point list.",
         "user_template": "Summarize the main points of the following text:\n\n{text}"
+    },
+    # Reduce step of long-text summarization; not exposed as a toolbar action
+    "merge_summaries": {
+        "system": "You are an efficient information analyst. You will receive bullet-point summaries of consecutive sections of one document. Merge them into a single unordered list (using '-') without repeating points. Output only the final bullet point list.",
+        "user_template": "Merge the following section summaries:\n\n{text}"
     }
 }
 
+# Prompts are laid out so requests share the longest possible byte-stable prefix,
+# which lets Ollama's KV cache and provider-side prompt caching skip its prefill:
+# each system message is a constant, and variable parts come last. Translation
+# puts the text before the target language, so translating one text into several
+# languages repeats everything but the final line.
 TRANSLATE_PROMPT = {
-    "system": "You are a professional translator. Your task is to accurately translate the user's text into {target_language}. Provide only the translated text.",
-    "user_template": "Please translate the following text into {target_language}:\n\n{text}"
+    "system": "You are a professional translator. Your task is to accurately translate the user's text into the target language named at the end of the message. Provide only the translated text.",
+    "user_template": "Please translate the following text:\n\n{text}\n\nTarget language: {target_language}"
 }
 
 def get_prompt_messages(action: str, text: str, **kwargs) -> list | None:
@@ -23,7 +33,7 @@ def get_prompt_messages(action: str, text: str, **kwargs) -> list | None:
         target_language = kwargs.get("target_language")
         if not target_language:
             return None
-        system_content = TRANSLATE_PROMPT["system"].format(target_language=target_language)
+        system_content = TRANSLATE_PROMPT["system"]
         user_content = TRANSLATE_PROMPT["user_template"].format(target_language=target_language, text=text)
     else:
         prompt_data = PROMPTS.get(action)
@@ -0,0 +1,132 @@
+# src/response_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+class ResponseCache:
+    """
+    Caches completed AI responses in two tiers: an in-memory LRU for the
+    hot entries, backed by an SQLite store that survives restarts. An
+    optional warm source (e.g. the history store) refills evicted entries.
+    """
+
+    def __init__(self, db_path: str, max_memory_entries: int = 128, max_disk_entries: int = 2000, ttl_seconds: float = 7 * 24 * 3600,
+                 warm_source: Callable[[str, float, float], str | None] | None = None):
+        self.db_path = db_path
+        self.max_memory_entries = max(1, int(max_memory_entries))
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.warm_hits = 0
+        # Called as warm_source(key, max_age_s, min_created_at) on a miss
+        self.warm_source = warm_source
+        self._cleared_at = 0.0
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(provider: str, model: str, action: str, messages: list) -> str:
+        """Builds a stable key from everything that determines the model's answer."""
+        raw = json.dumps([provider, model, action, messages], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached response for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                warm_response = self.warm_source(key, self.ttl_seconds, self._cleared_at) if self.warm_source else None
+                if warm_response is None:
+                    self.misses += 1
+                    return None
+                self._store(key, warm_response, now)
+                self.hits += 1
+                self.warm_hits += 1
+                return warm_response
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, row[1], row[0])
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        """Stores a completed response in both tiers, evicting the least recently used entries."""
+        with self._lock:
+            self._store(key, response, time.time())
+
+    def _store(self, key: str, response: str, now: float):
+        self._remember(key, now, response)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, response, now, now)
+        )
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+        self._conn.commit()
+
+    def _remember(self, key: str, created_at: float, response: str):
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Drops every cached response and resets the counters."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+            self.warm_hits = 0
+            self._cleared_at = time.time() # Older history must not refill the cache
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current size of each tier."""
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "warm_hits": self.warm_hits,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
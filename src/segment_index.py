@@ -0,0 +1,118 @@
+# src/segment_index.py
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+from src import prompts
+from src.long_text import CHUNK_SEPARATOR, split_paragraphs, split_text
+from src.response_cache import ResponseCache
+from src.token_estimator import estimate_tokens
+
+class SegmentIndex:
+    """
+    Remembers what each input paragraph became in the output of an action,
+    per provider, model and prompt (which includes the target language).
+    When an edited text is processed again, only the paragraphs that changed
+    have to be sent; the rest are spliced back in from earlier runs.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 20000):
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "key TEXT PRIMARY KEY, output TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_last_access ON segments(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_scope(provider: str, model: str, action: str, **prompt_kwargs) -> str:
+        """Everything besides the paragraph itself that determines its output, prompt wording included."""
+        return ResponseCache.make_key(provider, model, action, prompts.get_prompt_messages(action, "", **prompt_kwargs))
+
+    @staticmethod
+    def _key(scope: str, paragraph: str) -> str:
+        # Re-wrapping or re-indenting a paragraph does not make it a different paragraph
+        normalized = " ".join(paragraph.split())
+        return hashlib.sha256(f"{scope}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def record(self, scope: str, input_text: str, output_text: str) -> int:
+        """
+        Stores the paragraph-to-paragraph mapping of one completed run. Only done
+        when input and output have the same number of paragraphs; otherwise the
+        correspondence is unknown. Returns the number of paragraphs recorded.
+        """
+        inputs, outputs = split_paragraphs(input_text), split_paragraphs(output_text)
+        if not inputs or len(inputs) != len(outputs):
+            return 0
+        now = time.time()
+        rows = [(self._key(scope, paragraph), output, now) for paragraph, output in zip(inputs, outputs)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO segments (key, output, last_access) VALUES (?, ?, ?)", rows)
+            self._conn.execute(
+                "DELETE FROM segments WHERE key IN ("
+                "SELECT key FROM segments ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def lookup(self, scope: str, paragraphs: list[str]) -> list[str | None]:
+        """The known output of each paragraph, or None where it has not been processed before."""
+        keys = [self._key(scope, paragraph) for paragraph in paragraphs]
+        found = {}
+        with self._lock:
+            # Bounded batches stay under SQLite's host-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                found.update(self._conn.execute(
+                    f"SELECT key, output FROM segments WHERE key IN ({', '.join('?' * len(batch))})", batch
+                ).fetchall())
+            if found:
+                self._conn.executemany("UPDATE segments SET last_access = ? WHERE key = ?", [(time.time(), key) for key in found])
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM segments")
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def plan_segments(paragraphs: list[str], known_outputs: list[str | None], max_tokens: int) -> list[tuple[str, str | None]]:
+    """
+    Groups paragraphs into (input, known output) segments: each known paragraph
+    stands alone, and consecutive changed paragraphs are merged into requests
+    of at most max_tokens so the model keeps their shared context. A changed
+    paragraph over the budget on its own is split like any long text.
+    """
+    segments = []
+    pending: list[str] = []
+    pending_tokens = 0
+    for paragraph, output in zip(paragraphs, known_outputs):
+        paragraph_tokens = estimate_tokens(paragraph)
+        if pending and (output is not None or pending_tokens + paragraph_tokens > max_tokens):
+            segments.append((CHUNK_SEPARATOR.join(pending), None))
+            pending, pending_tokens = [], 0
+        if output is not None:
+            segments.append((paragraph, output))
+        elif paragraph_tokens > max_tokens:
+            segments.extend((chunk, None) for chunk in split_text(paragraph, max_tokens))
+        else:
+            pending.append(paragraph)
+            pending_tokens += paragraph_tokens
+    if pending:
+        segments.append((CHUNK_SEPARATOR.join(pending), None))
+    return segments
@@ -0,0 +1,181 @@
+# src/service.py
+"""
+Local HTTP service exposing the toolkit's prompt actions.
+
+Keeps one warm process (pooled connections, response cache) that editor
+plugins and scripts can share. Never imports the UI or hotkey modules.
+
+Endpoints:
+    GET  /v1/actions  -> {"actions": [...]}
+    GET  /v1/stats    -> latency percentiles per provider and action
+    POST /v1/run      -> body {"action", "text", "target_language"?, "stream"?, "priority"?}
+                         streams Server-Sent Events ("data: {"content": ...}")
+                         ending with "event: done", or returns JSON if stream is false.
+
+Usage:
+    python -m src.service [--host 127.0.0.1] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+
+from aiohttp import web
+
+from src import config, metrics, prompts
+from src.ai_clients import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, current_priority, is_error_chunk
+from src.pipeline import ActionRequest, collect_response, create_client
+from src.response_cache import ResponseCache
+from src.settings_manager import SettingsManager
+
+class ToolkitService:
+    """aiohttp application that serves prompt actions through one shared AI client."""
+
+    def __init__(self, settings_manager: SettingsManager):
+        self.settings_manager = settings_manager
+        service_settings = settings_manager.get("service", {})
+        self.max_concurrent = max(1, service_settings.get("max_concurrent_requests", 4))
+        self.max_queued = max(0, service_settings.get("max_queued_requests", 16))
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._waiting = 0
+        self.latency_stats = metrics.LatencyStats()
+
+        self.client = create_client(settings_manager)
+        cache_settings = settings_manager.get("response_cache", {})
+        self.cache = ResponseCache(
+            config.CACHE_DB_PATH,
+            max_memory_entries=cache_settings.get("max_memory_entries", 128),
+            max_disk_entries=cache_settings.get("max_disk_entries", 2000),
+            ttl_seconds=cache_settings.get("ttl_seconds", 604800),
+        )
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/actions", self.handle_actions)
+        app.router.add_post("/v1/run", self.handle_run)
+        app.router.add_get("/v1/stats", self.handle_stats)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app: web.Application):
+        if self.settings_manager.get("warm_up", {}).get("enabled", True):
+            result = await self.client.awarm_up()
+            if result:
+                print(f"Model warm-up: '{result['model']}' ready in {result['elapsed_ms']:.0f} ms")
+
+    async def _on_cleanup(self, app: web.Application):
+        await self.client.aclose()
+        self.client.close()
+        self.cache.close()
+
+    async def handle_actions(self, request: web.Request) -> web.Response:
+        actions = [name for name in prompts.PROMPTS if name != "merge_summaries"] + ["translate"]
+        return web.json_response({"actions": actions})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"stats": self.latency_stats.snapshot()})
+
+    async def handle_run(self, request: web.Request) -> web.StreamResponse:
+        try:
+            body = await request.json()
+        except ValueError: # Malformed JSON or a body that is not UTF-8
+            return web.json_response({"error": "Request body must be UTF-8 JSON."}, status=400)
+        if not isinstance(body, dict) or not isinstance(body.get("text"), str) or not body["text"].strip():
+            return web.json_response({"error": "Field 'text' is required."}, status=400)
+        action, target_language = body.get("action", ""), body.get("target_language")
+        if not isinstance(action, str) or not (target_language is None or isinstance(target_language, str)):
+            return web.json_response({"error": "Fields 'action' and 'target_language' must be strings."}, status=400)
+
+        action_request = ActionRequest(self.settings_manager, action, body["text"], target_language=target_language)
+        if not action_request.is_valid:
+            return web.json_response({"error": f"Unknown action or missing target_language: {action_request.action}"}, status=400)
+        if action_request.is_rejected:
+            return web.json_response({"error": action_request.rejection_message().strip()}, status=413)
+
+        # Requests beyond the in-flight limit wait in a bounded queue; past that, shed load
+        if self._slots.locked() and self._waiting >= self.max_queued:
+            return web.json_response({"error": "Too many requests in flight."}, status=429)
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        trace = metrics.RequestTrace(action_request.provider_name, action_request.action)
+        trace.mark("task_start")
+        metrics.current_trace.set(trace)
+        current_priority.set(PRIORITY_BACKGROUND if body.get("priority") == "background" else PRIORITY_INTERACTIVE)
+        try:
+            if body.get("stream", True):
+                return await self._stream_result(request, action_request)
+            return await self._json_result(action_request)
+        finally:
+            self._slots.release()
+            if trace.tokens:
+                self.latency_stats.record(trace)
+
+    async def _json_result(self, action_request: ActionRequest) -> web.Response:
+        cached = self.cache.get(action_request.cache_key) if action_request.cache_key else None
+        if cached is not None:
+            return web.json_response({"output": cached, "cached": True})
+        output, failed = await collect_response(action_request.open_stream(self.client))
+        metrics.mark("first_render")
+        metrics.mark("last_render")
+        if failed:
+            return web.json_response({"error": output.strip()}, status=502)
+        if action_request.cache_key:
+            self.cache.put(action_request.cache_key, output)
+        return web.json_response({"output": output, "cached": False})
+
+    async def _stream_result(self, request: web.Request, action_request: ActionRequest) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        async def send(event: str | None, data: dict):
+            prefix = f"event: {event}\n" if event else ""
+            # write() waits for the socket to drain, so a slow reader pauses the model stream
+            await response.write(f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+            metrics.mark("first_render")
+            metrics.mark("last_render", overwrite=True)
+
+        cached = self.cache.get(action_request.cache_key) if action_request.cache_key else None
+        try:
+            if cached is not None:
+                await send(None, {"content": cached})
+                await send("done", {"cached": True})
+                return response
+
+            chunks, failed = [], False
+            on_progress = lambda text: None
+            async with contextlib.aclosing(action_request.open_stream(self.client, on_progress)) as chunk_stream:
+                async for chunk in chunk_stream:
+                    if is_error_chunk(chunk):
+                        failed = True
+                        await send("error", {"error": chunk.strip()})
+                        continue
+                    chunks.append(chunk)
+                    await send(None, {"content": chunk})
+            if action_request.cache_key and chunks and not failed:
+                self.cache.put(action_request.cache_key, "".join(chunks))
+            await send("done", {"cached": False})
+        except ConnectionResetError:
+            pass # Client went away; closing the stream above already stopped the model
+        return response
+
+def main(argv: list[str] | None = None):
+    settings_manager = SettingsManager()
+    service_settings = settings_manager.get("service", {})
+    parser = argparse.ArgumentParser(prog="python -m src.service", description="Serve QuickAI-Toolkit actions over local HTTP/SSE.")
+    parser.add_argument("--host", default=service_settings.get("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=service_settings.get("port", 8765))
+    args = parser.parse_args(argv)
+
+    async def create_app() -> web.Application:
+        return ToolkitService(settings_manager).build_app()
+
+    print(f"--- QuickAI-Toolkit service on http://{args.host}:{args.port} ---")
+    web.run_app(create_app(), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,123 @@
 # src/settings_manager.py
 
+import atexit
 import json
 import os
+import shutil
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Mapping
 from src import config
 
+@dataclass(frozen=True)
+class ProviderSettings:
+    """Typed view of one provider's settings."""
+    name: str
+    api_url: str
+    model_name: str
+    api_key: str = ""
+    keep_alive: str | int | None = None
+    options: Mapping[str, Any] = field(default_factory=dict)
+    rate_limit: Mapping[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_mapping(cls, name: str, data: Mapping[str, Any]) -> "ProviderSettings":
+        return cls(
+            name=name,
+            api_url=data.get("api_url", ""),
+            model_name=data.get("model_name", ""),
+            api_key=data.get("api_key", ""),
+            keep_alive=data.get("keep_alive"),
+            options=data.get("options") or {},
+            rate_limit=data.get("rate_limit") or {},
+        )
+
+def freeze(value):
+    """Read-only deep copy: dicts become mapping proxies, lists become tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Mutable deep copy of a frozen snapshot, ready for json or editing."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+def merge(base: dict, changes: Mapping) -> dict:
+    """Returns base with changes applied recursively; nested dicts are merged, not replaced."""
+    merged = dict(base)
+    for key, value in changes.items():
+        if isinstance(value, Mapping) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = thaw(value)
+    return merged
+
+def write_json_atomic(path: str, data, temp_prefix: str = ".settings-"):
+    """Writes data as JSON to a temporary file, syncs it, then renames it over path."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=temp_prefix, suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    if hasattr(os, "O_DIRECTORY"): # Makes the rename itself durable (POSIX only)
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def connection_signature(settings: Mapping) -> str:
+    """Everything the AI client is built from. The client only needs rebuilding when this changes."""
+    providers = settings.get("providers", {})
+    routing = settings.get("routing", {})
+    routed = routing.get("providers", ()) if routing.get("enabled", False) else ()
+    return json.dumps(thaw([
+        settings.get("current_provider"),
+        providers.get(settings.get("current_provider"), {}),
+        settings.get("connection_pool", {}),
+        routing,
+        [providers.get(name, {}) for name in routed],
+    ]), sort_keys=True)
+
 class SettingsManager:
-    """Handles loading and saving user settings from a JSON file."""
+    """
+    Holds the user settings as an immutable snapshot backed by a JSON file.
+    Changes replace the snapshot at once and are written to disk shortly
+    after on a background thread, atomically, with bursts coalesced into
+    one write. With watch(), edits made to the file by hand are picked up too.
+    """
+
+    def __init__(self, filepath: str | None = None, save_delay_s: float = config.SETTINGS_SAVE_DELAY_S):
+        self.filepath = filepath or config.SETTINGS_FILE_PATH
+        self.save_delay_s = float(save_delay_s)
+        self._lock = threading.RLock()
+        self._save_timer: threading.Timer | None = None
+        self._listeners: list[Callable[[Mapping, Mapping], None]] = []
+        self._stop_watching: threading.Event | None = None
+        self._file_state = None # (mtime_ns, size) of the file as last read or written
+        self._snapshot: Mapping = freeze(self._load_settings())
+        atexit.register(self.flush)
 
-    def __init__(self):
-        self.filepath = config.SETTINGS_FILE_PATH
-        self.settings = self._load_settings()
+    @property
+    def settings(self) -> Mapping:
+        """The current settings. Read-only; use update() to change them."""
+        return self._snapshot
 
     def _get_default_settings(self) -> dict:
         """Provides the default structure and values for settings."""
@@ -19,48 +127,252 @@ class SettingsManager:
                 "Ollama": {
                     "api_url": "http://localhost:11434/v1/chat",
                     "model_name": "granite4:latest",
-                    "api_key": "" # Not used, but here for structural consistency
+                    "api_key": "", # Not used, but here for structural consistency
+                    "keep_alive": "10m",
+                    "options": {
+                        "num_ctx": None,
+                        "num_predict": None,
+                        "num_thread": None
+                    }
                 },
                 "OpenAI": {
                     "api_url": "https://api.openai.com/v1/chat/completions",
                     "model_name": "gpt-4o",
-                    "api_key": "YOUR_OPENAI_API_KEY"
+                    "api_key": "YOUR_OPENAI_API_KEY",
+                    "include_usage": True,
+                    "rate_limit": {
+                        "requests_per_minute": 500,
+                        "tokens_per_minute": 30000,
+                        "max_concurrent": 4,
+                        "max_retries": 3
+                    }
                 },
                 "Groq": {
                     "api_url": "https://api.groq.com/openai/v1/chat/completions",
                     "model_name": "llama3-8b-8192",
-                    "api_key": "YOUR_GROQ_API_KEY"
+                    "api_key": "YOUR_GROQ_API_KEY",
+                    "include_usage": True,
+                    "rate_limit": {
+                        "requests_per_minute": 30,
+                        "tokens_per_minute": 6000,
+                        "max_concurrent": 4,
+                        "max_retries": 3
+                    }
+                }
+            },
+            "connection_pool": {
+                "pool_size": 4,
+                "idle_timeout": 90
+            },
+            "response_cache": {
+                "enabled": True,
+                "max_memory_entries": 128,
+                "max_disk_entries": 2000,
+                "ttl_seconds": 604800
+            },
+            "long_text": {
+                "enabled": True,
+                "chunk_tokens": 2000,
+                "max_parallel": 3
+            },
+            "token_budget": {
+                "default_context": 8192,
+                "reserve_output_tokens": 1024,
+                "max_input_tokens": 100000,
+                "context_limits": {
+                    "granite4:latest": 131072,
+                    "gpt-4o": 128000,
+                    "llama3-8b-8192": 8192
                 }
+            },
+            "service": {
+                "host": "127.0.0.1",
+                "port": 8765,
+                "max_concurrent_requests": 4,
+                "max_queued_requests": 16
+            },
+            "routing": {
+                "enabled": False,
+                "providers": ["Ollama", "Groq", "OpenAI"],
+                "hedge_after_ms": 0,
+                "health_half_life_s": 300
+            },
+            "multi_translate": {
+                "max_parallel": 3
+            },
+            "history": {
+                "enabled": True,
+                "retention_days": 90,
+                "max_entries": 200000,
+                "warm_cache": True
+            },
+            "incremental": {
+                "enabled": True,
+                "actions": ["polish_text", "translate"],
+                "max_entries": 20000
+            },
+            "clipboard": {
+                "backend": "auto",
+                "timeout_ms": 500,
+                "poll_interval_ms": 5
+            },
+            "warm_up": {
+                "enabled": True,
+                "refresh_interval_s": 240
+            },
+            "speculative": {
+                "enabled": False,
+                "min_samples": 5,
+                "min_share": 0.5,
+                "max_input_tokens": 1500,
+                "max_output_tokens": 400
             }
         }
 
     def _load_settings(self) -> dict:
         """Loads settings from the JSON file, or creates it with defaults."""
+        defaults = self._get_default_settings()
         if not os.path.exists(self.filepath):
-            default_settings = self._get_default_settings()
-            self.save_settings(default_settings)
-            return default_settings
-        
+            self._write_atomic(defaults)
+            return defaults
+        try:
+            return merge(defaults, self._read_file())
+        except (json.JSONDecodeError, ValueError) as e:
+            # Never overwrite a broken file silently: keep a copy for the user to repair
+            backup_path = f"{self.filepath}.corrupt"
+            try:
+                shutil.copyfile(self.filepath, backup_path)
+            except OSError:
+                backup_path = None
+            print(f"Error: {self.filepath} is not valid settings JSON ({e}). "
+                  f"{'A copy was kept as ' + backup_path + '. ' if backup_path else ''}Running on defaults until settings are saved.")
+        except OSError as e:
+            print(f"Error: could not read {self.filepath} ({e}). Running on defaults until settings are saved.")
+        return defaults
+
+    def _read_file(self) -> dict:
+        state = self._stat()
+        with open(self.filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("top level is not an object")
+        self._file_state = state
+        return data
+
+    def _stat(self):
         try:
-            with open(self.filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            # If file is corrupted or unreadable, fall back to defaults
-            default_settings = self._get_default_settings()
-            self.save_settings(default_settings)
-            return default_settings
-
-    def save_settings(self, settings_data: dict):
-        """Saves the provided dictionary to the settings JSON file."""
-        self.settings = settings_data
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.settings, f, indent=4)
-
-    def get_current_provider_info(self) -> dict:
+            stat = os.stat(self.filepath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    # --- Writing ---
+    def update(self, changes: Mapping, persist: bool = True):
+        """
+        Applies changes (merged recursively) to a new snapshot, notifies the
+        listeners, and schedules a save unless persist is False.
+        """
+        with self._lock:
+            self._replace(freeze(merge(thaw(self._snapshot), changes)))
+            if persist:
+                self._schedule_save()
+
+    def save_settings(self, settings_data: Mapping):
+        """Replaces all settings with settings_data and schedules a save."""
+        with self._lock:
+            self._replace(freeze(settings_data))
+            self._schedule_save()
+
+    def _replace(self, snapshot: Mapping):
+        old, self._snapshot = self._snapshot, snapshot
+        if thaw(old) != thaw(snapshot):
+            for listener in list(self._listeners):
+                # A failing listener must not stop the others, nor kill the watcher thread it runs on
+                try:
+                    listener(old, snapshot)
+                except Exception as e:
+                    print(f"Error: settings listener {getattr(listener, '__qualname__', listener)} failed ({type(e).__name__}: {e})", file=sys.stderr)
+
+    def _schedule_save(self):
+        # Each change restarts the delay, so a burst of changes costs one write
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+        self._save_timer = threading.Timer(self.save_delay_s, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self):
+        """Writes a pending save now."""
+        with self._lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            data = thaw(self._snapshot)
+            try:
+                self._write_atomic(data)
+            except OSError as e:
+                print(f"Error: could not save settings to {self.filepath} ({e})")
+
+    def _write_atomic(self, data: dict):
+        write_json_atomic(self.filepath, data)
+        self._file_state = self._stat() # Our own write is not an external edit
+
+    # --- Hot Reload ---
+    def add_listener(self, callback: Callable[[Mapping, Mapping], None]):
+        """
+        Calls callback(old, new) whenever the snapshot changes, from update()
+        or from an external edit. The latter arrives on the watcher thread.
+        """
+        self._listeners.append(callback)
+
+    def watch(self, interval_s: float = config.SETTINGS_POLL_INTERVAL_S):
+        """Starts polling the file's mtime and reloads it when it is edited externally."""
+        if self._stop_watching is not None:
+            return
+        self._stop_watching = threading.Event()
+        threading.Thread(target=self._watch_loop, args=(self._stop_watching, interval_s), name="SettingsWatcher", daemon=True).start()
+
+    def stop_watching(self):
+        if self._stop_watching is not None:
+            self._stop_watching.set()
+            self._stop_watching = None
+
+    def _watch_loop(self, stop: threading.Event, interval_s: float):
+        # Polling the mtime is portable; the stdlib has no inotify/ReadDirectoryChanges wrapper
+        while not stop.wait(interval_s):
+            self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the file if it changed since it was last read or written. Returns whether it did."""
+        with self._lock:
+            state = self._stat()
+            if state is None or state == self._file_state:
+                return False
+            try:
+                data = self._read_file()
+            except (json.JSONDecodeError, ValueError, OSError) as e:
+                self._file_state = state # Report once per bad edit, then wait for the next one
+                print(f"Ignoring edit to {self.filepath}: not valid settings JSON ({e}). Keeping the current settings.")
+                return False
+            print(f"Reloaded settings from {self.filepath}")
+            self._replace(freeze(merge(self._get_default_settings(), data)))
+            return True
+
+    # --- Reading ---
+    def provider(self, name: str | None = None) -> ProviderSettings:
+        """Typed settings of the given provider, by default the current one."""
+        name = name or self._snapshot.get("current_provider", "Ollama")
+        data = self._snapshot["providers"].get(name)
+        if data is None:
+            raise KeyError(f"Unknown AI provider: {name}")
+        return ProviderSettings.from_mapping(name, data)
+
+    def get_current_provider_info(self) -> Mapping:
         """Returns the settings for the currently selected provider."""
-        provider_name = self.settings.get("current_provider", "Ollama")
-        return self.settings["providers"].get(provider_name, self._get_default_settings()["providers"]["Ollama"])
+        provider_name = self._snapshot.get("current_provider", "Ollama")
+        return self._snapshot["providers"].get(provider_name, freeze(self._get_default_settings()["providers"]["Ollama"]))
 
     def get(self, key: str, default=None):
         """Gets a top-level setting."""
-        return self.settings.get(key, default)
\ No newline at end of file
+        return self._snapshot.get(key, default)
@@ -0,0 +1,152 @@
+# src/speculation.py
+
+import atexit
+import json
+import os
+import sys
+import threading
+from typing import AsyncGenerator, Callable, Dict, List
+
+from src import config, token_estimator
+from src.ai_clients import PRIORITY_BACKGROUND, current_priority, is_error_chunk
+from src.settings_manager import write_json_atomic
+
+def action_key(action: str, **prompt_kwargs) -> str:
+    """Identifies an action together with its arguments, e.g. 'translate:English'."""
+    target_language = prompt_kwargs.get("target_language")
+    return f"{action}:{target_language}" if target_language else action
+
+def parse_action_key(key: str) -> tuple[str, dict]:
+    """Inverse of action_key: returns (action, prompt kwargs)."""
+    action, _, target_language = key.partition(":")
+    return action, ({"target_language": target_language} if target_language else {})
+
+class ActionPredictor:
+    """
+    Counts which actions the user picks and predicts the most likely next one.
+    Counts are saved off the caller's thread, with bursts coalesced into one write.
+    """
+
+    def __init__(self, filepath: str, min_samples: int = 5, min_share: float = 0.5,
+                 save_delay_s: float = config.SETTINGS_SAVE_DELAY_S):
+        self.filepath = filepath
+        self.min_samples = min_samples
+        self.min_share = min_share
+        self.save_delay_s = float(save_delay_s)
+        self._lock = threading.Lock()
+        self._save_timer: threading.Timer | None = None
+        self.counts: Dict[str, int] = self._load()
+        atexit.register(self.flush)
+
+    def _load(self) -> Dict[str, int]:
+        if not os.path.exists(self.filepath):
+            return {}
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {str(k): int(v) for k, v in data.items()}
+        except (json.JSONDecodeError, IOError, ValueError, AttributeError):
+            return {}
+
+    def record(self, key: str):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            # Each record restarts the delay, so a burst of actions costs one write
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.save_delay_s, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Writes pending counts now."""
+        with self._lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            counts = dict(self.counts)
+        try:
+            write_json_atomic(self.filepath, counts, temp_prefix=".action_stats-")
+        except OSError as e:
+            print(f"Could not save action stats: {e}", file=sys.stderr)
+
+    def predict(self) -> str | None:
+        """The dominant action, or None while the history is too thin or too mixed to bet on."""
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        if total < self.min_samples:
+            return None
+        key, count = max(counts.items(), key=lambda item: item[1])
+        return key if count / total >= self.min_share else None
+
+class SpeculativeStream:
+    """
+    A response generated before the user asked for it. Chunks are buffered
+    until the stream is adopted by a real task; from then on the buffer is
+    replayed through the sink and later chunks are forwarded live. An
+    unadopted stream that exceeds its output budget stops itself.
+    """
+
+    def __init__(self, key: str, text: str, max_output_tokens: int):
+        self.key = key
+        self.text = text
+        self.max_output_tokens = max_output_tokens
+        self.chunks: List[str] = []
+        self.finished = False
+        self.complete = False # Reached the natural end of the stream
+        self.failed = False
+        self.over_budget = False
+        self.future = None # concurrent.futures.Future of run()
+        self._sink: Callable[[str | None], None] | None = None
+        self._lock = threading.Lock()
+
+    def matches(self, key: str, text: str) -> bool:
+        return not self.over_budget and not self.failed and self.key == key and self.text == text
+
+    async def run(self, chunk_stream: AsyncGenerator[str, None]):
+        current_priority.set(PRIORITY_BACKGROUND) # A guess must never delay a real request
+        output_tokens = 0
+        try:
+            async for chunk in chunk_stream:
+                with self._lock:
+                    self.chunks.append(chunk)
+                    self.failed = self.failed or is_error_chunk(chunk)
+                    if self._sink:
+                        self._sink(chunk)
+                        continue
+                    output_tokens += token_estimator.estimate_tokens(chunk)
+                    if output_tokens > self.max_output_tokens:
+                        self.over_budget = True
+                if self.over_budget:
+                    print(f"Speculative '{self.key}' stopped at its {self.max_output_tokens} token budget.", file=sys.stderr)
+                    await chunk_stream.aclose() # Closes the HTTP response now rather than on collection
+                    return
+            self.complete = True
+        finally:
+            with self._lock:
+                self.finished = True
+                if self._sink:
+                    self._sink(None)
+
+    def adopt(self, sink: Callable[[str | None], None]) -> bool:
+        """
+        Replays the buffered chunks into sink and forwards the rest live. sink
+        receives None once the stream ends. Returns False if the stream can no
+        longer be used.
+        """
+        with self._lock:
+            if self.over_budget or self.failed or (self.finished and not (self.complete and self.chunks)):
+                return False
+            for chunk in self.chunks:
+                sink(chunk)
+            if self.finished:
+                sink(None)
+            else:
+                self._sink = sink
+            return True
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
@@ -0,0 +1,55 @@
+# src/token_estimator.py
+
+import re
+
+# Calibrated against BPE tokenizers (cl100k/o200k, Llama 3): English and code
+# average ~4 characters per token, while CJK text is close to one token per character.
+CHARS_PER_TOKEN = 4.0
+CJK_TOKENS_PER_CHAR = 1.0
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and framing tokens added per chat message
+
+_CJK_RUN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿＀-￯]+")
+
+# --- Request plans ---
+PLAN_DIRECT = "direct"
+PLAN_CHUNK = "chunk"
+PLAN_REJECT = "reject"
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the token count of text in a few microseconds per KB."""
+    if not text:
+        return 0
+    if text.isascii():
+        return int(len(text) / CHARS_PER_TOKEN + 0.999)
+    cjk_chars = sum(map(len, _CJK_RUN.findall(text)))
+    other_chars = len(text) - cjk_chars
+    return int(cjk_chars * CJK_TOKENS_PER_CHAR + other_chars / CHARS_PER_TOKEN + 0.999)
+
+def estimate_messages_tokens(messages: list) -> int:
+    """Estimates the prompt size of a chat 'messages' list."""
+    return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+def get_context_limit(model_name: str, budget_settings: dict) -> int:
+    """Returns the configured context window for a model, falling back to the default."""
+    limits = budget_settings.get("context_limits", {})
+    return int(limits.get(model_name, budget_settings.get("default_context", 8192)))
+
+def get_chunk_budget(model_name: str, budget_settings: dict, chunk_tokens: int, prompt_overhead: int = 200) -> int:
+    """
+    Returns the largest chunk of input text (in tokens) to send in one request:
+    the configured chunk size, capped by what fits in the model's context window.
+    """
+    available = get_context_limit(model_name, budget_settings) - budget_settings.get("reserve_output_tokens", 1024) - prompt_overhead
+    return max(1, min(chunk_tokens, available))
+
+def plan_request(text: str, chunk_budget: int, max_input_tokens: int) -> tuple[str, int]:
+    """
+    Decides how to dispatch a selection: send it in one request, process it
+    in chunks, or reject it outright. Returns (plan, estimated input tokens).
+    """
+    tokens = estimate_tokens(text)
+    if tokens > max_input_tokens:
+        return PLAN_REJECT, tokens
+    if tokens > chunk_budget:
+        return PLAN_CHUNK, tokens
+    return PLAN_DIRECT, tokens
@@ -0,0 +1,31 @@
+# src/ui/icon_cache.py
+
+import customtkinter as ctk
+
+from src import config
+
+DEFAULT_ICON_SIZE = (18, 18)
+ICON_SIZES = {"loading": (24, 24)}
+
+_icons: dict[str, ctk.CTkImage | None] = {}
+
+def get_icon(name: str) -> ctk.CTkImage | None:
+    """Returns the named icon, decoding it on first use only."""
+    if name not in _icons:
+        _icons[name] = _load_icon(name)
+    return _icons[name]
+
+def _load_icon(name: str) -> ctk.CTkImage | None:
+    from PIL import Image # Deferred: only needed until every icon is cached
+
+    path = config.ICON_PATHS.get(name)
+    size = ICON_SIZES.get(name, DEFAULT_ICON_SIZE)
+    try:
+        with Image.open(path) as source:
+            image = source.convert("RGBA") # Decodes now, not on first draw
+    except (FileNotFoundError, TypeError):
+        print(f"Warning: Icon not found at {path}")
+        return None
+    # Keep twice the display size so 200% scaling stays sharp; anything larger is wasted work on every rescale
+    image.thumbnail((size[0] * 2, size[1] * 2), Image.LANCZOS)
+    return ctk.CTkImage(image, size=size)
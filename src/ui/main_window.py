@@ -1,11 +1,11 @@
 # src/ui/main_window.py
 
 import customtkinter as ctk
-from PIL import Image
 import time
-import pyperclip
 
 from src import config
+from src.ui.icon_cache import get_icon
+from src.ui.stream_renderer import StreamRenderer
 
 class MainWindow:
     """Manages the entire UI, including the window, widgets, and animations."""
@@ -20,9 +20,6 @@ class MainWindow:
         self.drag_offset_x = 0
         self.drag_offset_y = 0
 
-        # --- Load Resources ---
-        self.icons = self._load_icons()
-
         # --- Create UI Elements ---
         self.popup = self._create_popup_window()
         
@@ -43,23 +40,24 @@ class MainWindow:
         
         # AI Response View
         self.ai_response_frame = self._build_ai_response_view(self.result_panel)
-        
-        # Settings View
-        self.settings_frame = ctk.CTkFrame(self.result_panel, fg_color="transparent")
+
+        # Settings, Latency Stats and History views are rarely opened: built on first use
         self.settings_widgets = {}
-        self._build_settings_ui(self.settings_frame)
-        
-    def _load_icons(self):
-        icons = {}
-        for name, path in config.ICON_PATHS.items():
-            try:
-                size = (24, 24) if name == "loading" else (18, 18)
-                img = ctk.CTkImage(Image.open(path), size=size)
-                icons[name] = img
-            except FileNotFoundError:
-                print(f"Warning: Icon not found at {path}")
-                icons[name] = None
-        return icons
+        self.panel_views = {"ai": self.ai_response_frame}
+        self._translation_menu = None
+
+    def _get_panel_view(self, view: str) -> ctk.CTkFrame:
+        if view not in self.panel_views:
+            if view == "settings":
+                # Scrollable, it outgrows the panel height
+                frame = ctk.CTkScrollableFrame(self.result_panel, fg_color="transparent")
+                self._build_settings_ui(frame)
+            elif view == "stats":
+                frame = self._build_stats_view(self.result_panel)
+            else: # "history"
+                frame = self._build_history_view(self.result_panel)
+            self.panel_views[view] = frame
+        return self.panel_views[view]
 
     def _create_popup_window(self) -> ctk.CTkToplevel:
         popup = ctk.CTkToplevel(self.root)
@@ -106,16 +104,25 @@ class MainWindow:
         )
         copy_button.pack(side="right")
 
+        # Shows long-text progress (e.g. "Summarizing sections 2/5")
+        self.progress_label = ctk.CTkLabel(header, text="", anchor="w")
+        self.progress_label.pack(side="left", padx=5)
+
         self.feedback_textbox = ctk.CTkTextbox(frame, wrap="word", state="disabled", fg_color="transparent", border_width=0)
         self.feedback_textbox.pack(side="top", fill="both", expand=True, padx=10, pady=(0, 5))
+        self.feedback_renderer = StreamRenderer(self.feedback_textbox)
         
-        self.loading_label = ctk.CTkLabel(frame, text="", image=self.icons.get("loading"))
+        self.loading_label = ctk.CTkLabel(frame, text="", image=get_icon("loading"))
+
+        # Multi-target translation results, one tab per language (built per task)
+        self.multi_tabview = None
+        self.multi_renderers = {}
 
         footer = ctk.CTkFrame(frame, fg_color="transparent", height=40)
         footer.pack(side="bottom",pady=8, fill="x")
         
         close_panel_button = ctk.CTkButton(
-            footer, text="", image=self.icons.get("close_app"), command=self.hide_panel,
+            footer, text="", image=get_icon("close_app"), command=self.hide_panel,
             width=24, height=24, corner_radius=14, fg_color="transparent",
             hover_color=config.CLOSE_BUTTON_HOVER_COLOR
         )
@@ -142,8 +149,51 @@ class MainWindow:
         self.settings_widgets["api_key_label"] = ctk.CTkLabel(parent, text="API Key")
         self.settings_widgets["api_key_entry"] = ctk.CTkEntry(parent, show="*")
         
+        self.settings_widgets["cache_enabled_var"] = ctk.BooleanVar(value=True)
+        cache_checkbox = ctk.CTkCheckBox(parent, text="Use response cache", variable=self.settings_widgets["cache_enabled_var"])
+        cache_checkbox.grid(row=4, column=0, padx=10, pady=8, sticky="w")
+        clear_cache_button = ctk.CTkButton(parent, text="Clear Cache", command=self.app.clear_response_cache)
+        clear_cache_button.grid(row=4, column=1, padx=10, pady=8, sticky="e")
+        self.settings_widgets["cache_stats_label"] = ctk.CTkLabel(parent, text="", anchor="w")
+        self.settings_widgets["cache_stats_label"].grid(row=5, column=0, columnspan=2, padx=10, pady=(0, 8), sticky="w")
+        
+        stats_button = ctk.CTkButton(parent, text="Latency Stats", command=self.app.show_latency_stats)
+        stats_button.grid(row=6, column=0, padx=10, pady=8, sticky="ew")
+        history_button = ctk.CTkButton(parent, text="History", command=self.app.show_history)
+        history_button.grid(row=6, column=1, padx=10, pady=8, sticky="ew")
+        
         save_button = ctk.CTkButton(parent, text="Save and Apply", command=self.app.save_settings)
-        save_button.grid(row=4, column=0, columnspan=2, padx=10, pady=20, sticky="ew")
+        save_button.grid(row=7, column=0, columnspan=2, padx=10, pady=20, sticky="ew")
+
+    def _build_stats_view(self, parent) -> ctk.CTkFrame:
+        frame = ctk.CTkFrame(parent, fg_color="transparent")
+
+        buttons = ctk.CTkFrame(frame, fg_color="transparent")
+        buttons.pack(side="top", fill="x", padx=5, pady=(5, 0))
+        ctk.CTkButton(buttons, text="Back", width=60, command=lambda: self.switch_panel_view("settings")).pack(side="left", padx=5)
+        ctk.CTkButton(buttons, text="Export JSON", width=90, command=lambda: self.app.export_latency_stats("json")).pack(side="right", padx=5)
+        ctk.CTkButton(buttons, text="Export CSV", width=90, command=lambda: self.app.export_latency_stats("csv")).pack(side="right", padx=5)
+
+        self.stats_message_label = ctk.CTkLabel(frame, text="", anchor="w")
+        self.stats_message_label.pack(side="bottom", fill="x", padx=10)
+        self.stats_textbox = ctk.CTkTextbox(frame, wrap="none", state="disabled", fg_color="transparent", border_width=0, font=("Consolas", 11))
+        self.stats_textbox.pack(side="top", fill="both", expand=True, padx=10, pady=(5, 0))
+        return frame
+
+    def _build_history_view(self, parent) -> ctk.CTkFrame:
+        frame = ctk.CTkFrame(parent, fg_color="transparent")
+
+        search_bar = ctk.CTkFrame(frame, fg_color="transparent")
+        search_bar.pack(side="top", fill="x", padx=5, pady=(5, 0))
+        ctk.CTkButton(search_bar, text="Back", width=60, command=lambda: self.switch_panel_view("settings")).pack(side="left", padx=5)
+        self.history_entry = ctk.CTkEntry(search_bar, placeholder_text="Search history")
+        self.history_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.history_entry.bind("<Return>", lambda e: self.app.search_history(self.history_entry.get()))
+        ctk.CTkButton(search_bar, text="Search", width=70, command=lambda: self.app.search_history(self.history_entry.get())).pack(side="right", padx=5)
+
+        self.history_textbox = ctk.CTkTextbox(frame, wrap="word", state="disabled", fg_color="transparent", border_width=0)
+        self.history_textbox.pack(side="top", fill="both", expand=True, padx=10, pady=(5, 0))
+        return frame
 
     # --- Public Methods (API for the App Controller) ---
 
@@ -162,6 +212,7 @@ class MainWindow:
 
     def hide(self):
         self.popup.withdraw()
+        self.app.cancel_speculation()
 
     def display_loading(self):
         """Show the panel with a loading indicator."""
@@ -174,19 +225,53 @@ class MainWindow:
     def show_stream_start(self):
         """Hide loading and prepare textbox for streaming."""
         self.loading_label.place_forget()
+        self._destroy_multi_tabview()
         self.feedback_textbox.pack(side="top", fill="both", expand=True, padx=10, pady=(0, 5))
-        self.clear_feedback_text()
+        self._clear_textbox() # Keep any long-text progress visible
     
     def append_stream_content(self, text: str):
-        self.feedback_textbox.configure(state="normal")
-        self.feedback_textbox.insert("end", text)
-        self.feedback_textbox.see("end")
-        self.feedback_textbox.configure(state="disabled")
+        self.feedback_renderer.append(text)
+
+    def show_multi_stream_start(self, channels: list[str]):
+        """Hide loading and build one tab with its own textbox per channel."""
+        self.loading_label.place_forget()
+        self.feedback_textbox.pack_forget()
+        self._destroy_multi_tabview()
+        self.multi_tabview = ctk.CTkTabview(self.ai_response_frame, fg_color="transparent", height=config.PANEL_MAX_HEIGHT - 60)
+        self.multi_tabview.pack(side="top", fill="both", expand=True, padx=10, pady=(0, 5))
+        for channel in channels:
+            tab = self.multi_tabview.add(channel)
+            textbox = ctk.CTkTextbox(tab, wrap="word", state="disabled", fg_color="transparent", border_width=0)
+            textbox.pack(fill="both", expand=True)
+            self.multi_renderers[channel] = StreamRenderer(textbox)
+
+    def append_channel_content(self, channel: str, text: str):
+        renderer = self.multi_renderers.get(channel)
+        if renderer is not None:
+            renderer.append(text)
+
+    def finish_stream(self):
+        """Formats the last line of every output once the stream has ended."""
+        self.feedback_renderer.finish()
+        for renderer in self.multi_renderers.values():
+            renderer.finish()
+
+    def _destroy_multi_tabview(self):
+        if self.multi_tabview is not None:
+            self.multi_tabview.destroy()
+            self.multi_tabview = None
+        self.multi_renderers = {}
+
+    def show_progress(self, text: str):
+        self.progress_label.configure(text=text)
 
     def clear_feedback_text(self):
-        self.feedback_textbox.configure(state="normal")
-        self.feedback_textbox.delete("1.0", "end")
-        self.feedback_textbox.configure(state="disabled")
+        self.progress_label.configure(text="")
+        self._destroy_multi_tabview()
+        self._clear_textbox()
+
+    def _clear_textbox(self):
+        self.feedback_renderer.reset()
 
     def hide_panel(self, immediate=False):
         if not self.is_panel_visible or self.is_animating:
@@ -212,26 +297,59 @@ class MainWindow:
     
     def switch_panel_view(self, view: str):
         self.app.current_panel_view = view
+        for frame in self.panel_views.values():
+            frame.pack_forget()
+        self._get_panel_view(view).pack(fill="both", expand=True)
         if view == "settings":
-            self.ai_response_frame.pack_forget()
-            self.settings_frame.pack(fill="both", expand=True)
             self.populate_settings_ui()
-        else: # "ai"
-            self.settings_frame.pack_forget()
-            self.ai_response_frame.pack(fill="both", expand=True)
+        elif view == "stats":
+            self.populate_stats_view()
+        elif view == "history":
+            self.app.search_history(self.history_entry.get())
+
+    def populate_stats_view(self):
+        self.stats_message_label.configure(text="")
+        self.stats_textbox.configure(state="normal")
+        self.stats_textbox.delete("1.0", "end")
+        self.stats_textbox.insert("end", self.app.latency_stats.format_table())
+        self.stats_textbox.configure(state="disabled")
+
+    def show_stats_message(self, text: str):
+        self.stats_message_label.configure(text=text)
+
+    def populate_history_view(self, entries: list[dict], empty_message: str = "No matching history."):
+        lines = []
+        for entry in entries:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created_at"]))
+            action = entry["action"] + (f" ({entry['target_language']})" if entry.get("target_language") else "")
+            lines.append(f"[{when}] {action} - {entry['model']}\n> {entry['input'][:200]}\n{entry['output'][:400]}\n")
+        self.history_textbox.configure(state="normal")
+        self.history_textbox.delete("1.0", "end")
+        self.history_textbox.insert("end", "\n".join(lines) or empty_message)
+        self.history_textbox.configure(state="disabled")
 
     def populate_settings_ui(self):
         provider_name = self.settings_widgets["provider_var"].get()
-        provider_data = self.app.settings_manager.settings["providers"][provider_name]
-        self.settings_widgets["api_url_entry"].delete(0, "end"); self.settings_widgets["api_url_entry"].insert(0, provider_data["api_url"])
-        self.settings_widgets["model_name_entry"].delete(0, "end"); self.settings_widgets["model_name_entry"].insert(0, provider_data["model_name"])
-        self.settings_widgets["api_key_entry"].delete(0, "end"); self.settings_widgets["api_key_entry"].insert(0, provider_data["api_key"])
+        provider = self.app.settings_manager.provider(provider_name)
+        self.settings_widgets["api_url_entry"].delete(0, "end"); self.settings_widgets["api_url_entry"].insert(0, provider.api_url)
+        self.settings_widgets["model_name_entry"].delete(0, "end"); self.settings_widgets["model_name_entry"].insert(0, provider.model_name)
+        self.settings_widgets["api_key_entry"].delete(0, "end"); self.settings_widgets["api_key_entry"].insert(0, provider.api_key)
         
         if provider_name == "Ollama":
             self.settings_widgets["api_key_label"].grid_forget(); self.settings_widgets["api_key_entry"].grid_forget()
         else:
             self.settings_widgets["api_key_label"].grid(row=3, column=0, padx=10, pady=8, sticky="w")
             self.settings_widgets["api_key_entry"].grid(row=3, column=1, padx=10, pady=8, sticky="ew")
+
+        self.settings_widgets["cache_enabled_var"].set(self.app.settings_manager.get("response_cache", {}).get("enabled", True))
+        self.update_cache_stats(self.app.response_cache.stats())
+
+    def update_cache_stats(self, stats: dict):
+        if "cache_stats_label" not in self.settings_widgets:
+            return # Settings view not built yet
+        self.settings_widgets["cache_stats_label"].configure(
+            text=f"Cache: {stats['hits']} hits ({stats['warm_hits']} from history) / {stats['misses']} misses, {stats['disk_entries']} stored"
+        )
             
     # --- Internal Helper Methods ---
     
@@ -282,7 +400,7 @@ class MainWindow:
 
     def _create_icon_button(self, parent, icon_name, command, side="left", hover_color=None):
         button = ctk.CTkButton(
-            parent, text="", image=self.icons.get(icon_name), command=command,
+            parent, text="", image=get_icon(icon_name), command=command,
             width=config.BUTTON_SIZE, height=config.BUTTON_SIZE,
             corner_radius=config.BUTTON_SIZE // 2, fg_color="transparent",
             hover_color=hover_color or ctk.ThemeManager.theme["CTkButton"]["hover_color"]
@@ -291,27 +409,54 @@ class MainWindow:
         return button
 
     def _show_translation_menu(self):
-        if hasattr(self, "_translation_menu") and self._translation_menu.winfo_exists():
-            self._translation_menu.destroy()
+        if self._translation_menu is not None and self._translation_menu.winfo_viewable():
+            self.hide_translation_menu()
             return
         translate_button = self.toolbar_frame.winfo_children()[0].winfo_children()[0]
         x, y = translate_button.winfo_rootx(), translate_button.winfo_rooty() + translate_button.winfo_height() + 5
-        
+
+        if self._translation_menu is None:
+            self._translation_menu = self._build_translation_menu()
+        menu = self._translation_menu
+        menu.geometry(f"+{x}+{y}")
+        menu.deiconify(); menu.lift(); menu.focus_set()
+
+    def hide_translation_menu(self):
+        if self._translation_menu is not None:
+            self._translation_menu.withdraw()
+
+    def _build_translation_menu(self) -> ctk.CTkToplevel:
+        """Built once on first use, then only shown and withdrawn."""
         menu = ctk.CTkToplevel(self.root)
-        menu.overrideredirect(True); menu.attributes("-topmost", True); menu.geometry(f"+{x}+{y}")
-        self._translation_menu = menu
-        
-        menu.bind("<FocusOut>", lambda e: menu.destroy())
+        menu.overrideredirect(True); menu.attributes("-topmost", True)
+        menu.bind("<FocusOut>", lambda e: menu.withdraw())
         menu_frame = ctk.CTkFrame(menu, corner_radius=8); menu_frame.pack(padx=2, pady=2)
-        for display, lang_code in config.TRANSLATION_TARGETS:
+        selected = {}
+        for row, (display, lang_code) in enumerate(config.TRANSLATION_TARGETS):
+            # Checkbox marks the language for a multi-target run; the button translates right away
+            selected[lang_code] = ctk.BooleanVar(value=False)
+            ctk.CTkCheckBox(menu_frame, text="", width=24, variable=selected[lang_code]).grid(row=row, column=0, padx=(8, 0), pady=2)
             lang_button = ctk.CTkButton(
                 menu_frame, text=display, fg_color="transparent", anchor="w", text_color=config.TRANSLATION_BUTTON_COLOR,
                 command=lambda lc=lang_code: self.app.on_language_select(lc)
             )
-            lang_button.pack(fill="x", padx=5, pady=2)
-        menu.focus_set()
+            lang_button.grid(row=row, column=1, sticky="ew", padx=5, pady=2)
+        multi_button = ctk.CTkButton(
+            menu_frame, text="Translate selected",
+            command=lambda: self.app.on_multi_language_select([lc for lc, var in selected.items() if var.get()])
+        )
+        multi_button.grid(row=len(config.TRANSLATION_TARGETS), column=0, columnspan=2, sticky="ew", padx=5, pady=(4, 6))
+        return menu
 
     def _copy_results_to_clipboard(self):
-        content = self.feedback_textbox.get("1.0", "end-1c")
+        # The markdown as received, not the formatted text on screen
+        if self.multi_renderers:
+            # One combined output covering every target language
+            content = "\n\n".join(
+                f"[{channel}]\n{renderer.source}" for channel, renderer in self.multi_renderers.items()
+            )
+        else:
+            content = self.feedback_renderer.source
         if content:
+            import pyperclip # Deferred: only needed once something is copied
             pyperclip.copy(content)
\ No newline at end of file
@@ -0,0 +1,178 @@
+# src/ui/stream_renderer.py
+
+import re
+import tkinter.font as tkfont
+
+_FENCE = re.compile(r"\s*(```|~~~)")
+_HEADING = re.compile(r"(#{1,3})\s+(.*)")
+_BULLET = re.compile(r"( *)[-*+]\s+(.*)")
+_NUMBERED = re.compile(r"( *)(\d{1,3}[.)])\s+(.*)")
+_QUOTE = re.compile(r">\s?(.*)")
+# Bold before italic so '**' is never read as two single stars
+_INLINE = re.compile(r"\*\*(?P<bold>[^*]+?)\*\*|`(?P<code>[^`]+)`|(?<![\w*])\*(?P<italic>[^*\s][^*]*?)\*(?![\w*])")
+
+TAIL_MARK = "stream_tail" # Start of the unfinished last line
+MAX_INDENT = 3
+
+class MarkdownLineParser:
+    """
+    Turns markdown into (text, tags) runs one complete line at a time. The
+    only state carried between lines is whether a code block is open, so a
+    line never has to be looked at again once it is rendered.
+    """
+
+    def __init__(self):
+        self.in_code_block = False
+
+    def reset(self):
+        self.in_code_block = False
+
+    def parse_line(self, line: str) -> list[tuple[str, tuple]]:
+        """The runs of one line, without its newline; an empty list hides the line."""
+        if _FENCE.match(line):
+            self.in_code_block = not self.in_code_block
+            return []
+        if self.in_code_block:
+            return [(line, ("codeblock",))]
+        match = _HEADING.match(line)
+        if match:
+            return _inline(match.group(2), (f"h{len(match.group(1))}",))
+        match = _BULLET.match(line)
+        if match:
+            tag = f"list{min(len(match.group(1)) // 2, MAX_INDENT - 1)}"
+            return [("• ", (tag,))] + _inline(match.group(2), (tag,))
+        match = _NUMBERED.match(line)
+        if match:
+            tag = f"list{min(len(match.group(1)) // 2, MAX_INDENT - 1)}"
+            return [(match.group(2) + " ", (tag,))] + _inline(match.group(3), (tag,))
+        match = _QUOTE.match(line)
+        if match:
+            return _inline(match.group(1), ("quote",))
+        return _inline(line, ())
+
+def _inline(text: str, tags: tuple) -> list[tuple[str, tuple]]:
+    runs = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            runs.append((text[position:match.start()], tags))
+        kind = match.lastgroup
+        runs.append((match.group(kind), tags + (kind,)))
+        position = match.end()
+    if position < len(text) or not runs:
+        runs.append((text[position:], tags))
+    return runs
+
+class StreamRenderer:
+    """
+    Renders streamed markdown into a CTkTextbox. Text is appended raw until
+    its line is complete; then only that line is replaced by its formatted
+    version, so each append costs time in proportion to the new text, not the
+    whole document. The view follows new text only while the user is at the
+    bottom; scrolling up to read stops the autoscroll.
+    """
+
+    def __init__(self, textbox):
+        # The underlying tk.Text: CTkTextbox rejects fonts in tags and wraps every call
+        self.text = textbox._textbox
+        self.parser = MarkdownLineParser()
+        self._parts: list[str] = []
+        self._tail = "" # Unfinished last line, shown raw
+        self._configure_tags()
+        self.text.mark_set(TAIL_MARK, "end-1c")
+        self.text.mark_gravity(TAIL_MARK, "left")
+
+    def _configure_tags(self):
+        base = tkfont.Font(font=self.text.cget("font"))
+        size = base.actual("size")
+        # Kept on the renderer: a named font is deleted when its Font object is collected
+        self._fonts = {
+            "h1": _derive(base, size * 1.4, "bold"),
+            "h2": _derive(base, size * 1.25, "bold"),
+            "h3": _derive(base, size * 1.1, "bold"),
+            "bold": _derive(base, size, "bold"),
+            "italic": _derive(base, size, slant="italic"),
+            "code": tkfont.Font(family="Consolas", size=size),
+        }
+        for tag, font in self._fonts.items():
+            self.text.tag_configure(tag, font=font)
+        self._fonts["codeblock"] = self._fonts["code"]
+        self.text.tag_configure("codeblock", font=self._fonts["code"], lmargin1=12, lmargin2=12)
+        indent = base.measure("• ")
+        for level in range(MAX_INDENT):
+            left = 4 + level * 16
+            self.text.tag_configure(f"list{level}", lmargin1=left, lmargin2=left + indent)
+        self.text.tag_configure("quote", lmargin1=12, lmargin2=12, foreground="gray55")
+        for tag in ("h1", "h2", "h3"):
+            self.text.tag_configure(tag, spacing1=4, spacing3=2)
+        # Headings and code take precedence over the list and quote margins
+        for tag in ("quote", "codeblock", "h3", "h2", "h1"):
+            self.text.tag_raise(tag)
+
+    @property
+    def source(self) -> str:
+        """Everything appended, as the model wrote it."""
+        return "".join(self._parts)
+
+    def reset(self):
+        self._parts = []
+        self._tail = ""
+        self.parser.reset()
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.configure(state="disabled")
+        self.text.mark_set(TAIL_MARK, "end-1c")
+
+    def append(self, chunk: str):
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        follow = self.text.yview()[1] >= 1.0 # Measured before the insert grows the document
+        self.text.configure(state="normal")
+        if "\n" not in chunk:
+            self._tail += chunk
+            self.text.insert("end-1c", chunk, self._tail_tags())
+        else:
+            lines = (self._tail + chunk).split("\n")
+            self._tail = lines.pop()
+            self._render_lines(lines)
+        self.text.configure(state="disabled")
+        if follow:
+            self.text.see("end")
+
+    def finish(self):
+        """Formats the last line once the stream is over."""
+        if not self._tail:
+            return
+        lines, self._tail = [self._tail], ""
+        self.text.configure(state="normal")
+        self._render_lines(lines, final=True)
+        self.text.configure(state="disabled")
+
+    def _render_lines(self, lines: list[str], final: bool = False):
+        # One insert with every (text, tags) pair: a single widget call per frame, not one per tag
+        args = []
+        for line in lines:
+            runs = self.parser.parse_line(line)
+            if not runs:
+                continue # A fence line renders to nothing, newline included
+            for text, tags in runs:
+                if text:
+                    args += (text, tags)
+            if not final:
+                args += ("\n", ())
+        self.text.delete(TAIL_MARK, "end-1c")
+        if args:
+            self.text.insert("end-1c", *args)
+        self.text.mark_set(TAIL_MARK, "end-1c")
+        if self._tail:
+            self.text.insert("end-1c", self._tail, self._tail_tags())
+
+    def _tail_tags(self) -> tuple:
+        return ("codeblock",) if self.parser.in_code_block else ()
+
+def _derive(base: tkfont.Font, size: float, weight: str = "normal", slant: str = "roman") -> tkfont.Font:
+    font = base.copy()
+    # Negative sizes are pixels; keep the sign so scaling stays consistent
+    font.configure(size=round(size), weight=weight, slant=slant)
+    return font
@@ -0,0 +1,32 @@
+# tests/test_ai_task.py
+
+from concurrent.futures import Future
+
+from src.ai_task import AITask
+
+def test_when_done_waits_for_the_stream():
+    task = AITask(1, "polish_text")
+    future = Future()
+    task.attach(future)
+    calls = []
+    task.when_done(lambda: calls.append("released"))
+    assert calls == []
+    future.set_result(None)
+    assert calls == ["released"]
+
+def test_when_done_runs_at_once_without_a_live_stream():
+    calls = []
+    AITask(1, "polish_text").when_done(lambda: calls.append("unattached"))
+    task = AITask(2, "polish_text")
+    future = Future()
+    task.attach(future)
+    task.cancel()
+    task.when_done(lambda: calls.append("cancelled"))
+    assert calls == ["unattached", "cancelled"]
+
+def test_cancel_before_attach_cancels_the_future():
+    task = AITask(1, "polish_text")
+    task.cancel()
+    future = Future()
+    task.attach(future)
+    assert future.cancelled() and task.done
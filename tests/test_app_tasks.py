@@ -0,0 +1,71 @@
+# tests/test_app_tasks.py
+
+import itertools
+import queue
+from concurrent.futures import Future
+
+from src.app import QuickAIToolkit
+from src.response_cache import ResponseCache
+from src.settings_manager import SettingsManager
+
+class FakeLoop:
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, coro) -> Future:
+        coro.close() # Never run: the test only checks what gets started
+        self.futures.append(Future())
+        return self.futures[-1]
+
+class FakeClient:
+    async def astream_response(self, messages):
+        yield "ok"
+
+class FakeRoot:
+    def after_idle(self, callback):
+        pass
+
+class FakeUI:
+    def display_loading(self):
+        pass
+
+def _make_app(tmp_path) -> QuickAIToolkit:
+    app = QuickAIToolkit.__new__(QuickAIToolkit)
+    app.root, app.ui = FakeRoot(), FakeUI()
+    app.settings_manager = SettingsManager(str(tmp_path / "settings.json"))
+    app.response_queue = queue.Queue()
+    app.response_cache = ResponseCache(str(tmp_path / "cache.db"))
+    app.async_loop = FakeLoop()
+    app.ai_client = FakeClient()
+    app.segment_index = None
+    app.speculation = None
+    app.current_task = None
+    app._task_ids = itertools.count(1)
+    app._activation_marks = {}
+    app._pump_scheduled = False
+    app.selected_text = "hello world"
+    return app
+
+def test_repeating_a_running_action_keeps_its_stream(tmp_path):
+    app = _make_app(tmp_path)
+    first = app.start_ai_task("translate", target_language="English")
+    second = app.start_ai_task("translate", target_language="English")
+    assert second is first and not first.cancelled
+    assert len(app.async_loop.futures) == 1 # The upstream is opened once
+
+def test_a_different_action_or_text_supersedes_the_running_task(tmp_path):
+    app = _make_app(tmp_path)
+    first = app.start_ai_task("translate", target_language="English")
+    other_language = app.start_ai_task("translate", target_language="Japanese")
+    assert other_language is not first and first.cancelled
+    app.selected_text = "something else"
+    other_text = app.start_ai_task("translate", target_language="Japanese")
+    assert other_text is not other_language and other_language.cancelled
+    assert len(app.async_loop.futures) == 3
+
+def test_a_finished_task_is_started_again(tmp_path):
+    app = _make_app(tmp_path)
+    first = app.start_ai_task("polish_text")
+    app.async_loop.futures[0].set_result(None)
+    second = app.start_ai_task("polish_text")
+    assert second is not first and len(app.async_loop.futures) == 2
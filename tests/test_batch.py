@@ -0,0 +1,49 @@
+# tests/test_batch.py
+
+import asyncio
+import io
+import json
+
+from src import batch, config
+
+class FakeClient:
+    async def astream_response(self, messages):
+        text = messages[-1]["content"]
+        if "boom" in text:
+            raise RuntimeError("connection reset")
+        yield "ok"
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        pass
+
+def _run(tmp_path, monkeypatch, lines: list[str], concurrency: int = 2) -> list[dict]:
+    monkeypatch.setattr(config, "SETTINGS_FILE_PATH", str(tmp_path / "settings.json"))
+    monkeypatch.setattr(batch, "create_client", lambda settings_manager, provider=None: FakeClient())
+    args = batch.build_arg_parser().parse_args(["--action", "polish_text", "--no-cache", "--concurrency", str(concurrency)])
+    output = io.StringIO()
+    written = asyncio.run(batch.run_batch(args, io.StringIO("\n".join(lines) + "\n"), output))
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert written == len(results) == len(lines)
+    return results
+
+def test_records_are_written_in_input_order(tmp_path, monkeypatch):
+    results = _run(tmp_path, monkeypatch, [json.dumps({"id": f"r{i}", "text": f"text {i}"}) for i in range(10)])
+    assert [r["id"] for r in results] == [f"r{i}" for i in range(10)]
+    assert all(r["output"] == "ok" and "error" not in r for r in results)
+
+def test_a_non_string_field_becomes_an_error_record(tmp_path, monkeypatch):
+    lines = [json.dumps({"text": f"text {i}"}) for i in range(10)]
+    lines.insert(3, json.dumps({"text": 123}))
+    lines.insert(7, json.dumps({"text": "hello", "target_language": ["en"]}))
+    results = _run(tmp_path, monkeypatch, lines)
+    assert [r["index"] for r in results] == list(range(12))
+    assert [i for i, r in enumerate(results) if "error" in r] == [3, 7]
+
+def test_a_failing_request_does_not_stall_the_records_behind_it(tmp_path, monkeypatch):
+    lines = [json.dumps({"text": "boom" if i == 0 else f"text {i}"}) for i in range(20)]
+    results = _run(tmp_path, monkeypatch, lines, concurrency=1)
+    assert "connection reset" in results[0]["error"] and results[0]["output"] is None
+    assert all(r["output"] == "ok" for r in results[1:])
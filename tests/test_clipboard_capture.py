@@ -0,0 +1,61 @@
+# tests/test_clipboard_capture.py
+
+import time
+
+from src.clipboard_handler import ClipboardCapture, FakeClipboardBackend
+
+def _capture(backend: FakeClipboardBackend, timeout_ms: float = 500) -> tuple[ClipboardCapture, str | None, float]:
+    capture = ClipboardCapture(backend, timeout_ms=timeout_ms, poll_interval_ms=1)
+    start = time.perf_counter()
+    text = capture.capture_selection()
+    return capture, text, (time.perf_counter() - start) * 1000
+
+def _wait_for_restore(capture: ClipboardCapture):
+    if capture._restore_thread is not None:
+        capture._restore_thread.join(timeout=1)
+
+def test_sequence_number_detects_the_copy_without_fixed_sleeps():
+    backend = FakeClipboardBackend(selection="hello", clipboard="original", copy_latency_ms=10)
+    capture, text, elapsed_ms = _capture(backend)
+    assert text == "hello"
+    assert elapsed_ms < 250 # Returns once the copy lands, not after the full timeout
+    _wait_for_restore(capture)
+    assert backend.clipboard == "original"
+
+def test_polling_fallback_without_a_sequence_number():
+    backend = FakeClipboardBackend(selection="hello", clipboard="original", copy_latency_ms=10, with_sequence=False)
+    capture, text, elapsed_ms = _capture(backend)
+    assert text == "hello"
+    assert elapsed_ms < 250
+    _wait_for_restore(capture)
+    assert backend.clipboard == "original"
+
+def test_nothing_selected_times_out_and_leaves_the_clipboard_alone():
+    backend = FakeClipboardBackend(selection=None, clipboard="original")
+    capture, text, elapsed_ms = _capture(backend, timeout_ms=50)
+    assert text is None
+    assert elapsed_ms >= 50
+    assert capture._restore_thread is None and backend.writes == 0
+    assert backend.clipboard == "original"
+
+def test_polling_timeout_restores_the_cleared_clipboard():
+    backend = FakeClipboardBackend(selection=None, clipboard="original", with_sequence=False)
+    capture, text, _elapsed_ms = _capture(backend, timeout_ms=30)
+    assert text is None
+    _wait_for_restore(capture)
+    assert backend.clipboard == "original"
+
+def test_restore_is_skipped_when_the_selection_matches_the_clipboard():
+    backend = FakeClipboardBackend(selection="same", clipboard="same", copy_latency_ms=5)
+    capture, text, _elapsed_ms = _capture(backend)
+    assert text == "same"
+    assert capture._restore_thread is None and backend.writes == 0
+
+def test_the_next_capture_waits_for_the_previous_restore():
+    backend = FakeClipboardBackend(selection="first", clipboard="original", copy_latency_ms=5)
+    capture = ClipboardCapture(backend, poll_interval_ms=1)
+    assert capture.capture_selection() == "first"
+    backend.selection = "second"
+    assert capture.capture_selection() == "second"
+    _wait_for_restore(capture)
+    assert backend.clipboard == "original" # Not the first selection
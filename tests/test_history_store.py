@@ -0,0 +1,110 @@
+# tests/test_history_store.py
+
+import time
+
+import pytest
+
+from src.history_store import HistoryStore
+
+def _entry(text: str, action: str = "polish_text", **fields) -> dict:
+    return {"provider": "ollama", "model": "m", "action": action, "input": text, "output": f"out: {text}", **fields}
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval_s=10, batch_size=100)
+    yield store
+    store.close()
+
+def test_writes_are_batched_until_flush(store):
+    for index in range(10):
+        store.record(_entry(f"text {index}"))
+    time.sleep(0.05)
+    assert store.count() == 0 # Still waiting for a full batch or the flush interval
+    store.flush(timeout=5)
+    assert store.count() == 10
+
+def test_a_full_batch_is_committed_without_flush(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), flush_interval_s=10, batch_size=5)
+    try:
+        for index in range(5):
+            store.record(_entry(f"text {index}"))
+        deadline = time.monotonic() + 5
+        while store.count() < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.count() == 5
+    finally:
+        store.close()
+
+def test_close_commits_what_is_queued(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = HistoryStore(path, flush_interval_s=10)
+    store.record(_entry("queued"))
+    store.close()
+    reopened = HistoryStore(path)
+    try:
+        assert reopened.count() == 1
+    finally:
+        reopened.close()
+
+def _fill_for_search(store: HistoryStore):
+    store.record(_entry("the quick brown fox"))
+    store.record(_entry("a lazy dog", action="translate"))
+    store.record(_entry("quick fix for 50% off_sale"))
+    store.flush(timeout=5)
+
+@pytest.mark.parametrize("use_fts", [True, False])
+def test_search_matches_every_term_newest_first(store, use_fts):
+    if use_fts and not store.has_fts:
+        pytest.skip("SQLite without FTS5 trigram")
+    store.has_fts = use_fts # False exercises the LIKE fallback
+    _fill_for_search(store)
+    assert [row["input"] for row in store.search("quick")] == ["quick fix for 50% off_sale", "the quick brown fox"]
+    assert [row["input"] for row in store.search("quick fox")] == ["the quick brown fox"]
+    assert [row["input"] for row in store.search("out: lazy")] == ["a lazy dog"] # Output text is searched too
+    assert [row["input"] for row in store.search("quick", action="translate")] == []
+    assert [row["input"] for row in store.search(action="translate")] == ["a lazy dog"]
+    assert len(store.search(limit=2)) == 2
+
+@pytest.mark.parametrize("use_fts", [True, False])
+def test_short_terms_and_wildcards_match_literally(store, use_fts):
+    if use_fts and not store.has_fts:
+        pytest.skip("SQLite without FTS5 trigram")
+    store.has_fts = use_fts
+    _fill_for_search(store)
+    assert [row["input"] for row in store.search("50%")] == ["quick fix for 50% off_sale"]
+    assert [row["input"] for row in store.search("fix_for")] == [] # "_" is not a wildcard
+    assert [row["input"] for row in store.search("a")] != [] # Too short for the trigram index
+
+def test_retention_drops_old_entries(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), retention_days=1, compact_every=1)
+    try:
+        store.record(_entry("old", created_at=time.time() - 2 * 86400))
+        store.record(_entry("new"))
+        store.flush(timeout=5)
+        assert [row["input"] for row in store.search()] == ["new"]
+        assert store.search("old") == []
+    finally:
+        store.close()
+
+def test_compaction_keeps_the_newest_max_entries(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), max_entries=3, compact_every=1)
+    try:
+        now = time.time()
+        for index in range(5):
+            store.record(_entry(f"text {index}", created_at=now + index))
+        store.flush(timeout=5)
+        assert [row["input"] for row in store.search()] == ["text 4", "text 3", "text 2"]
+    finally:
+        store.close()
+
+def test_lookup_returns_the_latest_successful_output(store):
+    now = time.time()
+    store.record(_entry("a", cache_key="k", output="first", created_at=now - 100))
+    store.record(_entry("a", cache_key="k", output="second", created_at=now - 50))
+    store.record(_entry("a", cache_key="k", output="failed", failed=True, created_at=now))
+    store.flush(timeout=5)
+    assert store.lookup("k") == "second"
+    assert store.lookup("k", max_age_s=10) is None
+    assert store.lookup("k", min_created_at=now - 10) is None # Older than the last cache clear
+    assert store.lookup("k", min_created_at=now - 75) == "second"
+    assert store.lookup("missing") is None
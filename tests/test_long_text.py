@@ -0,0 +1,63 @@
+# tests/test_long_text.py
+
+import asyncio
+
+from src import long_text
+
+class _EchoClient:
+    """Answers every request with its own input, so merging never shrinks anything."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def astream_response(self, messages):
+        self.calls += 1
+        yield messages[-1]["content"]
+
+def _summarize(client, text: str, max_tokens: int) -> str:
+    async def run():
+        stream = long_text.stream_chunked(client, "summarize_points", text, max_tokens, 4, lambda _text: None)
+        return "".join([chunk async for chunk in stream])
+    return asyncio.run(run())
+
+def test_split_text_respects_budget():
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * 40 for i in range(20))
+    chunks = long_text.split_text(text, 100)
+    assert len(chunks) > 1
+    assert all(long_text.estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+def test_map_reduce_stops_when_merges_do_not_shrink():
+    client = _EchoClient()
+    text = "\n\n".join("word " * 60 for _ in range(30))
+    result = _summarize(client, text, 100)
+    assert result
+    # One map pass, at most one re-reduce pass (no progress after it), one final merge
+    map_calls = len(long_text.split_text(text, 100))
+    assert client.calls <= map_calls * (long_text.MAX_REDUCE_PASSES + 1) + 1
+    assert long_text.estimate_tokens(result) <= 200
+
+def test_map_reduce_skips_reduce_when_it_fits():
+    client = _EchoClient()
+    _summarize(client, "short paragraph one.\n\nshort paragraph two.", 1000)
+    assert client.calls == 2 # One section summary, one final merge
+
+class _FailingSectionClient:
+    """Streams each section back, except that the one containing 'boom' fails mid-stream."""
+
+    async def astream_response(self, messages):
+        text = messages[-1]["content"]
+        yield "start "
+        if "boom" in text:
+            raise ConnectionError("connection reset")
+        yield "end"
+
+def test_failed_section_is_reported_in_place():
+    async def run():
+        chunks = ["first section.", "boom section.", "third section."]
+        stream = long_text._ordered_parallel(_FailingSectionClient(), "polish_text", chunks, 2, lambda _text: None)
+        return [chunk async for chunk in stream]
+    chunks = asyncio.run(run())
+    errors = [chunk for chunk in chunks if long_text.is_error_chunk(chunk)]
+    assert len(errors) == 1 and "connection reset" in errors[0] and "Section 2" in errors[0]
+    # Sections after the failed one are still streamed, in order
+    assert chunks[-1] == "end" and chunks.index(errors[0]) < len(chunks) - 3
@@ -0,0 +1,109 @@
+# tests/test_multi_translate.py
+
+import asyncio
+import queue
+
+from src.ai_task import AITask, STREAM_START, STREAM_CHANNEL_CHUNK, STREAM_END
+from src.app import QuickAIToolkit
+from src.pipeline import ActionRequest
+from src.response_cache import ResponseCache
+from src.settings_manager import SettingsManager
+
+LANGUAGES = ["Simplified Chinese", "English", "Japanese"]
+
+class FakeClient:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = []
+
+    async def astream_response(self, messages):
+        language = messages[-1]["content"].rsplit("Target language: ", 1)[1]
+        self.calls.append(language)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            for index in range(3):
+                await asyncio.sleep(0.001 * (len(language) % 3 + 1)) # Interleave the languages
+                yield f"{language}-{index} "
+        finally:
+            self.in_flight -= 1
+
+class FakeRoot:
+    def after(self, delay_ms, callback):
+        pass
+
+    def after_idle(self, callback):
+        pass
+
+class FakeUI:
+    def __init__(self):
+        self.channels = None
+        self.content: dict[str, str] = {}
+        self.finished = False
+
+    def show_multi_stream_start(self, channels):
+        self.channels = channels
+
+    def append_channel_content(self, channel, text):
+        self.content[channel] = self.content.get(channel, "") + text
+
+    def finish_stream(self):
+        self.finished = True
+
+def _make_app(tmp_path) -> QuickAIToolkit:
+    app = QuickAIToolkit.__new__(QuickAIToolkit)
+    app.root, app.ui = FakeRoot(), FakeUI()
+    app.settings_manager = SettingsManager(str(tmp_path / "settings.json"))
+    app.response_queue = queue.Queue()
+    app.response_cache = ResponseCache(str(tmp_path / "cache.db"))
+    app.ai_client = FakeClient()
+    app.segment_index = None
+    app.history = None
+    app.current_task = AITask(1, "translate_multi")
+    app._pump_scheduled = False
+    app._frame_interval_ms = 16
+    return app
+
+def _run(app: QuickAIToolkit, max_parallel: int) -> list[tuple]:
+    requests = [ActionRequest(app.settings_manager, "translate", "hello world", target_language=lang) for lang in LANGUAGES]
+    asyncio.run(app._run_multi_translation(1, requests, max_parallel))
+    items = []
+    while not app.response_queue.empty():
+        items.append(app.response_queue.get_nowait())
+    return items
+
+def test_each_language_streams_into_its_own_channel_in_order(tmp_path):
+    app = _make_app(tmp_path)
+    items = _run(app, max_parallel=3)
+    assert items[0] == (1, STREAM_START, LANGUAGES)
+    assert items[-1] == (1, STREAM_END, None)
+    for language in LANGUAGES:
+        chunks = [payload[1] for _, kind, payload in items if kind == STREAM_CHANNEL_CHUNK and payload[0] == language]
+        assert chunks == [f"{language}-{index} " for index in range(3)]
+    assert app.ai_client.peak == 3 # All languages ran concurrently
+
+def test_concurrency_is_capped(tmp_path):
+    app = _make_app(tmp_path)
+    _run(app, max_parallel=2)
+    assert app.ai_client.peak == 2
+    assert sorted(app.ai_client.calls) == sorted(LANGUAGES)
+
+def test_a_cached_language_is_not_requested_again(tmp_path):
+    app = _make_app(tmp_path)
+    _run(app, max_parallel=3)
+    app.ai_client = FakeClient()
+    items = _run(app, max_parallel=3)
+    assert app.ai_client.calls == []
+    assert [payload for _, kind, payload in items if kind == STREAM_CHANNEL_CHUNK] == [
+        (language, "".join(f"{language}-{index} " for index in range(3))) for language in LANGUAGES
+    ]
+
+def test_the_pump_routes_channel_chunks_to_their_tabs(tmp_path):
+    app = _make_app(tmp_path)
+    for item in _run(app, max_parallel=3):
+        app.response_queue.put(item)
+    app.process_queue()
+    assert app.ui.channels == LANGUAGES
+    assert app.ui.content == {language: "".join(f"{language}-{index} " for index in range(3)) for language in LANGUAGES}
+    assert app.ui.finished and app.current_task is None
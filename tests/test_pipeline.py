@@ -0,0 +1,49 @@
+# tests/test_pipeline.py
+
+import json
+
+from src.pipeline import ActionRequest, describe_client
+from src.segment_index import SegmentIndex
+from src.settings_manager import SettingsManager
+
+def _settings(tmp_path, **overrides) -> SettingsManager:
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps(overrides), encoding="utf-8")
+    return SettingsManager(str(path))
+
+def test_direct_provider_is_described_by_its_model(tmp_path):
+    settings = _settings(tmp_path, current_provider="OpenAI")
+    assert describe_client(settings) == ("OpenAI", ["gpt-4o"])
+
+def test_routing_keys_requests_on_every_routed_provider(tmp_path):
+    routed = _settings(tmp_path, current_provider="Ollama", routing={"enabled": True, "providers": ["Ollama", "OpenAI", "Missing"]})
+    label, models = describe_client(routed)
+    assert label == "routing(Ollama, OpenAI)"
+    assert models == ["granite4:latest", "gpt-4o"]
+
+    request = ActionRequest(routed, "polish_text", "Some text.")
+    assert request.provider_name == label
+    (tmp_path / "direct").mkdir()
+    direct = ActionRequest(_settings(tmp_path / "direct", current_provider="Ollama"), "polish_text", "Some text.")
+    # An answer from a fallback provider must never be served as the primary provider's
+    assert request.cache_key != direct.cache_key
+    assert request.segment_scope != direct.segment_scope
+
+def test_routing_chunk_budget_fits_the_smallest_model(tmp_path):
+    budget = {"context_limits": {"small": 1500, "large": 100000}, "reserve_output_tokens": 200}
+    providers = {"A": {"model_name": "small"}, "B": {"model_name": "large"}}
+    routed = _settings(tmp_path, providers=providers, token_budget=budget, routing={"enabled": True, "providers": ["B", "A"]})
+    request = ActionRequest(routed, "polish_text", "Some text.")
+    assert request.chunk_budget <= 1500 - 200
+
+def test_incremental_reuse_follows_the_response_cache_toggle(tmp_path):
+    index = SegmentIndex(str(tmp_path / "segments.db"))
+    text = "Eins.\n\nZwei."
+    enabled = ActionRequest(_settings(tmp_path), "translate", text, target_language="English")
+    index.record(enabled.segment_scope, "Eins.", "One.")
+    assert enabled.plan_incremental(index) == 1
+
+    disabled = ActionRequest(_settings(tmp_path, response_cache={"enabled": False}), "translate", text, target_language="English")
+    assert disabled.cache_key is None and disabled.segment_scope is None
+    assert disabled.plan_incremental(index) == 0 and disabled.segments is None
+    index.close()
@@ -0,0 +1,118 @@
+# tests/test_rate_limiter.py
+
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.ai_clients import base_client, get_ai_client
+from src.ai_clients.base_client import is_error_chunk
+from src.ai_clients.rate_limiter import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestScheduler, TokenBucket,
+                                          backoff_delay, parse_retry_after)
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0 # Dates in the past mean now
+
+def test_backoff_never_undercuts_retry_after():
+    assert all(0 <= backoff_delay(attempt) <= 30 for attempt in range(10))
+    assert backoff_delay(0, retry_after_s=5) >= 5
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60, now=bucket._updated) == 0
+    bucket.take(60, now=bucket._updated)
+    assert bucket.wait_time(1, now=bucket._updated) == pytest.approx(1.0)
+
+def test_scheduler_serves_interactive_before_background():
+    async def run():
+        scheduler = RequestScheduler(max_concurrent=1)
+        await scheduler.acquire(0) # Occupies the only slot
+        order = []
+
+        async def request(name, priority):
+            await scheduler.acquire(0, priority)
+            order.append(name)
+            scheduler.release()
+
+        background = asyncio.create_task(request("background", PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(background, interactive)
+        return order
+    assert asyncio.run(run()) == ["interactive", "background"]
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        scheduler = RequestScheduler(max_concurrent=1)
+        await scheduler.acquire(0)
+        waiting = asyncio.create_task(scheduler.acquire(0))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        scheduler.release()
+        await asyncio.wait_for(scheduler.acquire(0), timeout=1)
+        return scheduler.active
+    assert asyncio.run(run()) == 1
+
+def _ollama_frame(content: str, done: bool) -> bytes:
+    return json.dumps({"message": {"role": "assistant", "content": content}, "done": done}).encode("utf-8") + b"\n"
+
+def _openai_frame(content: str, done: bool) -> bytes:
+    return b"data: [DONE]\n\n" if done else b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}).encode("utf-8") + b"\n\n"
+
+@pytest.mark.parametrize("provider, frame", [("Ollama", _ollama_frame), ("OpenAI", _openai_frame)])
+def test_async_stream_retries_after_429(monkeypatch, provider, frame):
+    monkeypatch.setattr(base_client, "backoff_delay", lambda attempt, retry_after_s=None: 0.0)
+    hits = []
+
+    async def handle(request: web.Request) -> web.StreamResponse:
+        hits.append(request.path)
+        if len(hits) == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await response.write(frame("ok", False))
+        await response.write(frame("", True))
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/chat", handle)
+        async with TestServer(app) as server:
+            client = get_ai_client(provider, {"api_url": str(server.make_url("/chat")), "model_name": "m", "api_key": "sk-test",
+                                               "rate_limit": {"max_retries": 2}})
+            try:
+                return "".join([chunk async for chunk in client._astream_with_retries([{"role": "user", "content": "hi"}])])
+            finally:
+                await client.aclose()
+    output = asyncio.run(run())
+    assert output == "ok" and not is_error_chunk(output)
+    assert len(hits) == 2
+
+def test_async_stream_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(base_client, "backoff_delay", lambda attempt, retry_after_s=None: 0.0)
+    hits = []
+
+    async def handle(request: web.Request) -> web.Response:
+        hits.append(request.path)
+        return web.Response(status=429)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/chat", handle)
+        async with TestServer(app) as server:
+            client = get_ai_client("Ollama", {"api_url": str(server.make_url("/chat")), "model_name": "m", "rate_limit": {"max_retries": 1}})
+            try:
+                return [chunk async for chunk in client._astream_with_retries([{"role": "user", "content": "hi"}])]
+            finally:
+                await client.aclose()
+    chunks = asyncio.run(run())
+    assert len(chunks) == 1 and is_error_chunk(chunks[0])
+    assert len(hits) == 2
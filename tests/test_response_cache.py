@@ -0,0 +1,78 @@
+# tests/test_response_cache.py
+
+import time
+
+from src.response_cache import ResponseCache
+
+def _cache(tmp_path, **kwargs) -> ResponseCache:
+    return ResponseCache(str(tmp_path / "cache.db"), **kwargs)
+
+def test_key_covers_every_input():
+    messages = [{"role": "user", "content": "hi"}]
+    key = ResponseCache.make_key("Ollama", "m", "polish_text", messages)
+    assert key == ResponseCache.make_key("Ollama", "m", "polish_text", [{"content": "hi", "role": "user"}])
+    assert key != ResponseCache.make_key("OpenAI", "m", "polish_text", messages)
+    assert key != ResponseCache.make_key("Ollama", "m2", "polish_text", messages)
+    assert key != ResponseCache.make_key("Ollama", "m", "polish_text", [{"role": "user", "content": "hi!"}])
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", "answer")
+    assert cache.get("k") == "answer"
+    assert cache.stats() == {"hits": 1, "misses": 1, "warm_hits": 0, "memory_entries": 1, "disk_entries": 1}
+    cache.close()
+
+def test_memory_tier_is_lru_and_backed_by_disk(tmp_path):
+    cache = _cache(tmp_path, max_memory_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a") # "b" is now the least recently used
+    cache.put("c", "C")
+    assert set(cache._memory) == {"a", "c"}
+    assert cache.get("b") == "B" # Served from disk and promoted again
+    assert "b" in cache._memory
+    cache.close()
+
+def test_disk_tier_survives_restarts_and_is_bounded(tmp_path):
+    cache = _cache(tmp_path, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+        time.sleep(0.01) # Distinct last_access times
+    cache.close()
+    reopened = _cache(tmp_path, max_disk_entries=2)
+    assert reopened.stats()["disk_entries"] == 2
+    assert reopened.get("a") is None
+    assert reopened.get("c") == "C"
+    reopened.close()
+
+def test_expired_entries_are_dropped_from_both_tiers(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.response_cache.time.time", lambda: now[0])
+    cache = _cache(tmp_path, ttl_seconds=60)
+    cache.put("k", "old")
+    now[0] += 61
+    assert cache.get("k") is None
+    assert cache.stats()["disk_entries"] == 0 and cache.stats()["memory_entries"] == 0
+    cache.close()
+
+def test_warm_source_refills_misses_but_not_after_clear(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.response_cache.time.time", lambda: now[0])
+    calls = []
+
+    def warm_source(key, max_age_s, min_created_at):
+        calls.append((key, max_age_s, min_created_at))
+        # Stands in for the history store: only entries newer than min_created_at count
+        return "from history" if min_created_at < 500 else None
+
+    cache = _cache(tmp_path, ttl_seconds=60, warm_source=warm_source)
+    assert cache.get("k") == "from history"
+    assert cache.stats()["warm_hits"] == 1
+    assert cache.get("k") == "from history" and len(calls) == 1 # Stored after the first refill
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "warm_hits": 0, "memory_entries": 0, "disk_entries": 0}
+    assert cache.get("k") is None
+    assert calls[-1] == ("k", 60.0, 1000.0) # Nothing older than the clear may come back
+    cache.close()
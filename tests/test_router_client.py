@@ -0,0 +1,58 @@
+# tests/test_router_client.py
+
+import asyncio
+
+from src.ai_clients.base_client import format_error, is_error_chunk
+from src.ai_clients.router_client import UNHEALTHY_SCORE, ProviderHealth, RouterClient
+
+class _FakeClient:
+    def __init__(self, chunks: list[str], first_delay_s: float = 0.0):
+        self.chunks = chunks
+        self.first_delay_s = first_delay_s
+        self.calls = 0
+        self.closed = False
+
+    async def astream_response(self, messages):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.first_delay_s)
+            for chunk in self.chunks:
+                yield chunk
+        finally:
+            self.closed = True
+
+def _collect(router: RouterClient) -> str:
+    async def run():
+        return "".join([chunk async for chunk in router._astream_request([{"role": "user", "content": "hi"}])])
+    return asyncio.run(run())
+
+def test_health_score_decays(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.ai_clients.router_client.time.monotonic", lambda: now[0])
+    health = ProviderHealth(half_life_s=10)
+    health.record_failure()
+    assert health.score == 1.0
+    now[0] += 10
+    assert abs(health.score - 0.5) < 1e-9
+    health.record_success()
+    assert abs(health.score - 0.25) < 1e-9
+
+def test_fails_over_before_the_first_token():
+    broken = _FakeClient([format_error("API请求错误", "down")])
+    backup = _FakeClient(["from ", "backup"])
+    router = RouterClient([("A", broken), ("B", backup)])
+    assert _collect(router) == "from backup"
+    assert router.health["A"].score >= UNHEALTHY_SCORE
+    # The failing provider moves behind the healthy one
+    assert [name for name, _client in router.ordered_clients()] == ["B", "A"]
+
+def test_all_providers_failing_yields_one_error():
+    router = RouterClient([("A", _FakeClient([])), ("B", _FakeClient([format_error("API请求错误", "down")]))])
+    assert is_error_chunk(_collect(router))
+
+def test_hedge_cancels_the_slow_provider():
+    slow = _FakeClient(["slow"], first_delay_s=5)
+    fast = _FakeClient(["fast"])
+    router = RouterClient([("A", slow), ("B", fast)], hedge_after_ms=20)
+    assert _collect(router) == "fast"
+    assert slow.calls == 1 and slow.closed
@@ -0,0 +1,69 @@
+# tests/test_segment_index.py
+
+from src.long_text import CHUNK_SEPARATOR
+from src.segment_index import SegmentIndex, plan_segments
+from src.token_estimator import estimate_tokens
+
+def _index(tmp_path, **kwargs) -> SegmentIndex:
+    return SegmentIndex(str(tmp_path / "segments.db"), **kwargs)
+
+def test_records_and_finds_paragraphs(tmp_path):
+    index = _index(tmp_path)
+    scope = SegmentIndex.make_scope("Ollama", "m", "translate", target_language="English")
+    assert index.record(scope, "Eins.\n\nZwei.", "One.\n\nTwo.") == 2
+    # Re-wrapped paragraphs still match; new ones do not
+    assert index.lookup(scope, ["Eins.", "Zwei.\n", "Drei."]) == ["One.", "Two.", None]
+    index.close()
+
+def test_scope_separates_languages_and_models(tmp_path):
+    index = _index(tmp_path)
+    english = SegmentIndex.make_scope("Ollama", "m", "translate", target_language="English")
+    french = SegmentIndex.make_scope("Ollama", "m", "translate", target_language="French")
+    other_model = SegmentIndex.make_scope("Ollama", "m2", "translate", target_language="English")
+    index.record(english, "Hallo.", "Hello.")
+    assert index.lookup(french, ["Hallo."]) == [None]
+    assert index.lookup(other_model, ["Hallo."]) == [None]
+    index.close()
+
+def test_mismatched_paragraph_counts_are_not_recorded(tmp_path):
+    index = _index(tmp_path)
+    assert index.record("scope", "A.\n\nB.", "A and B.") == 0
+    assert index.count() == 0
+    index.close()
+
+def test_oldest_entries_are_evicted(tmp_path):
+    index = _index(tmp_path, max_entries=3)
+    for number in range(5):
+        index.record("scope", f"P{number}.", f"O{number}.")
+    assert index.count() == 3
+    assert index.lookup("scope", ["P0.", "P4."]) == [None, "O4."]
+    index.clear()
+    assert index.count() == 0
+    index.close()
+
+def test_lookup_batches_many_paragraphs(tmp_path):
+    index = _index(tmp_path)
+    paragraphs = [f"Paragraph {number}." for number in range(1200)]
+    index.record("scope", "\n\n".join(paragraphs), "\n\n".join(p.upper() for p in paragraphs))
+    found = index.lookup("scope", paragraphs)
+    assert found[0] == "PARAGRAPH 0." and found[-1] == "PARAGRAPH 1199."
+    index.close()
+
+def test_plan_merges_consecutive_changed_paragraphs():
+    paragraphs = ["a", "b", "c", "d", "e"]
+    known = ["A", None, None, "D", None]
+    assert plan_segments(paragraphs, known, max_tokens=1000) == [
+        ("a", "A"), (f"b{CHUNK_SEPARATOR}c", None), ("d", "D"), ("e", None),
+    ]
+
+def test_plan_splits_changed_runs_at_the_budget():
+    paragraphs = ["word " * 50, "word " * 50, "word " * 50]
+    segments = plan_segments(paragraphs, [None, None, None], max_tokens=130) # About 63 tokens each: two fit, three do not
+    assert len(segments) == 2 and all(output is None for _text, output in segments)
+
+def test_plan_splits_an_oversized_changed_paragraph():
+    big = ". ".join(f"Sentence number {number}" for number in range(60)) + "."
+    segments = plan_segments(["a", big, "c"], ["A", None, None], max_tokens=100)
+    assert segments[0] == ("a", "A")
+    assert len(segments) > 3 and all(output is None for _text, output in segments[1:])
+    assert all(estimate_tokens(text) <= 100 for text, _output in segments)
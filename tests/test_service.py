@@ -0,0 +1,41 @@
+# tests/test_service.py
+
+import asyncio
+import json
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from src import config
+from src.service import ToolkitService
+from src.settings_manager import SettingsManager
+
+def _post_run(tmp_path, monkeypatch, data: bytes) -> tuple[int, dict]:
+    monkeypatch.setattr(config, "CACHE_DB_PATH", str(tmp_path / "cache.db"))
+    settings_path = tmp_path / "settings.json"
+    settings_path.write_text(json.dumps({"warm_up": {"enabled": False}}), encoding="utf-8")
+    service = ToolkitService(SettingsManager(str(settings_path)))
+
+    async def run():
+        async with TestClient(TestServer(service.build_app())) as client:
+            response = await client.post("/v1/run", data=data, headers={"Content-Type": "application/json"})
+            return response.status, await response.json()
+    return asyncio.run(run())
+
+def test_malformed_json_is_rejected(tmp_path, monkeypatch):
+    status, body = _post_run(tmp_path, monkeypatch, b"{not json")
+    assert status == 400 and "error" in body
+
+def test_non_utf8_body_is_rejected(tmp_path, monkeypatch):
+    status, _body = _post_run(tmp_path, monkeypatch, b'{"text": "\xff\xfe"}')
+    assert status == 400
+
+def test_non_string_fields_are_rejected(tmp_path, monkeypatch):
+    payload = {"action": "translate", "text": "hello", "target_language": ["en", "fr"]}
+    status, _body = _post_run(tmp_path, monkeypatch, json.dumps(payload).encode("utf-8"))
+    assert status == 400
+    status, _body = _post_run(tmp_path, monkeypatch, json.dumps({"action": ["polish_text"], "text": "hello"}).encode("utf-8"))
+    assert status == 400
+
+def test_unknown_action_is_rejected(tmp_path, monkeypatch):
+    status, _body = _post_run(tmp_path, monkeypatch, json.dumps({"action": "nope", "text": "hello"}).encode("utf-8"))
+    assert status == 400
@@ -0,0 +1,101 @@
+# tests/test_settings_manager.py
+
+import json
+import os
+import time
+
+import pytest
+
+from src.settings_manager import SettingsManager, connection_signature, freeze, merge, thaw
+
+def _manager(tmp_path, data: dict | None = None, **kwargs) -> SettingsManager:
+    path = tmp_path / "settings.json"
+    if data is not None:
+        path.write_text(json.dumps(data), encoding="utf-8")
+    return SettingsManager(str(path), **kwargs)
+
+def _edit(path, data: dict):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9)) # Same-size edits still change the mtime
+
+def test_missing_file_is_created_with_defaults(tmp_path):
+    manager = _manager(tmp_path)
+    assert manager.get("current_provider") == "Ollama"
+    assert json.loads((tmp_path / "settings.json").read_text(encoding="utf-8"))["current_provider"] == "Ollama"
+
+def test_snapshot_is_read_only_and_merged_with_defaults(tmp_path):
+    manager = _manager(tmp_path, {"current_provider": "OpenAI", "routing": {"enabled": True}})
+    assert manager.provider().model_name == "gpt-4o"
+    assert manager.get("routing")["hedge_after_ms"] == 0 # Default kept next to the edited key
+    with pytest.raises(TypeError):
+        manager.settings["current_provider"] = "Groq"
+
+def test_freeze_thaw_merge_round_trip():
+    frozen = freeze({"a": [1, {"b": 2}]})
+    assert thaw(frozen) == {"a": [1, {"b": 2}]}
+    assert merge({"a": {"x": 1, "y": 2}}, freeze({"a": {"y": 3}})) == {"a": {"x": 1, "y": 3}}
+
+def test_updates_are_debounced_into_one_atomic_write(tmp_path):
+    manager = _manager(tmp_path, {}, save_delay_s=0.05)
+    path = tmp_path / "settings.json"
+    before = path.stat().st_mtime_ns
+    for provider in ("Groq", "OpenAI", "Groq"):
+        manager.update({"current_provider": provider})
+    assert json.loads(path.read_text(encoding="utf-8")).get("current_provider") != "Groq" # Not written yet
+    time.sleep(0.3)
+    assert json.loads(path.read_text(encoding="utf-8"))["current_provider"] == "Groq"
+    assert path.stat().st_mtime_ns != before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["settings.json"]
+
+def test_update_without_persist_is_not_written(tmp_path):
+    manager = _manager(tmp_path, {}, save_delay_s=0.01)
+    manager.update({"current_provider": "Groq"}, persist=False)
+    manager.flush()
+    assert "current_provider" not in json.loads((tmp_path / "settings.json").read_text(encoding="utf-8"))
+
+def test_corrupt_file_is_kept_and_defaults_used(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text("{broken", encoding="utf-8")
+    manager = SettingsManager(str(path))
+    assert manager.get("current_provider") == "Ollama"
+    assert path.read_text(encoding="utf-8") == "{broken"
+    assert (tmp_path / "settings.json.corrupt").read_text(encoding="utf-8") == "{broken"
+
+def test_external_edit_is_reloaded_and_bad_edits_ignored(tmp_path):
+    manager = _manager(tmp_path, {"current_provider": "Ollama"})
+    changes = []
+    manager.add_listener(lambda old, new: changes.append((old["current_provider"], new["current_provider"])))
+    path = tmp_path / "settings.json"
+    _edit(path, {"current_provider": "Groq"})
+    assert manager.reload_if_changed()
+    assert changes == [("Ollama", "Groq")]
+    assert not manager.reload_if_changed() # Unchanged since
+    path.write_text("{not json", encoding="utf-8")
+    assert not manager.reload_if_changed()
+    assert manager.get("current_provider") == "Groq"
+
+def test_failing_listener_does_not_stop_reloads(tmp_path):
+    manager = _manager(tmp_path, {"current_provider": "Ollama"})
+    seen = []
+
+    def failing(old, new):
+        raise RuntimeError("main thread is not in main loop")
+
+    manager.add_listener(failing)
+    manager.add_listener(lambda old, new: seen.append(new["current_provider"]))
+    path = tmp_path / "settings.json"
+    manager.watch(interval_s=0.01)
+    try:
+        _edit(path, {"current_provider": "Groq"})
+        time.sleep(0.2)
+        _edit(path, {"current_provider": "OpenAI"})
+        time.sleep(0.2)
+    finally:
+        manager.stop_watching()
+    assert seen == ["Groq", "OpenAI"] # The watcher survived the first failure
+
+def test_connection_signature_ignores_unrelated_settings():
+    base = {"current_provider": "Ollama", "providers": {"Ollama": {"model_name": "a"}}, "response_cache": {"enabled": True}}
+    assert connection_signature(base) == connection_signature(merge(base, {"response_cache": {"enabled": False}}))
+    assert connection_signature(base) != connection_signature(merge(base, {"providers": {"Ollama": {"model_name": "b"}}}))
@@ -0,0 +1,124 @@
+# tests/test_single_flight.py
+
+import asyncio
+
+from src.ai_clients.single_flight import SingleFlight
+
+class _Upstream:
+    """A fake upstream stream that emits one chunk per release() and records whether it was closed."""
+
+    def __init__(self, chunks: list[str]):
+        self.chunks = chunks
+        self.opened = 0
+        self.closed = False
+        self.gate = asyncio.Queue()
+
+    async def stream(self):
+        self.opened += 1
+        try:
+            for chunk in self.chunks:
+                await self.gate.get()
+                yield chunk
+        finally:
+            self.closed = True
+
+    def release(self, count: int = 1):
+        for _ in range(count):
+            self.gate.put_nowait(None)
+
+async def _read(stream, limit: int | None = None) -> list[str]:
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk)
+        if limit is not None and len(chunks) == limit:
+            break
+    return chunks
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_identical_requests_share_one_upstream():
+    async def run():
+        flights = SingleFlight()
+        upstream = _Upstream(["a", "b", "c"])
+        first = asyncio.create_task(_read(flights.stream("k", upstream.stream)))
+        upstream.release()
+        await _settle()
+        second = asyncio.create_task(_read(flights.stream("k", upstream.stream))) # Joins after "a"
+        upstream.release(2)
+        results = await asyncio.gather(first, second)
+        return results, upstream.opened, flights.shared, flights.in_flight()
+    results, opened, shared, in_flight = asyncio.run(run())
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert opened == 1 and shared == 1 and in_flight == 0
+
+def test_different_keys_do_not_share():
+    async def run():
+        flights = SingleFlight()
+        one, two = _Upstream(["1"]), _Upstream(["2"])
+        one.release()
+        two.release()
+        return await asyncio.gather(_read(flights.stream("k1", one.stream)), _read(flights.stream("k2", two.stream)))
+    assert asyncio.run(run()) == [["1"], ["2"]]
+
+def test_cancelling_the_last_subscriber_closes_the_upstream_at_once():
+    async def run():
+        flights = SingleFlight(linger_s=60)
+        upstream = _Upstream(["a", "b"])
+        reader = asyncio.create_task(_read(flights.stream("k", upstream.stream)))
+        upstream.release()
+        await _settle()
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        await _settle()
+        return upstream.closed, flights.in_flight()
+    assert asyncio.run(run()) == (True, 0)
+
+def test_cancelling_one_of_two_subscribers_keeps_the_stream():
+    async def run():
+        flights = SingleFlight(linger_s=60)
+        upstream = _Upstream(["a", "b"])
+        leaving = asyncio.create_task(_read(flights.stream("k", upstream.stream)))
+        staying = asyncio.create_task(_read(flights.stream("k", upstream.stream)))
+        await _settle()
+        leaving.cancel()
+        await asyncio.gather(leaving, return_exceptions=True)
+        upstream.release(2)
+        return await staying
+    assert asyncio.run(run()) == ["a", "b"]
+
+def test_closed_stream_lingers_for_a_late_identical_request():
+    async def run():
+        flights = SingleFlight(linger_s=0.05)
+        upstream = _Upstream(["a", "b"])
+        stream = flights.stream("k", upstream.stream)
+        upstream.release()
+        assert await _read(stream, limit=1) == ["a"]
+        await stream.aclose()
+        assert not upstream.closed # Still lingering
+        rejoined = asyncio.create_task(_read(flights.stream("k", upstream.stream)))
+        upstream.release()
+        assert await rejoined == ["a", "b"]
+
+        abandoned = _Upstream(["x", "y"])
+        stream = flights.stream("k2", abandoned.stream)
+        abandoned.release()
+        await _read(stream, limit=1)
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+        return upstream.opened, abandoned.closed, flights.in_flight()
+    assert asyncio.run(run()) == (1, True, 0)
+
+def test_upstream_errors_reach_every_subscriber():
+    async def failing():
+        yield "partial"
+        raise ValueError("boom")
+
+    async def run():
+        flights = SingleFlight()
+        return await asyncio.gather(
+            _read(flights.stream("k", failing)), _read(flights.stream("k", failing)), return_exceptions=True
+        )
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
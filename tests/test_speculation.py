@@ -0,0 +1,46 @@
+# tests/test_speculation.py
+
+import json
+import time
+
+from src.speculation import ActionPredictor, action_key, parse_action_key
+
+def test_action_key_round_trip():
+    key = action_key("translate", target_language="English")
+    assert key == "translate:English"
+    assert parse_action_key(key) == ("translate", {"target_language": "English"})
+    assert parse_action_key(action_key("polish_text")) == ("polish_text", {})
+
+def test_predicts_only_a_dominant_action(tmp_path):
+    predictor = ActionPredictor(str(tmp_path / "stats.json"), min_samples=4, min_share=0.6, save_delay_s=60)
+    for key in ["a", "a", "b"]:
+        predictor.record(key)
+    assert predictor.predict() is None # Too few samples
+    predictor.record("a")
+    assert predictor.predict() == "a"
+    predictor.record("b")
+    predictor.record("b")
+    assert predictor.predict() is None # 3 of 6 is not dominant
+
+def test_records_are_saved_once_per_burst(tmp_path, monkeypatch):
+    path = tmp_path / "stats.json"
+    writes = []
+    import src.speculation as speculation
+    real_write = speculation.write_json_atomic
+    monkeypatch.setattr(speculation, "write_json_atomic", lambda *args, **kwargs: (writes.append(args), real_write(*args, **kwargs)))
+    predictor = ActionPredictor(str(path), save_delay_s=0.05)
+    for _ in range(50):
+        predictor.record("summarize_points")
+    assert not path.exists() # Nothing written on the caller's thread
+    time.sleep(0.3)
+    assert len(writes) == 1
+    assert json.loads(path.read_text(encoding="utf-8")) == {"summarize_points": 50}
+    assert ActionPredictor(str(path)).counts == {"summarize_points": 50}
+    assert [p.name for p in tmp_path.iterdir()] == ["stats.json"] # No temporary file left behind
+
+def test_flush_writes_pending_counts(tmp_path):
+    path = tmp_path / "stats.json"
+    predictor = ActionPredictor(str(path), save_delay_s=60)
+    predictor.record("polish_text")
+    predictor.flush()
+    assert json.loads(path.read_text(encoding="utf-8")) == {"polish_text": 1}
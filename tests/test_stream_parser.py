@@ -0,0 +1,85 @@
+# tests/test_stream_parser.py
+
+import json
+
+import pytest
+
+from src.ai_clients.base_client import is_error_chunk
+from src.ai_clients.stream_parser import NDJSONStreamParser, SSEStreamParser, StreamParser
+
+def _json(value) -> bytes:
+    # Compact, as providers send it: the parsers' fast paths only apply to this form
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def _sse(*events) -> bytes:
+    return b"".join(b"data: " + (event.encode("utf-8") if isinstance(event, str) else _json(event)) + b"\n\n" for event in events)
+
+def _feed_bytewise(parser: StreamParser, data: bytes) -> list[str]:
+    deltas = []
+    for index in range(len(data)):
+        deltas += parser.feed(data[index:index + 1])
+    return deltas + parser.close()
+
+def _delta(content) -> dict:
+    return {"choices": [{"delta": {"content": content}}]}
+
+def test_base_parser_is_abstract():
+    with pytest.raises(TypeError):
+        StreamParser()
+
+def test_sse_content_split_across_chunks():
+    data = _sse(_delta("Hello"), _delta(", wörld"), _delta('say "hi"\n'), "[DONE]")
+    parser = SSEStreamParser()
+    assert "".join(_feed_bytewise(parser, data)) == 'Hello, wörldsay "hi"\n'
+    assert parser.finished
+
+def test_sse_ignores_content_outside_the_delta():
+    event = {"choices": [{"delta": {"content": None, "tool_calls": [{"id": "x"}]}}], "extra": {"content": "LEAK"}}
+    parser = SSEStreamParser()
+    assert parser.feed(_sse(event, _delta("ok"))) == ["ok"]
+
+def test_sse_ignores_nested_content_inside_the_delta():
+    event = {"choices": [{"delta": {"tool_calls": [{"function": {"content": "LEAK"}}]}}]}
+    assert SSEStreamParser().feed(_sse(event)) == []
+
+def test_sse_keeps_usage_sent_with_content():
+    event = _delta("last") | {"usage": {"prompt_tokens": 12, "completion_tokens": 3}}
+    parser = SSEStreamParser()
+    assert parser.feed(_sse(event)) == ["last"]
+    assert parser.usage == {"prompt_tokens": 12, "completion_tokens": 3}
+
+def test_sse_reads_groq_usage_and_null_usage():
+    parser = SSEStreamParser()
+    groq = {"choices": [{"delta": {}}], "x_groq": {"usage": {"prompt_tokens": 5}}}
+    assert parser.feed(_sse(_delta("a") | {"usage": None}, groq)) == ["a"]
+    assert parser.usage == {"prompt_tokens": 5}
+
+def test_sse_error_event_stops_the_stream():
+    parser = SSEStreamParser()
+    deltas = parser.feed(_sse({"error": {"message": "boom"}}, _delta("after")))
+    assert len(deltas) == 1 and is_error_chunk(deltas[0]) and "boom" in deltas[0]
+    assert parser.finished
+
+def test_sse_final_event_without_blank_line():
+    parser = SSEStreamParser()
+    assert parser.feed(b'data: {"choices":[{"delta":{"content":"tail"}}]}') == []
+    assert parser.close() == ["tail"]
+
+def test_ndjson_content_and_final_stats():
+    lines = [
+        {"message": {"role": "assistant", "content": "Hi"}, "done": False},
+        {"message": {"role": "assistant", "content": 'é "q"'}, "done": False},
+        {"message": {"role": "assistant", "content": ""}, "done": True, "eval_count": 2},
+    ]
+    data = b"".join(_json(line) + b"\r\n" for line in lines)
+    parser = NDJSONStreamParser()
+    assert "".join(_feed_bytewise(parser, data)) == 'Hié "q"'
+    assert parser.finished and parser.final_stats["eval_count"] == 2
+
+def test_ndjson_ignores_content_outside_the_message():
+    line = {"message": {"role": "assistant", "content": None}, "meta": {"content": "LEAK"}, "done": False}
+    assert NDJSONStreamParser().feed(_json(line) + b"\n") == []
+
+def test_ndjson_error_line():
+    deltas = NDJSONStreamParser().feed(b'{"error":"model not found"}\n')
+    assert len(deltas) == 1 and "model not found" in deltas[0]
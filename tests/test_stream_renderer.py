@@ -0,0 +1,122 @@
+# tests/test_stream_renderer.py
+
+from src.ui.stream_renderer import MarkdownLineParser, StreamRenderer, TAIL_MARK
+
+class FakeText:
+    """
+    Just enough of tk.Text for the renderer: text is only ever inserted at
+    'end-1c' and deleted from the tail mark to the end, so a list of
+    (character, tags) pairs and an integer mark model it exactly.
+    """
+
+    def __init__(self):
+        self.chars: list[tuple[str, tuple]] = []
+        self.marks: dict[str, int] = {}
+        self.deleted: list[int] = []
+        self.seen = 0
+        self.view = (0.0, 1.0)
+        self.state = "disabled"
+
+    def _index(self, index: str) -> int:
+        return len(self.chars) if index in ("end", "end-1c") else self.marks.get(index, 0)
+
+    def insert(self, index: str, *args):
+        assert index == "end-1c" and self.state == "normal"
+        for text, tags in zip(args[::2], args[1::2]):
+            self.chars += [(char, tuple(tags)) for char in text]
+
+    def delete(self, start: str, end: str):
+        assert self.state == "normal"
+        start_index, end_index = 0 if start == "1.0" else self._index(start), self._index(end)
+        self.deleted.append(end_index - start_index)
+        del self.chars[start_index:end_index]
+
+    def mark_set(self, name: str, index: str):
+        self.marks[name] = self._index(index)
+
+    def configure(self, state: str):
+        self.state = state
+
+    def yview(self) -> tuple[float, float]:
+        return self.view
+
+    def see(self, index: str):
+        self.seen += 1
+
+    @property
+    def content(self) -> str:
+        return "".join(char for char, _tags in self.chars)
+
+    def tagged(self, tag: str) -> str:
+        return "".join(char if tag in tags else "|" for char, tags in self.chars).strip("|")
+
+def _renderer() -> StreamRenderer:
+    # Built without __init__: tag fonts need a Tk root
+    renderer = StreamRenderer.__new__(StreamRenderer)
+    renderer.text = FakeText()
+    renderer.parser = MarkdownLineParser()
+    renderer._parts = []
+    renderer._tail = ""
+    renderer.text.mark_set(TAIL_MARK, "end-1c")
+    return renderer
+
+def _stream(renderer: StreamRenderer, chunks: list[str]):
+    for chunk in chunks:
+        renderer.append(chunk)
+
+def test_markup_split_across_chunks_is_formatted_once_the_line_ends():
+    renderer = _renderer()
+    _stream(renderer, ["# Ti", "tle\nSome **bo", "ld** and *it", "alic* text\n- item `co", "de`"])
+    assert renderer.text.content == "Title\nSome bold and italic text\n- item `code`" # The tail stays raw
+    renderer.finish()
+    assert renderer.text.content == "Title\nSome bold and italic text\n• item code"
+    assert renderer.text.tagged("h1") == "Title"
+    assert renderer.text.tagged("bold") == "bold"
+    assert renderer.text.tagged("italic") == "italic"
+    assert renderer.text.tagged("code") == "code"
+    assert renderer.text.tagged("list0") == "• item code"
+
+def test_code_fences_split_across_chunks():
+    renderer = _renderer()
+    _stream(renderer, ["``", "`py\nx = 1", "\n`", "``\nafter\n"])
+    assert renderer.text.content == "x = 1\nafter\n" # Fence lines are hidden
+    assert renderer.text.tagged("codeblock") == "x = 1"
+    assert renderer.source == "```py\nx = 1\n```\nafter\n"
+
+def test_the_raw_tail_inside_a_code_block_is_shown_as_code():
+    renderer = _renderer()
+    _stream(renderer, ["```\n", "partial"])
+    assert renderer.text.tagged("codeblock") == "partial"
+
+def test_each_append_only_rewrites_the_unfinished_line():
+    renderer = _renderer()
+    for number in range(200):
+        _stream(renderer, [f"- line {number} with **bold", "** text\n"])
+    # Only the raw tail is ever deleted, never the formatted document
+    assert max(renderer.text.deleted) <= len("- line 199 with **bold")
+    assert renderer.text.content.count("\n") == 200
+
+def test_autoscroll_only_follows_at_the_bottom():
+    renderer = _renderer()
+    renderer.append("first\n")
+    assert renderer.text.seen == 1
+    renderer.text.view = (0.2, 0.6) # The user scrolled up to read
+    renderer.append("second\n")
+    assert renderer.text.seen == 1
+
+def test_reset_clears_the_document_and_parser_state():
+    renderer = _renderer()
+    _stream(renderer, ["```\n", "code\n"])
+    renderer.reset()
+    renderer.append("plain\n")
+    assert renderer.text.content == "plain\n"
+    assert renderer.text.tagged("codeblock") == ""
+    assert renderer.source == "plain\n"
+
+def test_line_parser_blocks():
+    parser = MarkdownLineParser()
+    assert parser.parse_line("  - nested") == [("• ", ("list1",)), ("nested", ("list1",))]
+    assert parser.parse_line("2) second") == [("2) ", ("list0",)), ("second", ("list0",))]
+    assert parser.parse_line("> quoted") == [("quoted", ("quote",))]
+    assert parser.parse_line("### Small") == [("Small", ("h3",))]
+    assert parser.parse_line("a*b*c and 2 * 3 * 4") == [("a*b*c and 2 * 3 * 4", ())] # Not emphasis
@@ -0,0 +1,41 @@
+# tests/test_token_estimator.py
+
+from src import token_estimator
+from src.token_estimator import (PLAN_CHUNK, PLAN_DIRECT, PLAN_REJECT, estimate_messages_tokens, estimate_tokens,
+                                 get_chunk_budget, get_context_limit, plan_request)
+
+def test_ascii_estimate_is_about_four_characters_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2 # Rounded up
+    assert estimate_tokens("x" * 4000) == 1000
+
+def test_cjk_counts_one_token_per_character():
+    assert estimate_tokens("你好世界") == 4
+    assert estimate_tokens("こんにちは") == 5
+    assert estimate_tokens("안녕") == 2
+    # Mixed text: CJK characters plus the rest at ~4 characters per token
+    assert estimate_tokens("你好 world") == 2 + 2
+
+def test_messages_add_framing_overhead():
+    messages = [{"role": "system", "content": "abcd"}, {"role": "user", "content": "abcdabcd"}]
+    assert estimate_messages_tokens(messages) == 1 + 2 + 2 * token_estimator.MESSAGE_OVERHEAD_TOKENS
+
+def test_context_limit_per_model_and_default():
+    budget = {"context_limits": {"small": 4096}, "default_context": 16000}
+    assert get_context_limit("small", budget) == 4096
+    assert get_context_limit("unknown", budget) == 16000
+    assert get_context_limit("unknown", {}) == 8192
+
+def test_chunk_budget_is_capped_by_the_context_window():
+    budget = {"context_limits": {"small": 2048, "large": 128000}, "reserve_output_tokens": 1024}
+    assert get_chunk_budget("large", budget, chunk_tokens=2000) == 2000
+    assert get_chunk_budget("small", budget, chunk_tokens=2000) == 2048 - 1024 - 200
+    assert get_chunk_budget("small", budget, chunk_tokens=2000, prompt_overhead=2000) == 1 # Never zero or negative
+
+def test_plans():
+    assert plan_request("x" * 400, chunk_budget=200, max_input_tokens=1000) == (PLAN_DIRECT, 100)
+    assert plan_request("x" * 4000, chunk_budget=200, max_input_tokens=10000) == (PLAN_CHUNK, 1000)
+    assert plan_request("x" * 40000, chunk_budget=200, max_input_tokens=5000) == (PLAN_REJECT, 10000)
+    # Exactly at a limit still fits
+    assert plan_request("x" * 800, chunk_budget=200, max_input_tokens=200)[0] == PLAN_DIRECT